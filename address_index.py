@@ -0,0 +1,210 @@
+import itertools
+import logging
+import re
+import threading
+from array import array
+from concurrent.futures import Future
+
+import metrics
+from trie import Trie
+
+LOGGER = logging.getLogger(__name__)
+
+""" Queries starting with a postcode ('1070 Neubaugasse') or ending with one after a comma ('Neubaugasse, 1070') """
+LEADING_POSTCODE = re.compile(r"^\s*(\d{4,5})(?:[\s,]+(.*))?$")
+TRAILING_POSTCODE = re.compile(r"^(.*?),\s*(\d{4,5})\s*$")
+
+PARTITION_LOADS = metrics.counter("address_partition_loads_total", "Postcode partitions of the address index built")
+PARTITION_EVICTIONS = metrics.counter("address_partition_evictions_total",
+                                      "Postcode partitions of the address index evicted to bound memory")
+
+
+def address_postcode(address: str) -> str:
+    """
+    Returns the postcode of an address formatted as '<street and number>, <postcode>'.
+
+    :param address: The address
+    :return: The postcode, an empty string if the address has none
+    """
+    return address.rpartition(",")[2].strip()
+
+
+class AddressIndex:
+    """
+    Address search index partitioned by postcode: one Trie per postcode, sharing one list of addresses, so every
+    address has one id. Queries naming a postcode only search its partition. Partitions are built on first use; with
+    'max_partitions' set, the least recently used ones are evicted beyond that number and rebuilt when needed again,
+    which bounds the memory of the index to the busy districts. Queries without postcode then scan the addresses of
+    the partitions which are not built instead of building them, so they do not evict the busy districts.
+    """
+
+    def __init__(self, max_partitions: int = 0):
+        """
+        Initializes the AddressIndex object.
+
+        :param max_partitions: Maximum number of partitions kept built, 0 for all
+        """
+        self.max_partitions = max_partitions
+        self.words = []
+        """ Ids of the addresses by postcode """
+        self.__members = {}
+        """ Built partitions by postcode, read without the lock """
+        self.__partitions = {}
+        """ When the partitions were last used, by postcode, as values of '__clock' """
+        self.__last_used = {}
+        self.__clock = itertools.count()
+        """ Partitions being built, by postcode, as futures of their Trie """
+        self.__building = {}
+        self.__lock = threading.Lock()
+        metrics.gauge("address_partitions_loaded", "Postcode partitions of the address index currently built",
+                      function=lambda: len(self.__partitions))
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def insert(self, address: str, postcode: str = None) -> int:
+        """
+        Adds an address. Partitions built before do not contain it, so add all addresses first.
+
+        :param address: The address
+        :param postcode: Its postcode, taken from the address if None
+        :return: The id of the address
+        """
+        if postcode is None:
+            postcode = address_postcode(address)
+        address_id = len(self.words)
+        self.words.append(address)
+        self.__members.setdefault(postcode, array('q')).append(address_id)
+        return address_id
+
+    def word(self, word_id: int):
+        """
+        Returns the address with the given id.
+
+        :param word_id: The id returned by insert
+        :return: The address, None if there is no address with this id
+        """
+        if 0 <= word_id < len(self.words):
+            return self.words[word_id]
+        return None
+
+    def postcodes(self) -> list:
+        return sorted(self.__members)
+
+    def preload(self):
+        """
+        Builds all partitions, as many as 'max_partitions' if it is set.
+        """
+        postcodes = self.postcodes()
+        self.load(postcodes[:self.max_partitions] if self.max_partitions else postcodes)
+
+    def route(self, query: str) -> tuple:
+        """
+        Finds the partitions a query has to search.
+
+        :param query: The query
+        :return: Tuple of the list of postcodes and the prefix to search in their partitions
+        """
+        postcode, prefix = self.__route(query)
+        return ([postcode] if postcode is not None else self.postcodes()), prefix
+
+    def __route(self, query: str) -> tuple:
+        """
+        Returns the postcode a query names (None if it names none) and the prefix to search.
+        """
+        match = LEADING_POSTCODE.match(query)
+        if match and match.group(1) in self.__members:
+            return match.group(1), match.group(2) or ""
+        match = TRAILING_POSTCODE.match(query)
+        if match and match.group(2) in self.__members:
+            return match.group(2), match.group(1)
+        return None, query
+
+    def is_loaded(self, postcodes: list) -> bool:
+        """
+        Returns whether the partitions of all given postcodes are built.
+        """
+        return all(postcode in self.__partitions for postcode in postcodes)
+
+    def load(self, postcodes: list):
+        """
+        Builds the partitions of the given postcodes which are not built yet. This takes a while for large districts,
+        so call it from a background thread while the event loop is serving.
+        """
+        for postcode in postcodes:
+            self.__partition(postcode)
+
+    def __partition(self, postcode: str) -> Trie:
+        """
+        Returns the partition of a postcode, building it if needed. A built partition is looked up without the lock;
+        a partition is built outside the lock, once, while other threads needing it wait for the same build.
+        """
+        trie = self.__partitions.get(postcode)
+        if trie is not None:
+            self.__last_used[postcode] = next(self.__clock)
+            return trie
+        with self.__lock:
+            trie = self.__partitions.get(postcode)
+            if trie is not None:
+                return trie
+            build = self.__building.get(postcode)
+            builder = build is None
+            if builder:
+                build = self.__building[postcode] = Future()
+        if not builder:
+            return build.result()
+        try:
+            trie = Trie(self.words)
+            for address_id in self.__members.get(postcode, ()):
+                trie.insert(self.words[address_id], address_id)
+        except BaseException as err:
+            with self.__lock:
+                del self.__building[postcode]
+            build.set_exception(err)
+            raise
+        PARTITION_LOADS.inc()
+        with self.__lock:
+            del self.__building[postcode]
+            self.__partitions[postcode] = trie
+            self.__last_used[postcode] = next(self.__clock)
+            while self.max_partitions and len(self.__partitions) > self.max_partitions:
+                evicted = min(self.__partitions, key=lambda built: self.__last_used.get(built, -1))
+                del self.__partitions[evicted]
+                self.__last_used.pop(evicted, None)
+                PARTITION_EVICTIONS.inc()
+                LOGGER.debug("Address partition %s evicted.", evicted)
+        build.set_result(trie)
+        return trie
+
+    def __scan(self, postcode: str, prefix: str):
+        """
+        Finds the ids of the addresses of a postcode starting with the prefix by comparing all of them, without building
+        the partition. Like the Trie, addresses differing in case only are found once.
+        """
+        prefix = prefix.lower()
+        found = set()
+        for address_id in self.__members.get(postcode, ()):
+            address = self.words[address_id].lower()
+            if address.startswith(prefix) and address not in found:
+                found.add(address)
+                yield address_id
+
+    def autocomplete_ids(self, query: str):
+        """
+        Finds the ids of all addresses starting with the query, ignoring case, in the partitions the query is routed
+        to. The partition of a postcode named in the query is built if needed. Without postcode, all partitions are
+        built if 'max_partitions' is not set; otherwise those which are not built are scanned.
+
+        :param query: The query, optionally with a postcode before or after a comma behind the address
+        :return: Yields the ids of the matching addresses
+        """
+        postcode, prefix = self.__route(query)
+        if postcode is not None:
+            yield from self.__partition(postcode).autocomplete_ids(prefix)
+            return
+        for postcode in self.postcodes():
+            trie = self.__partitions.get(postcode)
+            if trie is not None or not self.max_partitions:
+                yield from (trie or self.__partition(postcode)).autocomplete_ids(prefix)
+            else:
+                yield from self.__scan(postcode, prefix)
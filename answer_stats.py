@@ -0,0 +1,112 @@
+ANSWERS_METRIC = "survey_answers"
+COMPLETED_METRIC = "survey_responses_completed"
+
+""" Prefix of the keys of the completed responses in the saved counts """
+COMPLETED_KEY = "completed:"
+
+
+class AnswerStatistics:
+    """
+    Live results of the surveys: how often every answer option of every question was chosen and how many responses
+    were completed, counted by the bot as participants answer instead of exporting all responses from LimeSurvey.
+    Answers of participants who have not finished the survey yet are counted too. A participant correcting an answer
+    (after answering 'no' to the confirmation) moves the count from the old answer to the new one.
+    """
+
+    def __init__(self):
+        """ Counts by answer code, by question code """
+        self.answers = {}
+        """ Completed responses by survey id """
+        self.completed = {}
+
+    def record(self, question_code: str, answer: str, previous: str = None):
+        """
+        Counts an answer.
+
+        :param question_code: The code of the question, '<sid>X<gid>X<qid>'
+        :param answer: The answer code
+        :param previous: The answer code this answer replaces, None for a new answer
+        """
+        counts = self.answers.get(question_code)
+        if counts is None:
+            counts = self.answers[question_code] = {}
+        if previous is not None and counts.get(previous, 0) > 0:
+            counts[previous] -= 1
+        counts[answer] = counts.get(answer, 0) + 1
+
+    def complete(self, sid: int):
+        """
+        Counts a completed response.
+
+        :param sid: The id of the survey
+        """
+        self.completed[sid] = self.completed.get(sid, 0) + 1
+
+    def summary(self) -> dict:
+        """
+        Returns all counts, grouped by survey, e.g. for the JSON endpoint.
+
+        :return: Dictionary of survey id (as string) to completed responses and answer counts by question code
+        """
+        surveys = {}
+        for sid, completed in self.completed.items():
+            surveys.setdefault(str(sid), {"completed": 0, "questions": {}})["completed"] = completed
+        for question_code, counts in self.answers.items():
+            survey = surveys.setdefault(question_code.split("X", 1)[0], {"completed": 0, "questions": {}})
+            survey["questions"][question_code] = {answer: count for answer, count in counts.items() if count}
+        return {"surveys": surveys}
+
+    def to_counts(self) -> dict:
+        """
+        Returns the counts as flat dictionary of string keys, as save_counts writes them.
+        """
+        counts = {f"{COMPLETED_KEY}{sid}": completed for sid, completed in self.completed.items()}
+        for question_code, answer_counts in self.answers.items():
+            counts.update({f"{question_code}:{answer}": count for answer, count in answer_counts.items() if count})
+        return counts
+
+    def add_counts(self, counts: dict):
+        """
+        Adds counts returned by to_counts, e.g. loaded from a file.
+
+        :param counts: Dictionary of key to count
+        """
+        for key, count in counts.items():
+            if key.startswith(COMPLETED_KEY):
+                sid = key[len(COMPLETED_KEY):]
+                sid = int(sid) if sid.isdigit() else sid
+                self.completed[sid] = self.completed.get(sid, 0) + count
+            else:
+                question_code, _, answer = key.partition(":")
+                answer_counts = self.answers.setdefault(question_code, {})
+                answer_counts[answer] = answer_counts.get(answer, 0) + count
+
+    def answer_samples(self) -> dict:
+        """ Values of the survey_answers gauge, by (question code, answer code) """
+        return {(question_code, answer): count for question_code, counts in self.answers.items()
+                for answer, count in counts.items()}
+
+    def completed_samples(self) -> dict:
+        """ Values of the survey_responses_completed gauge, by survey id """
+        return {(str(sid),): completed for sid, completed in self.completed.items()}
+
+    @classmethod
+    def from_metrics(cls, families: list) -> "AnswerStatistics":
+        """
+        Adds up the counts in metric families collected from several processes, e.g. the workers of a multi-process
+        deployment.
+
+        :param families: List of metric family dictionaries
+        :return: The AnswerStatistics with the sum of the counts
+        """
+        statistics = cls()
+        for family in families:
+            if family["name"] not in (ANSWERS_METRIC, COMPLETED_METRIC):
+                continue
+            for _, labels, value in family["samples"]:
+                labels = dict(labels)
+                if family["name"] == ANSWERS_METRIC:
+                    statistics.add_counts({f"{labels['question']}:{labels['answer']}": value})
+                else:
+                    statistics.add_counts({f"{COMPLETED_KEY}{labels['survey']}": value})
+        return statistics
@@ -1,14 +1,17 @@
 import asyncio
 from telegram_bot_handler import TelegramBotHandler
 from config import Config
+from sharding import ShardedDeployment
 
 
 class Application:
     def __init__(self):
         # Initialization
-        config = Config()
-        self.telegram_bot_handler = TelegramBotHandler(config)
+        self.config = Config()
 
     def run(self):
-        # Use TelegramBotHandler to run the application
-        asyncio.run(self.telegram_bot_handler.run())
+        # Use several worker processes if configured, else a single TelegramBotHandler runs the application
+        if self.config.WORKERS > 1:
+            ShardedDeployment(self.config).run()
+        else:
+            asyncio.run(TelegramBotHandler(self.config).run())
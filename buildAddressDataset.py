@@ -17,13 +17,20 @@ class AddressDownloader:
         "propertyname": "NAME,PLZ,GEB_BEZIRK"
     }
 
-    def __init__(self):
+    def __init__(self, csv_path=None):
         """
         Initializes the AddressDownloader instance, setting up an empty list for storing addresses
-        and calls the method to download data.
+        and calls the method to download data. If 'csv_path' is given, the addresses are read from that file instead,
+        which must have the same layout as the downloaded data.
+
+        :param csv_path: Optional path of a local CSV file with addresses
         """
         self.addresses = []  # List to store all downloaded addresses
-        self.download_data()  # Initiating the data download on object creation
+        self.coordinates = []  # (latitude, longitude) of every address, None if the address has no valid point
+        if csv_path:
+            self.load_file(csv_path)
+        else:
+            self.download_data()  # Initiating the data download on object creation
 
     @staticmethod
     def __get_district_string(district_number):
@@ -67,11 +74,27 @@ class AddressDownloader:
             logging.error(f'Error: Could not download the data for district {district_number}')
             return None
 
+    @staticmethod
+    def __parse_point(shape):
+        """
+        Parses the geometry of an address, a WKT point 'POINT (longitude latitude)' in EPSG:4326.
+
+        :param shape: The geometry as a string
+        :return: (latitude, longitude) tuple, None if the geometry is not a valid point
+        """
+        if not shape.startswith("POINT"):
+            return None
+        try:
+            longitude, latitude = (float(value) for value in shape[shape.index("(") + 1:shape.rindex(")")].split())
+        except ValueError:
+            return None
+        return latitude, longitude
+
     def __parse_csv_data(self, data):
         """
         Parses comma-separated tabular data.
         Expects data to have a header row which is omitted during the parse.
-        Appends formatted address strings to self.addresses.
+        Appends formatted address strings to self.addresses and their coordinates to self.coordinates.
 
         :param data: Input CSV data as a string
         """
@@ -80,6 +103,7 @@ class AddressDownloader:
         for row in csv_reader:
             if len(row) > 1:  # Check that row has enough content to prevent IndexErrors
                 self.addresses.append(f'{row[2]}, {row[4]}')
+                self.coordinates.append(self.__parse_point(row[1]))
 
     def download_data(self):
         """
@@ -91,6 +115,15 @@ class AddressDownloader:
             response = self.__get_data_from_url(url, district_number)
             response and self.__parse_csv_data(response)
 
+    def load_file(self, csv_path):
+        """
+        Reads, parses and stores addresses from a local CSV file.
+
+        :param csv_path: Path of the CSV file
+        """
+        with open(csv_path, encoding='utf-8') as csv_file:
+            self.__parse_csv_data(csv_file.read())
+
     def get_addresses(self):
         """
         Returns the addresses that have been downloaded.
@@ -99,6 +132,14 @@ class AddressDownloader:
         """
         return self.addresses
 
+    def get_coordinates(self):
+        """
+        Returns the coordinates of the addresses, in the same order as get_addresses().
+
+        :return: List of (latitude, longitude) tuples, None for addresses without coordinates
+        """
+        return self.coordinates
+
     def print_addresses(self):
         """
         Prints all addresses to the standard output (usually, the console).
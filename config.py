@@ -19,9 +19,53 @@ class Config:
         self.URL: Final = Config.get_env_value("URL")
         self.PORT: Final = int(Config.get_env_value("PORT"))
         self.HOST: Final = Config.get_env_value("HOST")
-        self.SURVEY_ID: Final = int(Config.get_env_value("SURVEY_ID"))
+        """ One or more comma separated survey ids; the first one is started by a plain /start """
+        self.SURVEY_IDS: Final = tuple(int(sid) for sid in Config.get_env_value("SURVEY_ID").split(",") if sid.strip())
+        self.SURVEY_ID: Final = self.SURVEY_IDS[0]
         self.MULTI_VOTE: Final = Config.str_to_bool(Config.get_env_value("MULTI_VOTE"))
         self.LANG: Final = Config.get_env_value("LANG")
+        """ Talk to every user in the language of their Telegram app if the bot and the survey support it """
+        self.USER_LANGUAGE: Final = Config.str_to_bool(Config.get_optional_env_value("USER_LANGUAGE", "False"))
+        self.WEBHOOK_SECRET: Final = Config.get_optional_env_value("WEBHOOK_SECRET", None)
+        self.UPDATE_QUEUE_SIZE: Final = int(Config.get_optional_env_value("UPDATE_QUEUE_SIZE", "1000"))
+        self.DEDUPE_WINDOW: Final = int(Config.get_optional_env_value("DEDUPE_WINDOW", "10000"))
+        self.WORKERS: Final = int(Config.get_optional_env_value("WORKERS", "1"))
+        self.BOT_API_BASE_URL: Final = Config.get_optional_env_value("BOT_API_BASE_URL", None)
+        self.ADDRESS_CSV: Final = Config.get_optional_env_value("ADDRESS_CSV", None)
+        """ Maximum number of postcode partitions of the address index kept in memory, 0 keeps all """
+        self.ADDRESS_PARTITIONS: Final = int(Config.get_optional_env_value("ADDRESS_PARTITIONS", "0"))
+        self.SURVEY_RELOAD_INTERVAL: Final = int(Config.get_optional_env_value("SURVEY_RELOAD_INTERVAL", "0"))
+        """ Write answers to LimeSurvey every this many seconds while the survey is in progress, 0 only at the end """
+        self.RESPONSE_CHECKPOINT_INTERVAL: Final = int(Config.get_optional_env_value("RESPONSE_CHECKPOINT_INTERVAL", "0"))
+        """ Protection of the bot against a slow or failing LimeSurvey, see "LimeSurvey outages" in the README """
+        self.LIMESURVEY_TIMEOUT: Final = float(Config.get_optional_env_value("LIMESURVEY_TIMEOUT", "30"))
+        self.LIMESURVEY_MAX_CONCURRENCY: Final = int(Config.get_optional_env_value("LIMESURVEY_MAX_CONCURRENCY", "16"))
+        self.LIMESURVEY_TARGET_LATENCY: Final = float(Config.get_optional_env_value("LIMESURVEY_TARGET_LATENCY", "2"))
+        self.LIMESURVEY_FAILURE_THRESHOLD: Final = int(Config.get_optional_env_value("LIMESURVEY_FAILURE_THRESHOLD",
+                                                                                     "5"))
+        self.LIMESURVEY_RESET_TIMEOUT: Final = float(Config.get_optional_env_value("LIMESURVEY_RESET_TIMEOUT", "30"))
+        """ Ranking of the address search by how often addresses were selected """
+        self.POPULARITY_CAPACITY: Final = int(Config.get_optional_env_value("POPULARITY_CAPACITY", "10000"))
+        self.POPULARITY_FILE: Final = Config.get_optional_env_value("POPULARITY_FILE", None)
+        self.POPULARITY_SAVE_INTERVAL: Final = int(Config.get_optional_env_value("POPULARITY_SAVE_INTERVAL", "300"))
+        """ Live answer counts served by /stats, saved to STATS_FILE to survive restarts """
+        self.STATS_FILE: Final = Config.get_optional_env_value("STATS_FILE", None)
+        self.STATS_SAVE_INTERVAL: Final = int(Config.get_optional_env_value("STATS_SAVE_INTERVAL", "300"))
+        self.STATS_TOKEN: Final = Config.get_optional_env_value("STATS_TOKEN", None)
+        """ Sessions idle this many seconds are compacted or written to SESSION_DB and evicted from memory, 0 keeps all """
+        self.SESSION_IDLE_TTL: Final = int(Config.get_optional_env_value("SESSION_IDLE_TTL", "0"))
+        self.SESSION_SWEEP_INTERVAL: Final = int(Config.get_optional_env_value("SESSION_SWEEP_INTERVAL", "300"))
+        self.SESSION_DB: Final = Config.get_optional_env_value("SESSION_DB", None)
+        """ Capture of the raw webhook updates for tools.replay """
+        self.CAPTURE_FILE: Final = Config.get_optional_env_value("CAPTURE_FILE", None)
+        self.CAPTURE_MAX_BYTES: Final = int(Config.get_optional_env_value("CAPTURE_MAX_BYTES", str(100 * 1024 * 1024)))
+        self.CAPTURE_BACKUPS: Final = int(Config.get_optional_env_value("CAPTURE_BACKUPS", "5"))
+        """ Diagnostics: event loop blocking detector and the admin-triggered profiler """
+        self.DIAGNOSTICS: Final = Config.str_to_bool(Config.get_optional_env_value("DIAGNOSTICS", "False"))
+        self.BLOCKING_THRESHOLD: Final = float(Config.get_optional_env_value("BLOCKING_THRESHOLD", "0.1"))
+        self.PROFILE_DIR: Final = Config.get_optional_env_value("PROFILE_DIR", "profiles")
+        self.ADMIN_IDS: Final = frozenset(int(admin_id) for admin_id in
+                                          Config.get_optional_env_value("ADMIN_IDS", "").split(",") if admin_id.strip())
         if self.LANG.lower() == "en":
             lang_messages = MESSAGES_EN
         elif self.LANG.lower() == "de":
@@ -37,6 +81,10 @@ class Config:
             "every_10_seconds": {"seconds": 10, "text": lang_messages["every_10_seconds"]},
             # approximating a month to 30 days here; this would need adjusting for different month lengths
         }
+        """ Quiet hours: questions are only pushed inside the user's send window (in the user's time zone), if any """
+        self.DEFAULT_TIMEZONE: Final = Config.get_optional_env_value("DEFAULT_TIMEZONE", "Europe/Vienna")
+        self.SEND_WINDOW: Final = Config.get_optional_env_value("SEND_WINDOW", None)
+        self.SEND_WINDOW_SPREAD: Final = int(Config.get_optional_env_value("SEND_WINDOW_SPREAD", "1800"))
         """ Define conversation states """
         self.SET_FREQUENCY: Final = 1
 
@@ -47,6 +95,13 @@ class Config:
             raise ValueError(f"{key} environment variable is not set.")
         return value
 
+    @staticmethod
+    def get_optional_env_value(key, default):
+        value = os.getenv(key)
+        if value is None:
+            return default
+        return value
+
     @staticmethod
     def str_to_bool(value):
         return value.lower() == "true"
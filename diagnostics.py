@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+""" Longest profile an admin can request, in seconds """
+MAX_PROFILE_SECONDS = 300
+
+LOOP_LAG_SECONDS = metrics.histogram("event_loop_lag_seconds", "Delay of the event loop in waking up a sleeping task")
+LOOP_BLOCKED = metrics.counter("event_loop_blocked_total", "Times the event loop was blocked longer than the threshold")
+
+
+def frame_stack(frame) -> list:
+    """
+    Returns the functions of a stack, outermost first, as 'file:function' strings.
+
+    :param frame: The innermost frame
+    :return: List of function names
+    """
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class LoopMonitor:
+    """
+    Detects callbacks blocking the event loop. A heartbeat task measures how late the loop wakes it up, and a watchdog
+    thread logs the stack of the loop thread whenever the heartbeat is overdue by more than 'threshold' seconds, i.e.
+    while the blocking call is still running.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.05):
+        """
+        Initializes the LoopMonitor object.
+
+        :param threshold: Seconds the loop may be blocked before the stack of the blocking code is logged
+        :param interval: Seconds between two heartbeats
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.__beat = time.monotonic()
+        self.__loop_thread_id = None
+        self.__task = None
+        self.__stopped = threading.Event()
+
+    def start(self):
+        """
+        Starts monitoring the running event loop.
+        """
+        self.__loop_thread_id = threading.get_ident()
+        self.__beat = time.monotonic()
+        self.__task = asyncio.create_task(self.__heartbeat())
+        threading.Thread(target=self.__watch, name="loop-watchdog", daemon=True).start()
+
+    async def stop(self):
+        """
+        Stops the heartbeat and the watchdog.
+        """
+        self.__stopped.set()
+        self.__task.cancel()
+        try:
+            await self.__task
+        except asyncio.CancelledError:
+            pass
+
+    async def __heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.__beat = time.monotonic()
+            LOOP_LAG_SECONDS.observe(max(0.0, self.__beat - started - self.interval))
+
+    def __watch(self):
+        reported = None
+        while not self.__stopped.wait(self.threshold / 2):
+            beat = self.__beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked <= self.threshold or beat == reported:
+                continue
+            """ Report every blocking call once, with the stack it is blocked in """
+            reported = beat
+            LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(self.__loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "unknown\n"
+            LOGGER.warning("Event loop blocked for more than %.3f s in:\n%s", blocked, stack)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of one thread. It samples the stack of the thread at a fixed interval and writes the counts
+    in the collapsed stack format ('outer;inner count' per line) read by flame graph tools, e.g. speedscope.
+    """
+
+    def __init__(self, directory: str, interval: float = 0.005):
+        """
+        Initializes the SamplingProfiler object.
+
+        :param directory: Directory the profiles are written to
+        :param interval: Seconds between two samples
+        """
+        self.directory = directory
+        self.interval = interval
+        self.__lock = threading.Lock()
+
+    def running(self) -> bool:
+        """
+        Returns whether a profile is being recorded.
+        """
+        return self.__lock.locked()
+
+    def profile(self, seconds: float, thread_id: int) -> tuple:
+        """
+        Samples the stack of a thread for the given time and writes the profile to a file. Blocks while sampling, so
+        call it from another thread than the profiled one.
+
+        :param seconds: Duration of the profile
+        :param thread_id: Id of the thread to profile, e.g. the thread of the event loop
+        :return: Tuple of the path of the profile and the number of samples
+        """
+        if not self.__lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already being recorded")
+        try:
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    stacks[";".join(frame_stack(frame))] += 1
+                del frame
+                time.sleep(self.interval)
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded"
+            path = os.path.join(self.directory, name)
+            with open(path, "w", encoding="utf-8") as output:
+                for stack, count in stacks.most_common():
+                    output.write(f"{stack} {count}\n")
+            return path, sum(stacks.values())
+        finally:
+            self.__lock.release()
@@ -0,0 +1,108 @@
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+""" Tags Telegram renders with parse_mode HTML, mapped to the name sent to Telegram """
+TELEGRAM_TAGS = {
+    "b": "b", "strong": "b",
+    "i": "i", "em": "i",
+    "u": "u", "ins": "u",
+    "s": "s", "strike": "s", "del": "s",
+    "code": "code", "pre": "pre", "blockquote": "blockquote", "a": "a",
+}
+
+""" Tags whose content is code rather than text, dropped with it """
+HIDDEN_TAGS = frozenset(("script", "style"))
+
+""" Tags starting a new line """
+LINE_BREAK_TAGS = frozenset(("br", "p", "div", "tr", "h1", "h2", "h3", "h4", "h5", "h6"))
+
+
+class TelegramHTMLNormalizer(HTMLParser):
+    """
+    Converts the HTML of LimeSurvey question texts to the subset of HTML Telegram accepts in a single pass over the
+    text: images are removed and collected with absolute URLs, line breaks and paragraphs become newlines, list items
+    become bullets, supported formatting is kept, scripts and styles are dropped, every other tag is dropped (keeping
+    its text) and text is escaped.
+    Unclosed formatting tags are closed, as Telegram rejects unbalanced markup.
+    """
+
+    def __init__(self, base_url: str = ""):
+        """
+        Initializes the TelegramHTMLNormalizer object.
+
+        :param base_url: URL relative image sources are resolved against, e.g. the address of LimeSurvey
+        """
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.__parts = []
+        self.__images = []
+        self.__open_tags = []
+        self.__hidden_depth = 0
+
+    def normalize(self, text: str) -> tuple:
+        """
+        Normalizes a question text.
+
+        :param text: HTML text of the question
+        :return: Tuple of the Telegram HTML text and the list of image URLs
+        """
+        self.reset()
+        self.__parts, self.__images, self.__open_tags = [], [], []
+        self.__hidden_depth = 0
+        self.feed(text)
+        self.close()
+        for tag in reversed(self.__open_tags):
+            self.__parts.append(f"</{tag}>")
+        return "".join(self.__parts).strip(), self.__images
+
+    def handle_starttag(self, tag: str, attrs: list):
+        if tag in HIDDEN_TAGS:
+            self.__hidden_depth += 1
+        elif self.__hidden_depth:
+            return
+        elif tag == "img":
+            src = dict(attrs).get("src")
+            if src:
+                self.__images.append(urljoin(self.base_url, src) if self.base_url else src)
+        elif tag in LINE_BREAK_TAGS:
+            self.__parts.append("\n")
+        elif tag == "li":
+            self.__parts.append("\n• ")
+        elif tag in TELEGRAM_TAGS:
+            name = TELEGRAM_TAGS[tag]
+            if name == "a":
+                href = dict(attrs).get("href")
+                if not href:
+                    return
+                self.__parts.append(f'<a href="{escape(href)}">')
+            else:
+                self.__parts.append(f"<{name}>")
+            self.__open_tags.append(name)
+
+    def handle_startendtag(self, tag: str, attrs: list):
+        """ Self-closing tags like <br /> and <img /> have no content """
+        if tag in TELEGRAM_TAGS or tag in HIDDEN_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str):
+        if tag in HIDDEN_TAGS:
+            self.__hidden_depth = max(0, self.__hidden_depth - 1)
+            return
+        if self.__hidden_depth:
+            return
+        name = TELEGRAM_TAGS.get(tag)
+        if name is None or name not in self.__open_tags:
+            return
+        """ Close tags opened inside the closed one first, to keep the markup balanced """
+        while self.__open_tags:
+            open_tag = self.__open_tags.pop()
+            self.__parts.append(f"</{open_tag}>")
+            if open_tag == name:
+                break
+
+    def handle_data(self, data: str):
+        if not self.__hidden_depth:
+            self.__parts.append(escape(data, quote=False))
+
@@ -5,7 +5,34 @@ from collections import OrderedDict
 import json
 import base64
 from datetime import datetime
+import logging
 from config import Config
+import metrics
+from resilience import OPEN, STATES, AdaptiveLimiter, CircuitBreaker, Unavailable
+
+LOGGER = logging.getLogger(__name__)
+
+REQUEST_SECONDS = metrics.histogram("limesurvey_request_seconds", "Duration of LimeSurvey RemoteControl calls",
+                                    ["method"])
+FAILED_CALLS = metrics.counter("limesurvey_failed_calls_total", "LimeSurvey calls which failed, by method", ["method"])
+REJECTED_CALLS = metrics.counter("limesurvey_rejected_calls_total",
+                                 "LimeSurvey calls not sent to protect LimeSurvey, by reason", ["reason"])
+CACHED_RESULTS = metrics.counter("limesurvey_cached_results_total",
+                                 "Survey definitions served from the cache instead of LimeSurvey, by method", ["method"])
+CIRCUIT_STATE = metrics.gauge("limesurvey_circuit_state", "State of the circuit breaker around LimeSurvey, 1 for the "
+                                                          "current state", ["state"])
+CIRCUIT_TRANSITIONS = metrics.counter("limesurvey_circuit_transitions_total",
+                                      "Transitions of the circuit breaker around LimeSurvey, by new state", ["state"])
+CONCURRENCY_LIMIT = metrics.gauge("limesurvey_concurrency_limit", "Adaptive limit of concurrent LimeSurvey calls")
+CALLS_IN_FLIGHT = metrics.gauge("limesurvey_calls_in_flight", "LimeSurvey calls in progress")
+
+""" Read-only methods fetching the survey definition, whose last results are served while LimeSurvey is unavailable """
+CACHED_METHODS = frozenset(("list_surveys", "get_survey_properties", "list_groups", "list_questions",
+                            "get_question_properties"))
+
+
+class LimeSurveyError(RuntimeError):
+    """ Raised for LimeSurvey calls which failed """
 
 
 class LimeSurveyHandler:
@@ -31,21 +58,39 @@ class LimeSurveyHandler:
             if survey["sid"] == sid:
                 return survey
 
-    def list_groups(self, sid: int):
+    def survey_languages(self, sid: int) -> list:
+        """
+        This method returns the languages of a survey.
+        :param sid: The id of the survey.
+        :return: List of language codes, the base language first; empty if LimeSurvey does not tell them
+        """
+        properties = self.query.execute_method("get_survey_properties", iSurveyID=sid,
+                                               aSurveyProperties=["language", "additional_languages"])
+        if not isinstance(properties, dict) or 'status' in properties or not properties.get("language"):
+            return []
+        return [properties["language"], *(properties.get("additional_languages") or "").split()]
+
+    def list_groups(self, sid: int, language: str = None):
         """
         This method returns a list of groups for a given survey.
         :param sid: The id of the survey.
+        :param language: The language of the group texts, None for the base language of the survey.
         :return: List of groups
         """
+        if language:
+            return self.query.execute_method("list_groups", iSurveyID=sid, sLanguage=language)
         return self.query.execute_method("list_groups", iSurveyID=sid)
 
-    def list_questions(self, sid: int, gid: int):
+    def list_questions(self, sid: int, gid: int, language: str = None):
         """
         This method returns a list of all questions for a given group in a survey.
         :param sid: The id of the survey.
         :param gid: The id of the group.
+        :param language: The language of the question texts, None for the base language of the survey.
         :return: List of questions in the group
         """
+        if language:
+            return self.query.execute_method("list_questions", iSurveyID=sid, iGroupID=gid, sLanguage=language)
         return self.query.execute_method("list_questions", iSurveyID=sid, iGroupID=gid)
 
     def list_survey_questions(self, sid: int):
@@ -56,46 +101,77 @@ class LimeSurveyHandler:
         """
         return self.query.execute_method("list_questions", iSurveyID=sid)
 
-    def get_question_properties(self, qid: int):
+    def get_question_properties(self, qid: int, language: str = None):
         """
         This method returns the properties of a given question.
         :param qid: The id of the question.
+        :param language: The language of the answer texts, None for the base language of the survey.
         :return: Properties of the question
         """
+        if language:
+            return self.query.execute_method("get_question_properties", iQuestionID=qid,
+                                             aQuestionSettings=["answeroptions"], sLanguage=language)
         return self.query.execute_method("get_question_properties", iQuestionID=qid,
                                          aQuestionSettings=["answeroptions"])
 
     @staticmethod
-    def _prepare_response_data(sid: int, additional_data: dict, seed="324567889"):
+    def _submit_date():
+        """
+        This method returns the current time in the format of the submit date of a response.
+        :return: The formatted date
+        """
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _prepare_response_data(sid: int, additional_data: dict, seed="324567889", completed=True, language=None):
         """
         This method prepares the dictionary for the response data of a survey.
         :param sid:  An integer, represents the survey ID.
         :param additional_data:  A dictionary, represents additional data to be included in the response.
         :param seed: A string, represents the seed value for the response, default is "324567889".
+        :param completed: A boolean, whether the response is complete. Incomplete responses have no submit date.
+        :param language: A string, the language the survey was answered in, default is "en".
         :return: A dictionary, carrying the prepared response data.
         """
-        now = datetime.now()
-        formatted_date = now.strftime("%Y-%m-%d %H:%M:%S")
-        return {
+        response_data = {
             "iSurveyID": sid,
-            "submitdate": formatted_date,
+            "submitdate": LimeSurveyHandler._submit_date(),
             "lastpage": 1,
-            "startlanguage": "en",
+            "startlanguage": language or "en",
             "seed": seed,
             **additional_data
         }
+        if not completed:
+            del response_data["submitdate"]
+        return response_data
 
-    def save_response(self, sid: int, seed: str, rdata: dict):
+    def save_response(self, sid: int, seed: str, rdata: dict, completed=True, language=None):
         """
         This method saves the response of a survey.
         :param sid: The id of the survey.
         :param seed: Seed for random data generation.
         :param rdata: Response data to save.
-        :return: Added response
+        :param completed: Whether the response is complete, False saves a partial response.
+        :param language: The language the survey was answered in.
+        :return: Id of the added response
         """
-        response_data = self._prepare_response_data(sid, rdata, seed)
+        response_data = self._prepare_response_data(sid, rdata, seed, completed, language)
         return self.query.execute_method("add_response", iSurveyID=sid, aResponseData=response_data)
 
+    def update_response(self, sid: int, response_id: int, rdata: dict, completed=False):
+        """
+        This method updates the answers of a saved response of a survey.
+        :param sid: The id of the survey.
+        :param response_id: The id of the response returned by save_response.
+        :param rdata: Response data to update.
+        :param completed: Whether the response is complete now, which sets its submit date.
+        :return: True if the response was updated
+        """
+        response_data = {"id": response_id, **rdata}
+        if completed:
+            response_data["submitdate"] = self._submit_date()
+        return self.query.execute_method("update_response", iSurveyID=sid, aResponseData=response_data)
+
     def export_responses(self, sid: int):
         """
         This method exports the responses of a survey in csv format.
@@ -149,13 +225,46 @@ class LimeSurveyHandler:
 
 
 class Query:
+    """
+    Calls the RemoteControl API of LimeSurvey. A slow or failing LimeSurvey should neither pile up blocked threads in
+    the bot nor be overwhelmed further: every call has a timeout, an AdaptiveLimiter adapts the number of concurrent
+    calls to the observed latency, and a CircuitBreaker stops calling LimeSurvey after repeated failures. While calls
+    fail or are held back, reads of the survey definition are answered with their last result, so e.g. a survey reload
+    keeps the current survey; all other calls raise LimeSurveyError or resilience.Unavailable.
+    """
+
     def __init__(self, config: Config):
         self.config = config
         self.HEADERS = config.HEADERS
         self.API_URL = config.API_URL
         self.LOGIN = config.LOGIN
         self.PASSWORD = config.PASSWORD
+        self.TIMEOUT = config.LIMESURVEY_TIMEOUT
         self.sess_key = None
+        """ Keep the connections to LimeSurvey open between calls """
+        self.session = req.Session()
+        self.limiter = AdaptiveLimiter(min(4, config.LIMESURVEY_MAX_CONCURRENCY), config.LIMESURVEY_MAX_CONCURRENCY,
+                                       config.LIMESURVEY_TARGET_LATENCY, on_change=self.__limit_changed)
+        self.breaker = CircuitBreaker(config.LIMESURVEY_FAILURE_THRESHOLD, config.LIMESURVEY_RESET_TIMEOUT,
+                                      on_change=self.__circuit_changed)
+        """ Last results of the methods in CACHED_METHODS, by method and parameters """
+        self.cache = {}
+        self.__limit_changed(self.limiter.limit, 0)
+        self.__circuit_changed(None, self.breaker.state)
+
+    @staticmethod
+    def __limit_changed(limit: float, in_flight: int):
+        CONCURRENCY_LIMIT.set(int(limit))
+        CALLS_IN_FLIGHT.set(in_flight)
+
+    @staticmethod
+    def __circuit_changed(old_state, new_state: str):
+        for state in STATES:
+            CIRCUIT_STATE.labels(state).set(1 if state == new_state else 0)
+        if old_state is not None:
+            CIRCUIT_TRANSITIONS.labels(new_state).inc()
+            log = LOGGER.warning if new_state == OPEN else LOGGER.info
+            log("LimeSurvey circuit breaker: %s -> %s.", old_state, new_state)
 
     @staticmethod
     def create_request_payload(method: str, params: dict):
@@ -177,14 +286,54 @@ class Query:
         :param method: Name of method to execute.
         :param params: Parameters of method.
         :return: Response of the query
+        :raises LimeSurveyError: If the call failed and no cached result can be served.
+        :raises Unavailable: If the call was held back and no cached result can be served.
         """
         data = json.dumps(self.create_request_payload(method, params))
+        """ The session key changes, the definition of the survey does not """
+        cache_key = (method, json.dumps({key: value for key, value in params.items() if key != "sSessionKey"},
+                                        sort_keys=True)) if method in CACHED_METHODS else None
         try:
-            response = req.post(self.API_URL, headers=self.HEADERS, data=data)
-            return response.json()
-        except Exception as e:
-            print(f"Error querying {method}: {e}")
-            return []
+            self.breaker.before_call()
+        except Unavailable as err:
+            REJECTED_CALLS.labels("circuit_open").inc()
+            return self.__cached(method, cache_key, err)
+        try:
+            started = self.limiter.acquire(self.TIMEOUT)
+        except Unavailable as err:
+            self.breaker.cancel()
+            REJECTED_CALLS.labels("overloaded").inc()
+            return self.__cached(method, cache_key, err)
+        try:
+            response = self.session.post(self.API_URL, headers=self.HEADERS, data=data, timeout=self.TIMEOUT)
+            response.raise_for_status()
+            result = response.json()
+        except (req.RequestException, ValueError) as err:
+            self.limiter.release(started, False)
+            self.breaker.record(False)
+            FAILED_CALLS.labels(method).inc()
+            return self.__cached(method, cache_key, LimeSurveyError(f"Error querying {method}: {err}"))
+        self.limiter.release(started, True)
+        self.breaker.record(True)
+        if cache_key is not None and isinstance(result, dict) and not self.__is_error(result.get("result")):
+            self.cache[cache_key] = result
+        return result
+
+    def __cached(self, method: str, cache_key, error: Exception):
+        """
+        This method returns the last result of a read of the survey definition instead of a failed or held back call.
+        :raises: 'error' if there is no cached result.
+        """
+        if cache_key is None or cache_key not in self.cache:
+            raise error
+        CACHED_RESULTS.labels(method).inc()
+        LOGGER.debug("Serving the cached result of %s: %s", method, error)
+        return self.cache[cache_key]
+
+    @staticmethod
+    def __is_error(result) -> bool:
+        """ RemoteControl reports errors as {"status": "<error>"} results """
+        return result is None or (isinstance(result, dict) and "status" in result)
 
     def execute_method(self, method: str, **kwargs):
         """
@@ -199,7 +348,13 @@ class Query:
             ("sSessionKey", self.sess_key),
             *[(k, v) for k, v in kwargs.items()]
         ])
-        return self.query(method, params)["result"]
+        with REQUEST_SECONDS.labels(method).time():
+            response = self.query(method, params)
+        if not isinstance(response, dict) or "result" not in response:
+            raise LimeSurveyError(f"Invalid response to {method}: {response}")
+        if response.get("error"):
+            raise LimeSurveyError(f"{method} failed: {response['error']}")
+        return response["result"]
 
     def _get_session_key(self):
         """
@@ -1,6 +1,8 @@
 MESSAGES = {
     "help_info": "/help: Hilfe anzeigen\n/start: Starte den Umfrage Bot\n/setfrequency: Frequenz festlegen\n/cancel: "
-                 "Umfrage abbrechen\n",
+                 "Umfrage abbrechen\n/settimezone: Zeitzone festlegen\n/setwindow: Tageszeit für Fragen festlegen\n"
+                 "Bei der Frage nach einer Adresse können Sie auch Ihren Standort teilen, um aus den nächstgelegenen "
+                 "Adressen zu wählen.\n",
     "cancel_msg": "Tschüss! Ich hoffe, wir können uns eines Tages wieder unterhalten.",
     "stop_msg": "Ok, Tschüss.",
     "welcome_msg": "Willkommen {user_name}! Lassen Sie uns mit den Fragen beginnen.",
@@ -20,4 +22,30 @@ MESSAGES = {
     "every_10_seconds": "Alle 10 Sekunden",
     "select_msg": "{address} genehmigen",
     "search_msg": "Klicken Sie hier, um die Adresse durch Eintippen zu suchen",
+    "timezone_usage": "Verwendung: /settimezone <Zeitzone>, z.B. /settimezone Europe/Vienna",
+    "invalid_timezone": "Unbekannte Zeitzone: {timezone}",
+    "timezone_set": "Zeitzone eingestellt auf: {timezone}",
+    "send_window_usage": "Verwendung: /setwindow HH:MM-HH:MM, z.B. /setwindow 08:00-21:00",
+    "invalid_send_window": "Ungültiges Zeitfenster: {window}",
+    "send_window_set": "Fragen werden nur zwischen {window} gesendet",
+    "survey_warming_up": "Die Umfrage wird vorbereitet. Bitte versuchen Sie /start in einer Minute erneut.",
+    "nearest_addresses_msg": "Adressen in Ihrer Nähe:",
+    "no_address_nearby": "Keine Adresse in Ihrer Nähe gefunden, bitte suchen Sie sie durch Eintippen.",
+    "location_not_expected": "Bitte teilen Sie Ihren Standort, wenn Sie nach einer Adresse gefragt werden.",
+    "survey_not_ready": "Die Umfrage wird vorbereitet, bitte versuchen Sie es in einer Minute erneut.",
+    "address_search_warming_up": "Die Adresssuche wird vorbereitet, bitte versuchen Sie es in einer Minute erneut.",
+    "admin_help_info": "/h: Diese Admin-Hilfe anzeigen\n/profile <Sekunden>: Ein Sampling-Profil des Bots aufzeichnen\n"
+                       "/reload: Die Umfrage neu aus LimeSurvey laden\n/stats: Anzeigen, wie oft jede Antwort gewählt "
+                       "wurde\n",
+    "survey_reloaded": "{surveys} Umfragen neu geladen, {participants} Teilnehmende setzen darauf fort.",
+    "unknown_survey": "Diese Umfrage ist nicht verfügbar.",
+    "outdated_answer_msg": "Diese Frage wird nicht mehr gestellt, bitte beantworten Sie die aktuelle.",
+    "survey_reload_failed": "Das Neuladen der Umfrage ist fehlgeschlagen, die aktuelle bleibt aktiv: {error}",
+    "profile_usage": "Verwendung: /profile <Sekunden>, z.B. /profile 30 (höchstens {max_seconds} Sekunden)",
+    "profile_running": "Es wird bereits ein Profil aufgezeichnet.",
+    "profile_started": "Profil wird {seconds} Sekunden lang aufgezeichnet...",
+    "profile_done": "Profil mit {samples} Stichproben nach {path} geschrieben",
+    "stats_survey": "Umfrage {sid}: {completed} abgeschlossene Antworten",
+    "stats_answer": "  {answer}: {count} ({percent}%)",
+    "stats_empty": "Noch keine Antworten.",
 }
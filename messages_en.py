@@ -1,6 +1,7 @@
 MESSAGES = {
     "help_info": "/help: Show help info\n/start: Start the Survey Bot\n/setfrequency: Set frequency\n/cancel: Cancel "
-                 "the survey\n",
+                 "the survey\n/settimezone: Set your time zone\n/setwindow: Set the time of day for questions\n"
+                 "When asked for an address, you can also share your location to choose from the nearest addresses.\n",
     "cancel_msg": "Bye! I hope we can talk again some day.",
     "stop_msg": "Okay, bye.",
     "welcome_msg": "Welcome {user_name}! Let's get started with the questions.",
@@ -20,4 +21,29 @@ MESSAGES = {
     "every_10_seconds": "Every 10 seconds",
     "select_msg": "Approve {address}",
     "search_msg": "Click here to search address by starting to type it",
+    "timezone_usage": "Usage: /settimezone <time zone>, e.g. /settimezone Europe/Vienna",
+    "invalid_timezone": "Unknown time zone: {timezone}",
+    "timezone_set": "Time zone set to: {timezone}",
+    "send_window_usage": "Usage: /setwindow HH:MM-HH:MM, e.g. /setwindow 08:00-21:00",
+    "invalid_send_window": "Invalid time window: {window}",
+    "send_window_set": "Questions will only be sent between {window}",
+    "survey_warming_up": "The survey is being prepared. Please try /start again in a minute.",
+    "nearest_addresses_msg": "Addresses near your location:",
+    "no_address_nearby": "No address found near your location, please search it by typing it.",
+    "location_not_expected": "Please share your location when you are asked for an address.",
+    "survey_not_ready": "The survey is being prepared, please try again in a minute.",
+    "address_search_warming_up": "The address search is warming up, please try again in a minute.",
+    "admin_help_info": "/h: Show this admin help\n/profile <seconds>: Record a sampling profile of the bot\n"
+                       "/reload: Reload the survey from LimeSurvey\n/stats: Show how often every answer was chosen\n",
+    "survey_reloaded": "{surveys} surveys reloaded, {participants} participants continue on them.",
+    "unknown_survey": "This survey is not available.",
+    "outdated_answer_msg": "This question is no longer asked, please answer the current one.",
+    "survey_reload_failed": "Reloading the survey failed, the current one is kept: {error}",
+    "profile_usage": "Usage: /profile <seconds>, e.g. /profile 30 (at most {max_seconds} seconds)",
+    "profile_running": "A profile is already being recorded.",
+    "profile_started": "Recording a profile for {seconds} seconds...",
+    "profile_done": "Profile with {samples} samples written to {path}",
+    "stats_survey": "Survey {sid}: {completed} completed responses",
+    "stats_answer": "  {answer}: {count} ({percent}%)",
+    "stats_empty": "No answers yet.",
 }
@@ -0,0 +1,273 @@
+import threading
+import time
+from bisect import bisect_left
+
+""" Default latency buckets in seconds """
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """
+    Base class of all metrics. A metric either keeps its own values (one child per combination of label values) or
+    reads them from 'function' when it is collected.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function=None):
+        """
+        Initializes the Metric object.
+
+        :param name: Name of the metric
+        :param documentation: Help text of the metric
+        :param labelnames: Names of the labels of the metric
+        :param function: Optional callable returning the current value, or a dict of label values tuple to value
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self.__children = {}
+        self.__lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Returns the child of the metric for the given label values.
+
+        :param values: One value per label name
+        :return: The child metric
+        """
+        child = self.__children.get(values)
+        if child is None:
+            with self.__lock:
+                child = self.__children.setdefault(values, self._new_child())
+        return child
+
+    def reset(self):
+        """
+        Drops all values recorded so far.
+        """
+        with self.__lock:
+            self.__children = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _child_samples(self, child, labels: tuple) -> list:
+        raise NotImplementedError
+
+    def collect(self) -> dict:
+        """
+        Returns the current state of the metric as family dictionary, see render().
+
+        :return: Dictionary with name, type, help text and samples
+        """
+        samples = []
+        if self.function is not None:
+            value = self.function()
+            values = value if isinstance(value, dict) else {(): value}
+            for label_values, sample in values.items():
+                samples.append((self.name, tuple(zip(self.labelnames, label_values)), sample))
+        else:
+            for label_values, child in list(self.__children.items()):
+                samples.extend(self._child_samples(child, tuple(zip(self.labelnames, label_values))))
+        return {"name": self.name, "type": self.kind, "help": self.documentation, "samples": samples}
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing counter.
+    """
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _child_samples(self, child, labels: tuple) -> list:
+        return [(self.name, labels, child.value)]
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down.
+    """
+    kind = "gauge"
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "buckets", "sum", "count")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.buckets = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, usually latencies in seconds, counted in fixed buckets.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def _child_samples(self, child, labels: tuple) -> list:
+        samples = []
+        cumulative = 0
+        for upper_bound, count in zip(self.upper_bounds + (float("inf"),), child.buckets):
+            cumulative += count
+            bound = "+Inf" if upper_bound == float("inf") else repr(upper_bound)
+            samples.append((f"{self.name}_bucket", labels + (("le", bound),), cumulative))
+        samples.append((f"{self.name}_sum", labels, child.sum))
+        samples.append((f"{self.name}_count", labels, child.count))
+        return samples
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        """
+        Returns a context manager observing the time spent inside it.
+        """
+        return self.labels().time()
+
+
+class Registry:
+    """
+    Collection of the metrics of a process.
+    """
+
+    def __init__(self):
+        self.__metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Registers a metric, replacing an earlier one with the same name.
+
+        :param metric: The metric
+        :return: The registered metric
+        """
+        self.__metrics[metric.name] = metric
+        return metric
+
+    def reset(self):
+        """
+        Drops all values recorded so far, e.g. the values inherited by a forked process.
+        """
+        for metric in list(self.__metrics.values()):
+            metric.reset()
+
+    def collect(self) -> list:
+        """
+        Collects all registered metrics.
+
+        :return: List of family dictionaries
+        """
+        return [metric.collect() for metric in list(self.__metrics.values())]
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames=(), function=None) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames, function))
+
+
+def gauge(name: str, documentation: str, labelnames=(), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def with_labels(families: list, labels: dict) -> list:
+    """
+    Adds constant labels to every sample of the given families, e.g. the index of the worker they come from.
+
+    :param families: List of family dictionaries
+    :param labels: Labels to add
+    :return: New list of family dictionaries
+    """
+    extra = tuple(labels.items())
+    return [{**family, "samples": [(name, extra + sample_labels, value)
+                                   for name, sample_labels, value in family["samples"]]}
+            for family in families]
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(families: list) -> str:
+    """
+    Renders metric families in the Prometheus text exposition format. Families with the same name (e.g. from several
+    processes) are merged.
+
+    :param families: List of family dictionaries
+    :return: The exposition text
+    """
+    merged = {}
+    for family in families:
+        if family["name"] in merged:
+            merged[family["name"]]["samples"] = merged[family["name"]]["samples"] + family["samples"]
+        else:
+            merged[family["name"]] = dict(family)
+    lines = []
+    for family in merged.values():
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family["samples"]:
+            label_text = ",".join(f'{key}="{value_text}"' for key, value_text in
+                                  ((key, str(label).replace("\\", "\\\\").replace('"', '\\"')) for key, label in labels))
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+import glob
+import heapq
+import json
+import logging
+import os
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SpaceSaving:
+    """
+    Space-Saving sketch of the most frequent items of a stream (Metwally et al.), in bounded memory: at most 'capacity'
+    items are counted. When a new item arrives and the sketch is full, the least counted item is replaced and the new
+    one inherits its count, so frequent items are never undercounted and rare ones are overcounted by at most the
+    smallest count.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Initializes the SpaceSaving object.
+
+        :param capacity: Maximum number of counted items
+        """
+        self.capacity = capacity
+        """ Counts by item, read directly for ranking """
+        self.counts = {}
+        """ Min-heap of (count, item); entries whose count is outdated are skipped when popped """
+        self.__heap = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, item, count: int = 1):
+        """
+        Counts an occurrence of an item.
+
+        :param item: The item, e.g. the id of an address
+        :param count: Number of occurrences
+        """
+        if item not in self.counts and len(self.counts) >= self.capacity:
+            evicted_count = self.__pop_min()
+            self.counts[item] = evicted_count + count
+        else:
+            self.counts[item] = self.counts.get(item, 0) + count
+        heapq.heappush(self.__heap, (self.counts[item], item))
+        if len(self.__heap) > 4 * self.capacity:
+            """ Drop the outdated entries """
+            self.__heap = [(item_count, counted) for counted, item_count in self.counts.items()]
+            heapq.heapify(self.__heap)
+
+    def __pop_min(self) -> int:
+        """
+        Removes the least counted item and returns its count.
+        """
+        while True:
+            item_count, item = heapq.heappop(self.__heap)
+            if self.counts.get(item) == item_count:
+                del self.counts[item]
+                return item_count
+
+    def most_common(self, n: int = None) -> list:
+        """
+        Returns the most counted items.
+
+        :param n: Number of items, all if None
+        :return: List of (item, count) tuples, most counted first
+        """
+        items = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)
+        return items if n is None else items[:n]
+
+
+def save_counts(path: str, counts: dict):
+    """
+    Writes counts to a JSON file. The file is replaced at once, so a crash while writing keeps the previous one.
+
+    :param path: Path of the file
+    :param counts: Dictionary of key (a string) to count
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as output:
+        json.dump(counts, output, ensure_ascii=False)
+    os.replace(temporary_path, temporary_path[:-len(".tmp")])
+
+
+def load_counts(path: str, worker_files: bool = True) -> dict:
+    """
+    Reads counts written by save_counts from 'path' and from the files of the workers of a multi-process deployment
+    ('path.<worker index>'), adding up the counts of the same key.
+
+    :param path: Path of the file
+    :param worker_files: Whether to add the counts in the files of the workers
+    :return: Dictionary of key to count, empty if there are no files
+    """
+    counts = {}
+    file_paths = [path] + (sorted(glob.glob(f"{glob.escape(path)}.*")) if worker_files else [])
+    for file_path in file_paths:
+        if file_path.endswith(".tmp") or not os.path.isfile(file_path):
+            continue
+        try:
+            with open(file_path, encoding="utf-8") as input_file:
+                for key, count in json.load(input_file).items():
+                    counts[key] = counts.get(key, 0) + int(count)
+        except (OSError, ValueError) as err:
+            LOGGER.error("Could not read the counts in %s: %s", file_path, err)
+    return counts
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import threading
+import time
+
+import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+""" Seconds to wait before loading a failed component again, doubled after every failure up to the maximum """
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 300
+
+
+class Readiness:
+    """
+    Startup state of the components the bot loads in the background, e.g. the survey data and the address index.
+    The state of a component is either set by its loader or read from a probe, e.g. a flag set by another process.
+    """
+
+    def __init__(self):
+        self.__states = {}
+        self.__probes = {}
+        metrics.gauge("component_ready", "Whether a component finished loading (1) or not (0)", ["component"],
+                      function=lambda: {(name,): int(state == READY) for name, state in self.states().items()})
+
+    def add(self, name: str, probe=None):
+        """
+        Adds a component which is still loading.
+
+        :param name: Name of the component
+        :param probe: Optional callable returning True once the component is ready
+        """
+        self.__states[name] = LOADING
+        if probe is not None:
+            self.__probes[name] = probe
+
+    def set_state(self, name: str, state: str):
+        """
+        Sets the state of a component, also from other threads.
+
+        :param name: Name of the component
+        :param state: LOADING, READY or FAILED
+        """
+        self.__states[name] = state
+
+    def is_ready(self, name: str) -> bool:
+        """
+        Returns whether the component is ready to be used.
+
+        :param name: Name of the component
+        :return: True if the component is ready
+        """
+        probe = self.__probes.get(name)
+        if probe is not None and self.__states[name] != READY and probe():
+            self.__states[name] = READY
+        return self.__states.get(name) == READY
+
+    def states(self) -> dict:
+        """
+        Returns the state of every component.
+
+        :return: Dictionary of component name to LOADING, READY or FAILED
+        """
+        return {name: READY if self.is_ready(name) else self.__states[name] for name in list(self.__states)}
+
+    def all_ready(self) -> bool:
+        return all(state == READY for state in self.states().values())
+
+    async def load(self, name: str, loader, on_loaded):
+        """
+        Loads a component in a background thread, so the event loop keeps serving requests meanwhile. Failed loads
+        are retried until they succeed, the component is reported as failed in between.
+
+        :param name: Name of the component
+        :param loader: Blocking callable building the component
+        :param on_loaded: Callable receiving the built component, called on the event loop before it is marked ready
+        """
+        component = await in_daemon_thread(load_with_retry, name, loader, lambda: self.set_state(name, FAILED))
+        on_loaded(component)
+        self.set_state(name, READY)
+        LOGGER.info("%s is ready.", name)
+
+
+def load_with_retry(name: str, loader, on_failure=None):
+    """
+    Calls a blocking loader until it succeeds, waiting longer after every failure.
+
+    :param name: Name of the component, for logging
+    :param loader: Blocking callable building the component
+    :param on_failure: Optional callable invoked after every failed attempt
+    :return: The built component
+    """
+    delay = RETRY_DELAY
+    while True:
+        try:
+            return loader()
+        except Exception as err:
+            LOGGER.error("Loading %s failed, retrying in %s s: %s", name, delay, err)
+            if on_failure is not None:
+                on_failure()
+            time.sleep(delay)
+            delay = min(2 * delay, MAX_RETRY_DELAY)
+
+
+def in_daemon_thread(function, *args) -> asyncio.Future:
+    """
+    Runs a blocking function in a new daemon thread. Unlike asyncio.to_thread, a shutdown of the bot does not wait
+    for it, e.g. for a slow address download to finish.
+
+    :param function: The blocking function
+    :param args: Its arguments
+    :return: Future resolved with the result of the function
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run():
+        try:
+            result, error = function(*args), None
+        except Exception as err:
+            result, error = None, err
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            """ The event loop has been closed meanwhile """
+            pass
+
+    threading.Thread(target=run, name="component-loader", daemon=True).start()
+    return future
@@ -0,0 +1,294 @@
+import logging
+import re
+
+LOGGER = logging.getLogger(__name__)
+
+""" Tokens of LimeSurvey relevance equations (ExpressionScript); SGQA codes like 123456X1X11.NAOK before numbers """
+TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<sgqa>\d+X\d+X\d+\w*(?:\.[A-Za-z]+)?)
+      | (?P<number>\d+(?:\.\d*)?|\.\d+)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z]+)?)
+      | (?P<operator>==|!=|<=|>=|&&|\|\||[<>!+\-*/(),{}])
+    )""", re.VERBOSE)
+
+""" Word operators and their symbols """
+WORD_OPERATORS = {"and": "&&", "or": "||", "not": "!", "eq": "==", "ne": "!=", "lt": "<", "le": "<=", "gt": ">",
+                  "ge": ">="}
+
+""" Suffixes of variables which all mean the answer code here """
+ANSWER_SUFFIXES = frozenset(("", "NAOK", "code", "value", "valueNAOK"))
+
+
+class RelevanceError(ValueError):
+    """ Raised for relevance equations the compiler does not understand """
+
+
+def always_relevant(answers: dict) -> bool:
+    """ The relevance of questions without an equation """
+    return True
+
+
+def _number(value):
+    """
+    Returns a value as a number if it looks like one (answer codes are strings), None otherwise.
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_true(value) -> bool:
+    """ Truthiness as in PHP: '', '0' and 0 are false """
+    return bool(value) and value != "0"
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == ""
+
+
+def _compare(operator: str):
+    """
+    Returns a comparison of two values: numerically if both look like numbers, otherwise as strings, like LimeSurvey.
+    """
+    compare = {
+        "==": lambda left, right: left == right,
+        "!=": lambda left, right: left != right,
+        "<": lambda left, right: left < right,
+        "<=": lambda left, right: left <= right,
+        ">": lambda left, right: left > right,
+        ">=": lambda left, right: left >= right,
+    }[operator]
+
+    def comparison(left, right) -> bool:
+        left_number, right_number = _number(left), _number(right)
+        if left_number is not None and right_number is not None:
+            return compare(left_number, right_number)
+        if operator in ("==", "!=") and (_is_empty(left) or _is_empty(right)):
+            return compare(_is_empty(left), _is_empty(right))
+        return compare("" if left is None else str(left), "" if right is None else str(right))
+    return comparison
+
+
+def _arithmetic(operator: str):
+    def arithmetic(left, right):
+        left_number, right_number = _number(left), _number(right)
+        if operator == "+" and (left_number is None or right_number is None):
+            """ '+' joins strings """
+            return f"{'' if left is None else left}{'' if right is None else right}"
+        left_number, right_number = left_number or 0, right_number or 0
+        if operator == "+":
+            return left_number + right_number
+        if operator == "-":
+            return left_number - right_number
+        if operator == "*":
+            return left_number * right_number
+        return left_number / right_number if right_number else ""
+    return arithmetic
+
+
+""" Functions of ExpressionScript, called with the evaluated arguments """
+FUNCTIONS = {
+    "is_empty": lambda value: _is_empty(value),
+    "count": lambda *values: sum(1 for value in values if not _is_empty(value)),
+    "sum": lambda *values: sum(_number(value) or 0 for value in values),
+    "min": lambda *values: min(_number(value) or 0 for value in values),
+    "max": lambda *values: max(_number(value) or 0 for value in values),
+    "intval": lambda value: int(_number(value) or 0),
+    "floatval": lambda value: float(_number(value) or 0),
+    "strlen": lambda value: len("" if value is None else str(value)),
+    "in_array": lambda value, *values: any(_compare("==")(value, other) for other in values),
+}
+
+
+class RelevanceCompiler:
+    """
+    Compiles LimeSurvey relevance equations into Python closures. The equation is parsed once by recursive descent
+    and every node of the syntax tree becomes a closure calling the closures of its children, so evaluating it for a
+    participant only takes a few function calls and dictionary lookups. Variables are resolved to question codes when
+    compiling, so the closures read the answers straight from the user data.
+    """
+
+    def __init__(self, variables: dict):
+        """
+        Initializes the RelevanceCompiler object.
+
+        :param variables: Dictionary of variable name (the question code in LimeSurvey, e.g. 'Q1', or the SGQA code) to
+            the key of the answer in the user data
+        """
+        self.variables = variables
+        self.__tokens = []
+        self.__position = 0
+
+    def compile(self, expression: str):
+        """
+        Compiles a relevance equation.
+
+        :param expression: The equation, e.g. '((Q1.NAOK == "A1"))'; empty or '1' for questions which are always shown
+        :return: Function of the answers (a dictionary like the user data) returning whether the question is shown
+        """
+        if expression is None or expression.strip() in ("", "1"):
+            return always_relevant
+        self.__tokens = self.__tokenize(expression)
+        self.__position = 0
+        node = self.__or()
+        if self.__peek() is not None:
+            raise RelevanceError(f"Unexpected '{self.__peek()[1]}' in {expression!r}")
+
+        def relevant(answers: dict) -> bool:
+            try:
+                return _is_true(node(answers))
+            except Exception as err:
+                """ Show the question rather than skipping it on an equation failing for these answers """
+                LOGGER.warning("Relevance equation %r failed: %s", expression, err)
+                return True
+        return relevant
+
+    @staticmethod
+    def __tokenize(expression: str) -> list:
+        tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = TOKEN.match(expression, position)
+            if match is None:
+                raise RelevanceError(f"Unexpected character at {position} in {expression!r}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "name" and value.lower() in WORD_OPERATORS:
+                kind, value = "operator", WORD_OPERATORS[value.lower()]
+            elif kind == "operator" and value in "{}":
+                """ Curly braces wrap equations in question texts, treat them as parentheses """
+                value = "(" if value == "{" else ")"
+            tokens.append((kind, value))
+            position = match.end()
+        return tokens
+
+    def __peek(self):
+        return self.__tokens[self.__position] if self.__position < len(self.__tokens) else None
+
+    def __accept(self, *operators: str):
+        token = self.__peek()
+        if token is not None and token[0] == "operator" and token[1] in operators:
+            self.__position += 1
+            return token[1]
+        return None
+
+    def __expect(self, operator: str):
+        if self.__accept(operator) is None:
+            raise RelevanceError(f"Expected '{operator}'")
+
+    def __or(self):
+        node = self.__and()
+        while self.__accept("||"):
+            left, right = node, self.__and()
+            node = lambda answers, left=left, right=right: _is_true(left(answers)) or _is_true(right(answers))
+        return node
+
+    def __and(self):
+        node = self.__equality()
+        while self.__accept("&&"):
+            left, right = node, self.__equality()
+            node = lambda answers, left=left, right=right: _is_true(left(answers)) and _is_true(right(answers))
+        return node
+
+    def __binary(self, operand, operators: tuple, operation):
+        node = operand()
+        operator = self.__accept(*operators)
+        while operator:
+            left, right, apply = node, operand(), operation(operator)
+            node = lambda answers, left=left, right=right, apply=apply: apply(left(answers), right(answers))
+            operator = self.__accept(*operators)
+        return node
+
+    def __equality(self):
+        return self.__binary(self.__relational, ("==", "!="), _compare)
+
+    def __relational(self):
+        return self.__binary(self.__additive, ("<", "<=", ">", ">="), _compare)
+
+    def __additive(self):
+        return self.__binary(self.__multiplicative, ("+", "-"), _arithmetic)
+
+    def __multiplicative(self):
+        return self.__binary(self.__unary, ("*", "/"), _arithmetic)
+
+    def __unary(self):
+        operator = self.__accept("!", "-", "+")
+        if operator == "!":
+            operand = self.__unary()
+            return lambda answers: not _is_true(operand(answers))
+        if operator == "-":
+            operand = self.__unary()
+            return lambda answers: -(_number(operand(answers)) or 0)
+        if operator == "+":
+            return self.__unary()
+        return self.__primary()
+
+    def __primary(self):
+        token = self.__peek()
+        if token is None:
+            raise RelevanceError("Unexpected end of the equation")
+        kind, value = token
+        if kind == "operator":
+            self.__expect("(")
+            node = self.__or()
+            self.__expect(")")
+            return node
+        self.__position += 1
+        if kind == "string":
+            text = re.sub(r"\\(.)", r"\1", value[1:-1])
+            return lambda answers: text
+        if kind == "number":
+            number = float(value) if "." in value else int(value)
+            return lambda answers: number
+        if self.__accept("("):
+            return self.__call(value)
+        return self.__variable(value)
+
+    def __call(self, name: str):
+        function = FUNCTIONS.get(name.lower())
+        if function is None:
+            raise RelevanceError(f"Unknown function {name}")
+        arguments = []
+        if not self.__accept(")"):
+            arguments.append(self.__or())
+            while self.__accept(","):
+                arguments.append(self.__or())
+            self.__expect(")")
+        return lambda answers: function(*[argument(answers) for argument in arguments])
+
+    def __variable(self, name: str):
+        lowered = name.lower()
+        if lowered in ("true", "false"):
+            constant = lowered == "true"
+            return lambda answers: constant
+        variable, _, suffix = name.partition(".")
+        if suffix not in ANSWER_SUFFIXES:
+            raise RelevanceError(f"Unsupported variable attribute {name}")
+        key = self.variables.get(variable)
+        if key is None:
+            raise RelevanceError(f"Unknown variable {variable}")
+        return lambda answers: answers.get(key, "")
+
+
+def compile_relevance(expression: str, variables: dict):
+    """
+    Compiles a relevance equation, see RelevanceCompiler. Equations the compiler does not understand are logged and
+    the question is always shown, as before relevance was evaluated.
+
+    :param expression: The equation
+    :param variables: Dictionary of variable name to the key of the answer in the user data
+    :return: Function of the answers returning whether the question is shown
+    """
+    try:
+        return RelevanceCompiler(variables).compile(expression)
+    except RelevanceError as err:
+        LOGGER.warning("Relevance equation %r is not supported, the question is always shown: %s", expression, err)
+        return always_relevant
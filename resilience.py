@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+""" States of a CircuitBreaker """
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+
+class Unavailable(RuntimeError):
+    """ Raised instead of calling a service which the CircuitBreaker or the AdaptiveLimiter holds back """
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of concurrent calls to a service by additive increase, multiplicative decrease (AIMD), like TCP
+    congestion control: every call answered within 'target_latency' raises the limit by 1/limit, i.e. by one after a
+    limit's worth of fast calls, while a slow or failed call multiplies it by 'backoff'. Calls started before the last
+    decrease do not decrease it again, so a burst of slow calls halves the limit once rather than once per call. Callers
+    beyond the limit wait for a free slot instead of piling more work onto a slow service, at most 'max_wait' seconds.
+    Used from several threads.
+    """
+
+    def __init__(self, initial_limit: int, max_limit: int, target_latency: float, min_limit: int = 1,
+                 backoff: float = 0.5, on_change=None):
+        """
+        Initializes the AdaptiveLimiter object.
+
+        :param initial_limit: The limit before any call was observed
+        :param max_limit: The highest limit
+        :param target_latency: Calls taking longer in seconds decrease the limit
+        :param min_limit: The lowest limit
+        :param backoff: Factor applied to the limit by a slow or failed call
+        :param on_change: Optional callable receiving the limit and the calls in flight after every change
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self.__on_change = on_change
+        self.__decreased_at = 0.0
+        self.__condition = threading.Condition()
+
+    def acquire(self, max_wait: float) -> float:
+        """
+        Waits for a free slot.
+
+        :param max_wait: Seconds to wait at most
+        :return: The start time of the call, to pass to release()
+        :raises Unavailable: If no slot became free in time
+        """
+        deadline = time.monotonic() + max_wait
+        with self.__condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Unavailable(f"{self.in_flight} calls in flight, the limit is {int(self.limit)}")
+                self.__condition.wait(remaining)
+            self.in_flight += 1
+            limit, in_flight = self.limit, self.in_flight
+        self.__changed(limit, in_flight)
+        return time.monotonic()
+
+    def release(self, started: float, success: bool):
+        """
+        Frees the slot of a finished call and adapts the limit to its outcome.
+
+        :param started: The start time returned by acquire()
+        :param success: Whether the call succeeded
+        """
+        now = time.monotonic()
+        with self.__condition:
+            self.in_flight -= 1
+            if success and now - started <= self.target_latency:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif started >= self.__decreased_at:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.__decreased_at = now
+            self.__condition.notify_all()
+            limit, in_flight = self.limit, self.in_flight
+        self.__changed(limit, in_flight)
+
+    def __changed(self, limit: float, in_flight: int):
+        if self.__on_change is not None:
+            self.__on_change(limit, in_flight)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service: after 'failure_threshold' failed calls in a row the circuit opens and calls fail
+    at once with Unavailable. After 'reset_timeout' seconds it is half open and lets one trial call through; the circuit
+    closes if the trial succeeds and opens again if it fails. Used from several threads.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, on_change=None):
+        """
+        Initializes the CircuitBreaker object.
+
+        :param failure_threshold: Failed calls in a row which open the circuit
+        :param reset_timeout: Seconds the circuit stays open before a trial call
+        :param on_change: Optional callable receiving the old and the new state on every transition
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.__on_change = on_change
+        self.__opened_at = 0.0
+        self.__trial = False
+        self.__lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Checks whether a call may be made. Every allowed call has to be followed by record() or cancel().
+
+        :raises Unavailable: If the circuit is open, or half open with the trial call in flight
+        """
+        with self.__lock:
+            transition = None
+            if self.state == OPEN:
+                if time.monotonic() - self.__opened_at < self.reset_timeout:
+                    raise Unavailable(f"circuit open after {self.failures} failed calls")
+                transition = self.__set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self.__trial:
+                    raise Unavailable("circuit half open, waiting for the trial call")
+                self.__trial = True
+        self.__changed(transition)
+
+    def record(self, success: bool):
+        """
+        Records the outcome of a call.
+
+        :param success: Whether the call succeeded
+        """
+        with self.__lock:
+            transition = None
+            self.__trial = False
+            if success:
+                self.failures = 0
+                if self.state != CLOSED:
+                    transition = self.__set_state(CLOSED)
+            else:
+                self.failures += 1
+                if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                    self.__opened_at = time.monotonic()
+                    transition = self.__set_state(OPEN)
+        self.__changed(transition)
+
+    def cancel(self):
+        """
+        Records that an allowed call was not made after all.
+        """
+        with self.__lock:
+            self.__trial = False
+
+    def __set_state(self, state: str) -> tuple:
+        transition = (self.state, state)
+        self.state = state
+        return transition
+
+    def __changed(self, transition):
+        if transition is not None and self.__on_change is not None:
+            self.__on_change(*transition)
@@ -0,0 +1,175 @@
+import logging
+import threading
+from collections import deque
+
+import metrics
+from resilience import Unavailable
+
+LOGGER = logging.getLogger(__name__)
+
+""" Failed writes of an entry after which it is given up and kept as dead letter """
+MAX_ATTEMPTS = 5
+
+""" Number of dead letters kept """
+DEAD_LETTERS = 1000
+
+CHECKPOINT_WRITES = metrics.counter("response_checkpoint_writes_total",
+                                    "Responses written to LimeSurvey by the checkpointer, by result", ["result"])
+
+
+class ResponseCheckpointer:
+    """
+    Buffers the answers of participants and writes them to LimeSurvey in batches while they take the survey, so the
+    answers of participants who quit halfway are kept. The first write of a participant creates an incomplete response
+    (add_response without submit date), later ones update it (update_response) and the write at completion sets the
+    submit date. All answers given within one flush interval are coalesced into one call per participant, and one
+    thread writes them one after the other, so LimeSurvey receives a steady stream of calls instead of bursts.
+    """
+
+    def __init__(self):
+        """ Answers not written yet, by (survey id, chat id) """
+        self.__pending = {}
+        """ Completed responses not written yet, as ((survey id, chat id), answers) tuples """
+        self.__completions = []
+        """ LimeSurvey response ids of the surveys in progress, by (survey id, chat id) """
+        self.__response_ids = {}
+        """ Languages the surveys are answered in, by (survey id, chat id) """
+        self.__languages = {}
+        """ Failed writes by (survey id, chat id, completed) """
+        self.__attempts = {}
+        """ Entries given up after MAX_ATTEMPTS failed writes, as (survey id, chat id, answers, completed) tuples """
+        self.dead_letters = deque(maxlen=DEAD_LETTERS)
+        self.__lock = threading.Lock()
+        self.__flushing = threading.Lock()
+        metrics.gauge("response_checkpoint_pending", "Participants with answers waiting to be written to LimeSurvey",
+                      function=self.pending)
+
+    def record(self, sid: int, chat_id: int, answers: dict, language: str = None):
+        """
+        Buffers answers of a participant, replacing earlier buffered answers to the same questions.
+
+        :param sid: The id of the survey
+        :param chat_id: The id of the chat
+        :param answers: Dictionary of question code to answer code
+        :param language: The language code of the survey, None for its base language
+        """
+        with self.__lock:
+            self.__pending.setdefault((sid, chat_id), {}).update(answers)
+            self.__languages[(sid, chat_id)] = language
+
+    def complete(self, sid: int, chat_id: int, answers: dict, language: str = None):
+        """
+        Buffers the complete response of a participant who finished the survey. If the participant starts the survey
+        again before it is written, the new answers go to a new response.
+
+        :param sid: The id of the survey
+        :param chat_id: The id of the chat
+        :param answers: Dictionary of question code to answer code of all answered questions
+        :param language: The language code of the survey, None for its base language
+        """
+        with self.__lock:
+            key = (sid, chat_id)
+            self.__languages[key] = language
+            self.__completions.append((key, {**self.__pending.pop(key, {}), **answers}))
+
+    def pending(self) -> int:
+        """
+        Returns the number of participants with buffered answers.
+        """
+        return len(self.__pending) + len(self.__completions)
+
+    def flush(self, surveys) -> int:
+        """
+        Writes all buffered answers to LimeSurvey. Blocks until done, so call it from a background thread. A write that
+        fails is buffered again for the next flush, together with later writes of the same participant, and the other
+        participants are written. An entry failing MAX_ATTEMPTS times is logged with its answers and moved to
+        'dead_letters', so it cannot hold up the others forever. If LimeSurvey is unavailable, the flush stops and all
+        remaining writes are buffered again without counting as failures.
+
+        :param surveys: The SurveyRegistry of the surveys the answers belong to
+        :return: Number of responses written
+        """
+        if not self.__flushing.acquire(blocking=False):
+            return 0
+        try:
+            with self.__lock:
+                completions, self.__completions = self.__completions, []
+                pending, self.__pending = self.__pending, {}
+            """ Completions first: a pending entry of the same participant belongs to a new run of the survey """
+            batch = [(key, answers, True) for key, answers in completions]
+            batch += [(key, answers, False) for key, answers in pending.items()]
+            written = 0
+            """ Participants with a failed write, whose later writes wait for it, and the entries to buffer again """
+            failed = set()
+            retry = []
+            for position, (key, answers, completed) in enumerate(batch):
+                sid, chat_id = key
+                if key in failed:
+                    retry.append((key, answers, completed))
+                    continue
+                try:
+                    survey_data = surveys.get(sid, self.__languages.get(key))
+                    if survey_data is None:
+                        raise ValueError(f"the bot no longer serves survey {sid}")
+                    response_id = survey_data.checkpoint_response(chat_id, answers, self.__response_ids.get(key),
+                                                                  completed)
+                except Unavailable as err:
+                    CHECKPOINT_WRITES.labels("deferred").inc()
+                    LOGGER.warning("LimeSurvey is unavailable, writing %s responses later: %s", len(batch) - position,
+                                   err)
+                    self.__requeue(retry + batch[position:])
+                    return written
+                except Exception as err:
+                    CHECKPOINT_WRITES.labels("failed").inc()
+                    failed.add(key)
+                    if self.__retry(key, answers, completed, err):
+                        retry.append((key, answers, completed))
+                    continue
+                CHECKPOINT_WRITES.labels("written").inc()
+                self.__attempts.pop((sid, chat_id, completed), None)
+                written += 1
+                if completed:
+                    self.__response_ids.pop(key, None)
+                else:
+                    self.__response_ids[key] = response_id
+            self.__requeue(retry)
+            return written
+        finally:
+            self.__flushing.release()
+
+    def __retry(self, key: tuple, answers: dict, completed: bool, error: Exception) -> bool:
+        """
+        Decides whether an entry whose write failed is written again, or gives it up after MAX_ATTEMPTS failed writes.
+        """
+        sid, chat_id = key
+        attempts = self.__attempts.get((sid, chat_id, completed), 0) + 1
+        if attempts < MAX_ATTEMPTS:
+            self.__attempts[(sid, chat_id, completed)] = attempts
+            LOGGER.error("Writing the response of %s to survey %s failed (attempt %s of %s), retrying later: %s",
+                         chat_id, sid, attempts, MAX_ATTEMPTS, error)
+            return True
+        self.__attempts.pop((sid, chat_id, completed), None)
+        if completed:
+            self.__response_ids.pop(key, None)
+        self.dead_letters.append((sid, chat_id, answers, completed))
+        CHECKPOINT_WRITES.labels("dropped").inc()
+        LOGGER.error("Giving up the response of %s to survey %s after %s failed writes: %s; answers: %s", chat_id, sid,
+                     attempts, error, answers)
+        return False
+
+    def __requeue(self, batch: list):
+        """
+        Buffers unwritten entries again, keeping answers recorded meanwhile as they are newer. Answers of a participant
+        who completed the survey meanwhile are added to the completion.
+        """
+        with self.__lock:
+            completed_since = {key: answers for key, answers in self.__completions}
+            completions = [(key, answers) for key, answers, completed in batch if completed]
+            self.__completions = completions + self.__completions
+            for key, answers, completed in batch:
+                if completed:
+                    continue
+                if key in completed_since:
+                    completed_since[key].update({**answers, **completed_since[key]})
+                else:
+                    self.__pending[key] = {**answers, **self.__pending.get(key, {})}
@@ -0,0 +1,132 @@
+import zlib
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class SendWindow:
+    """
+    Daily time window (in the user's local time) in which questions may be pushed to a user.
+    Windows may wrap around midnight, e.g. "22:00-06:00".
+    """
+
+    def __init__(self, start_minute: int, end_minute: int):
+        """
+        Initializes the SendWindow object.
+
+        :param start_minute: Minute of the day (0-1440) at which the window opens
+        :param end_minute: Minute of the day (0-1440) at which the window closes
+        """
+        if not (0 <= start_minute <= MINUTES_PER_DAY and 0 <= end_minute <= MINUTES_PER_DAY):
+            raise ValueError("Send window bounds must be within one day")
+        self.start_minute = start_minute % MINUTES_PER_DAY
+        self.end_minute = end_minute % MINUTES_PER_DAY
+        self.all_day = start_minute % MINUTES_PER_DAY == end_minute % MINUTES_PER_DAY
+
+    @classmethod
+    def parse(cls, value: str) -> "SendWindow":
+        """
+        Parses a window in the form "HH:MM-HH:MM".
+
+        :param value: The window string
+        :return: The parsed SendWindow
+        """
+        try:
+            start, end = value.strip().split("-")
+            return cls(cls.__parse_minute(start), cls.__parse_minute(end))
+        except ValueError:
+            raise ValueError(f"Invalid send window: {value}")
+
+    @staticmethod
+    def __parse_minute(value: str) -> int:
+        """
+        Converts "HH:MM" (or "HH") into the minute of the day.
+
+        :param value: The time string
+        :return: Minute of the day
+        """
+        hours, _, minutes = value.strip().partition(":")
+        hours, minutes = int(hours), int(minutes or 0)
+        if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+            raise ValueError(f"Invalid time: {value}")
+        return hours * 60 + minutes
+
+    def __str__(self):
+        return "{:02d}:{:02d}-{:02d}:{:02d}".format(*divmod(self.start_minute, 60), *divmod(self.end_minute, 60))
+
+    def contains(self, local_time: datetime) -> bool:
+        """
+        Checks whether a local point in time lies inside the window.
+
+        :param local_time: Datetime in the user's time zone
+        :return: True if pushes are allowed at that time
+        """
+        if self.all_day:
+            return True
+        minute = local_time.hour * 60 + local_time.minute
+        if self.start_minute < self.end_minute:
+            return self.start_minute <= minute < self.end_minute
+        return minute >= self.start_minute or minute < self.end_minute
+
+    def length(self) -> int:
+        """
+        Returns how long the window is open per day.
+
+        :return: Length of the window in seconds
+        """
+        if self.all_day:
+            return MINUTES_PER_DAY * 60
+        return (self.end_minute - self.start_minute) % MINUTES_PER_DAY * 60
+
+    def next_opening(self, local_time: datetime) -> datetime:
+        """
+        Returns the next point in time at which the window opens, after 'local_time'.
+
+        :param local_time: Datetime in the user's time zone
+        :return: Datetime (same time zone) of the next window opening
+        """
+        hours, minutes = divmod(self.start_minute, 60)
+        opening = local_time.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+        if opening <= local_time:
+            opening += timedelta(days=1)
+        return opening
+
+
+def get_timezone(name: str) -> ZoneInfo:
+    """
+    Resolves an IANA time zone name such as "Europe/Vienna".
+
+    :param name: Name of the time zone
+    :return: The ZoneInfo object
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}")
+
+
+def deferred_delay(delay: float, chat_id: int, tz: ZoneInfo, window: SendWindow, spread: int, now=None) -> float:
+    """
+    Computes the delay after which a question that is due in 'delay' seconds may actually be sent.
+    Questions falling outside the user's send window are deferred to the next window opening. Deferred questions are
+    spread over the first 'spread' seconds of the window using a stable per-user offset, so all users whose questions
+    were held back overnight are not pushed in the same second. The spread is capped at the length of the window, so
+    deferred questions are sent before it closes again.
+
+    :param delay: Seconds until the question is due
+    :param chat_id: The id of the chat, used to derive the offset inside the spread
+    :param tz: Time zone of the user
+    :param window: Send window of the user
+    :param spread: Length in seconds of the period deferred questions are spread over
+    :param now: Current time as aware datetime, defaults to the current UTC time
+    :return: Delay in seconds
+    """
+    now = now or datetime.now(timezone.utc)
+    due = (now + timedelta(seconds=delay)).astimezone(tz)
+    if window.contains(due):
+        return delay
+    opening = window.next_opening(due)
+    spread = min(spread, window.length())
+    offset = zlib.crc32(str(chat_id).encode()) % spread if spread > 0 else 0
+    return (opening.astimezone(timezone.utc) - now).total_seconds() + offset
@@ -0,0 +1,70 @@
+import json
+import logging
+import sqlite3
+import threading
+
+import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+SESSION_STORE_SECONDS = metrics.histogram("session_store_seconds", "Duration of session store operations",
+                                          ["operation"])
+
+
+class SessionStore:
+    """
+    SQLite table of the user data of participants who were evicted from memory, one JSON document per user. Sessions
+    are written in batches by the eviction sweep and read back one by one when their user returns. The connection is
+    opened on first use, so a store created before forking a worker process is not shared with it, and every process of
+    a multi-process deployment can use the same file (each user is owned by one worker).
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the SessionStore object.
+
+        :param path: Path of the SQLite database, created if it does not exist
+        """
+        self.path = path
+        self.__connection = None
+        self.__lock = threading.Lock()
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            """ Write-ahead logging lets the workers of a multi-process deployment read while one of them writes """
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS sessions (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+            connection.commit()
+            self.__connection = connection
+        return self.__connection
+
+    def load(self, user_id: int):
+        """
+        Reads the user data of a user. Blocks on disk access, so call it from a thread.
+
+        :param user_id: The id of the user
+        :return: The user data, None if the user has no stored session
+        """
+        with self.__lock, SESSION_STORE_SECONDS.labels("load").time():
+            row = self.__connect().execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save(self, sessions: dict):
+        """
+        Writes the user data of several users in one transaction, replacing their stored sessions. Blocks on disk
+        access, so call it from a thread.
+
+        :param sessions: Dictionary of user id to user data
+        """
+        rows = [(user_id, json.dumps(user_data, separators=(",", ":"))) for user_id, user_data in sessions.items()]
+        with self.__lock, SESSION_STORE_SECONDS.labels("save").time():
+            connection = self.__connect()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO sessions (user_id, data) VALUES (?, ?)", rows)
+
+    def close(self):
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
@@ -0,0 +1,244 @@
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+
+from telegram import Bot, Update
+
+from answer_stats import AnswerStatistics
+from config import Config
+import metrics
+from readiness import Readiness, load_with_retry
+from telegram_bot_handler import ADDRESS_INDEX, SURVEY_DATA, TelegramBotHandler, build_address_index, \
+    build_survey_registry, build_update_capture
+from update_ingest import UpdateDeduplicator
+from webhook_app import WebhookApp
+
+LOGGER = logging.getLogger(__name__)
+
+
+def shard_key(update: dict):
+    """
+    Returns the id that decides which worker owns an update. User data is keyed by the user id and jobs by the chat
+    id, which are identical in the private chats the bot is used in. Inline queries carry no survey state and may be
+    answered by any worker, the address index is the same everywhere.
+
+    :param update: The decoded update
+    :return: The owning user id or None if any worker may handle the update
+    """
+    if "inline_query" in update:
+        return None
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if isinstance(user, dict) and "id" in user:
+            return user["id"]
+        chat = value.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return None
+
+
+class ShardRouter:
+    """
+    Webhook sink of the multi-process front-end. Routes raw updates to the inbox of the worker process owning the user.
+    Offers the same interface as UpdateIngestQueue so WebhookApp can use either.
+    """
+
+    def __init__(self, inboxes: list):
+        """
+        Initializes the ShardRouter object.
+
+        :param inboxes: One bounded multiprocessing queue per worker
+        """
+        self.inboxes = inboxes
+        self.accepted = 0
+        self.dropped = 0
+        self.decode_errors = 0
+        self.__any_worker = itertools.cycle(range(len(inboxes)))
+
+    def offer(self, raw: bytes) -> bool:
+        """
+        Routes a raw update to its worker without waiting.
+
+        :param raw: The raw update as received by the webhook
+        :return: True if the update was queued (or is undecodable and dropped), False if the worker is saturated
+        """
+        try:
+            update = json.loads(raw)
+            """ Valid JSON can still be no update, e.g. a list or a user id which is no number """
+            if not isinstance(update, dict):
+                raise ValueError(f"expected an object, got {type(update).__name__}")
+            owner = shard_key(update)
+            if owner is not None and not isinstance(owner, int):
+                raise ValueError(f"invalid user id {owner!r}")
+        except ValueError as err:
+            self.decode_errors += 1
+            LOGGER.warning("Dropping undecodable update: %s", err)
+            return True
+        index = next(self.__any_worker) if owner is None else owner % len(self.inboxes)
+        try:
+            self.inboxes[index].put_nowait(raw)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def depth(self) -> int:
+        """
+        Returns the number of updates waiting in all worker inboxes.
+
+        :return: Queue depth
+        """
+        try:
+            return sum(inbox.qsize() for inbox in self.inboxes)
+        except NotImplementedError:  # qsize() is not available on every platform
+            return 0
+
+
+def raise_system_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def run_loader(config: Config, inboxes: list, metrics_outbox, loaded: dict, workers_started):
+    """
+    Entry point of the loader process. It builds the survey data and the address index while the front-end already
+    serves the webhook, then forks the workers, which share the read-only pages of the data, and waits for them.
+    Each step is reported to the front-end by setting the corresponding event.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    """ Terminating the loader terminates the workers it started """
+    signal.signal(signal.SIGTERM, raise_system_exit)
+    context = multiprocessing.get_context("fork")
+    workers = []
+    try:
+        surveys = load_with_retry(SURVEY_DATA, lambda: build_survey_registry(config))
+        loaded[SURVEY_DATA].set()
+        address_index, address_grid = load_with_retry(ADDRESS_INDEX, lambda: build_address_index(config))
+        loaded[ADDRESS_INDEX].set()
+        for index, inbox in enumerate(inboxes):
+            worker = context.Process(target=run_worker, args=(config, surveys, address_index, address_grid, inbox,
+                                                              index, metrics_outbox))
+            worker.start()
+            workers.append(worker)
+        workers_started.set()
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+
+
+def run_worker(config: Config, surveys, address_index, address_grid, inbox, worker_index: int, metrics_outbox):
+    """
+    Entry point of a worker process.
+    """
+    """ Shutdown is coordinated by the front-end, which sends None to every inbox """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    """ Start with empty metrics instead of the values inherited from the front-end """
+    metrics.REGISTRY.reset()
+    handler = TelegramBotHandler(config, surveys, address_index, address_grid=address_grid)
+    asyncio.run(handler.run_worker(inbox, worker_index, metrics_outbox))
+
+
+class ShardedDeployment:
+    """
+    Multi-process mode: a webhook front-end in the main process shards updates by user over WORKERS worker processes.
+    Every worker owns the state and jobs of its users. The front-end is up right away. Survey data and address index
+    are built once by a loader process, which then forks the workers, so they share the read-only pages of the data.
+    Until the workers are started, updates wait in the bounded worker inboxes.
+    """
+
+    def __init__(self, config: Config):
+        """
+        Initializes the ShardedDeployment object.
+
+        :param config: The configuration
+        """
+        self.config = config
+        self.context = multiprocessing.get_context("fork")
+        self.inboxes = [self.context.Queue(maxsize=config.UPDATE_QUEUE_SIZE) for _ in range(config.WORKERS)]
+        self.metrics_outbox = self.context.Queue(maxsize=4 * config.WORKERS)
+        self.worker_metrics = {}
+        self.loaded = {SURVEY_DATA: self.context.Event(), ADDRESS_INDEX: self.context.Event()}
+        self.workers_started = self.context.Event()
+        self.readiness = Readiness()
+        for name, event in self.loaded.items():
+            self.readiness.add(name, event.is_set)
+        self.readiness.add("workers", self.workers_started.is_set)
+
+    def run(self):
+        """
+        Starts the loader process and serves the webhook until the server is stopped.
+        """
+        """ uvicorn re-raises SIGTERM after its graceful shutdown; turn it into an exception so the workers are stopped """
+        signal.signal(signal.SIGTERM, raise_system_exit)
+        """ Fork the loader before the front-end starts any thread """
+        loader = self.context.Process(target=run_loader, args=(self.config, self.inboxes, self.metrics_outbox,
+                                                               self.loaded, self.workers_started))
+        loader.start()
+        try:
+            asyncio.run(self.serve())
+        finally:
+            if self.workers_started.is_set():
+                for inbox in self.inboxes:
+                    inbox.put(None)
+            else:
+                loader.terminate()
+            loader.join()
+
+    async def serve(self):
+        """
+        Registers the webhook and serves it, routing updates to the workers.
+        """
+        print(f'Starting bot front-end with {len(self.inboxes)} workers...')
+        bot_kwargs = {"base_url": self.config.BOT_API_BASE_URL} if self.config.BOT_API_BASE_URL else {}
+        async with Bot(self.config.TOKEN, **bot_kwargs) as bot:
+            await bot.set_webhook(url=f"{self.config.URL}/telegram", allowed_updates=Update.ALL_TYPES,
+                                  secret_token=self.config.WEBHOOK_SECRET)
+        router = ShardRouter(self.inboxes)
+        dedupe = UpdateDeduplicator(self.config.DEDUPE_WINDOW)
+        capture = build_update_capture(self.config)
+        webhook_app = WebhookApp(router, dedupe, self.config.HOST, self.config.PORT, self.config.WEBHOOK_SECRET,
+                                 metrics_sources=(metrics.REGISTRY.collect, self.collect_worker_metrics),
+                                 readiness=self.readiness, stats_source=self.collect_worker_stats,
+                                 stats_token=self.config.STATS_TOKEN, capture=capture)
+        collector = asyncio.create_task(self.receive_worker_metrics())
+        try:
+            await webhook_app.run().serve()
+        finally:
+            if capture is not None:
+                await asyncio.to_thread(capture.stop)
+            """ Wake up the collector, its blocking read would otherwise keep the process alive """
+            await asyncio.get_running_loop().run_in_executor(None, self.metrics_outbox.put, (None, None))
+            await collector
+
+    async def receive_worker_metrics(self):
+        """
+        Keeps the latest metrics snapshot sent by each worker, until it receives an index of None.
+        """
+        loop = asyncio.get_running_loop()
+        index, families = await loop.run_in_executor(None, self.metrics_outbox.get)
+        while index is not None:
+            self.worker_metrics[index] = metrics.with_labels(families, {"worker": str(index)})
+            index, families = await loop.run_in_executor(None, self.metrics_outbox.get)
+
+    def collect_worker_metrics(self) -> list:
+        """
+        Returns the latest metrics of all workers, labelled with the index of the worker.
+        """
+        return [family for families in self.worker_metrics.values() for family in families]
+
+    def collect_worker_stats(self) -> dict:
+        """
+        Returns the answer counts of all workers added up, from their latest metrics.
+        """
+        return AnswerStatistics.from_metrics(self.collect_worker_metrics()).summary()
@@ -0,0 +1,102 @@
+import heapq
+import math
+from array import array
+
+""" Meters per degree of latitude (and of longitude at the equator) """
+METERS_PER_DEGREE = math.pi / 180 * 6371000
+
+
+class GridIndex:
+    """
+    Spatial index of points on a regular latitude/longitude grid. The points are stored in flat arrays, sorted by grid
+    cell, and every cell maps to its slice of the arrays. A nearest-point search scans the cell of the location and then
+    rings of cells around it, until no point outside the scanned cells can be closer than the ones found.
+    """
+
+    def __init__(self, points, cell_size: float = 0.002):
+        """
+        Initializes the GridIndex object.
+
+        :param points: Iterable of (id, latitude, longitude) tuples; ids are integers, e.g. the ids of a Trie
+        :param cell_size: Edge of a grid cell in degrees, 0.002 is about 220 m of latitude
+        """
+        self.cell_size = cell_size
+        cells = {}
+        for point_id, latitude, longitude in points:
+            cells.setdefault(self.__cell(latitude, longitude), []).append((point_id, latitude, longitude))
+        self.ids = array('q')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.__cells = {}
+        for cell, cell_points in cells.items():
+            start = len(self.ids)
+            for point_id, latitude, longitude in cell_points:
+                self.ids.append(point_id)
+                self.latitudes.append(latitude)
+                self.longitudes.append(longitude)
+            self.__cells[cell] = (start, len(self.ids))
+        """ Bounding box of the occupied cells """
+        rows = [row for row, column in self.__cells] or [0]
+        columns = [column for row, column in self.__cells] or [0]
+        self.__rows = (min(rows), max(rows))
+        self.__columns = (min(columns), max(columns))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __cell(self, latitude: float, longitude: float) -> tuple:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def __ring(self, row: int, column: int, ring: int):
+        """
+        Yields the cells at a Chebyshev distance of 'ring' cells from the given one.
+        """
+        if ring == 0:
+            yield row, column
+            return
+        for offset in range(-ring, ring + 1):
+            yield row - ring, column + offset
+            yield row + ring, column + offset
+        for offset in range(-ring + 1, ring):
+            yield row + offset, column - ring
+            yield row + offset, column + ring
+
+    def nearest(self, latitude: float, longitude: float, count: int, max_distance: float) -> list:
+        """
+        Finds the points closest to a location. Distances are computed on a plane tangent to the location, which is
+        accurate to well below a meter within a city.
+
+        :param latitude: Latitude of the location
+        :param longitude: Longitude of the location
+        :param count: Maximum number of points to return
+        :param max_distance: Maximum distance of the points in meters
+        :return: List of (id, distance in meters) tuples, closest first
+        """
+        longitude_scale = math.cos(math.radians(latitude))
+        row, column = self.__cell(latitude, longitude)
+        """ Max-heap of the closest points found so far, as (-distance, id) """
+        closest = []
+        """ Beyond this ring no cell contains points """
+        max_ring = max(abs(row - self.__rows[0]), abs(row - self.__rows[1]),
+                       abs(column - self.__columns[0]), abs(column - self.__columns[1]))
+        ring = 0
+        while ring <= max_ring:
+            for cell in self.__ring(row, column, ring):
+                cell_slice = self.__cells.get(cell)
+                if cell_slice is None:
+                    continue
+                for index in range(*cell_slice):
+                    distance = METERS_PER_DEGREE * math.hypot(self.latitudes[index] - latitude,
+                                                              (self.longitudes[index] - longitude) * longitude_scale)
+                    if distance > max_distance:
+                        continue
+                    if len(closest) < count:
+                        heapq.heappush(closest, (-distance, self.ids[index]))
+                    elif distance < -closest[0][0]:
+                        heapq.heapreplace(closest, (-distance, self.ids[index]))
+            """ Points outside the scanned rings are at least this far away """
+            bound = METERS_PER_DEGREE * ring * self.cell_size * min(1.0, longitude_scale)
+            if bound > max_distance or (len(closest) == count and -closest[0][0] <= bound):
+                break
+            ring += 1
+        return [(point_id, -distance) for distance, point_id in sorted(closest, reverse=True)]
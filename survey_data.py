@@ -1,21 +1,25 @@
-import re
+from html_normalizer import TelegramHTMLNormalizer
 from limesurvey_handler import LimeSurveyHandler
 from urllib.parse import urlparse
 
 
 class SurveyData:
 
-    def __init__(self, sid: int, limesurvey_handler: LimeSurveyHandler):
+    def __init__(self, sid: int, limesurvey_handler: LimeSurveyHandler, language: str = None):
         """
         Initializes the SurveyData object.
 
         :param sid: The id of the survey
         :param limesurvey_handler: An instance of the LimeSurveyHandler
+        :param language: The language of the texts, None for the base language of the survey
         """
         self.__survey_id = sid
         self.__limesurvey_handler = limesurvey_handler
-        self.__html_cleaner = HTMLCleaner(self.__limesurvey_handler.config.API_URL)
-        self.__survey_questions = self.__build_questions(self.__survey_id)
+        """ The survey in its base language also knows the other languages it is available in """
+        self.__languages = limesurvey_handler.survey_languages(sid) if language is None else [language]
+        self.__language = language or (self.__languages[0] if self.__languages else None)
+        self.__html_normalizer = TelegramHTMLNormalizer(self.extract_base_url(self.__limesurvey_handler.config.API_URL))
+        self.__survey_questions = self.__build_questions(self.__survey_id, language)
 
     def sid(self):
         """
@@ -25,6 +29,22 @@ class SurveyData:
         """
         return self.__survey_id
 
+    def language(self):
+        """
+        Returns the language of the texts
+
+        :return: The language code, None if LimeSurvey did not tell the base language
+        """
+        return self.__language
+
+    def languages(self):
+        """
+        Returns the languages the survey is available in
+
+        :return: List of language codes, the base language first
+        """
+        return self.__languages
+
     def question_list(self):
         """
         Returns the list of survey questions
@@ -33,39 +53,44 @@ class SurveyData:
         """
         return self.__survey_questions
 
-    def __build_questions(self, sid: int) -> list:
+    def __build_questions(self, sid: int, language: str = None) -> list:
         """
         Builds a list of questions from the survey id
 
         :param sid: The id of the survey
+        :param language: The language of the texts, None for the base language of the survey
         :return: The list of questions
         """
         result = []
 
-        for group in self.__limesurvey_handler.list_groups(sid):
+        for group in self.__limesurvey_handler.list_groups(sid, language):
             gid = group["gid"]
-            question_list = self.__limesurvey_handler.list_questions(sid, gid)
+            question_list = self.__limesurvey_handler.list_questions(sid, gid, language)
             for question in sorted(question_list, key=lambda question: question['question_order']):
-                question_dict = self.__create_question_item(sid, gid, question)
+                question_dict = self.__create_question_item(sid, gid, question, language)
+                """ The question is only shown if the relevance equations of its group and itself are true """
+                question_dict['group_relevance'] = group.get('grelevance') or ""
                 """ Append the question dictionary to the result list"""
                 result.append(question_dict)
 
         return result
 
-    def __create_question_item(self, sid: int, gid: int, question: list) -> dict:
+    def __create_question_item(self, sid: int, gid: int, question: list, language: str = None) -> dict:
         """
         Creates a dictionary of question items
 
         :param sid: The id of the survey
         :param gid: The id of a group in the survey
         :param question: A list containing question information
+        :param language: The language of the texts, None for the base language of the survey
         :return: A dictionary containing question data
         """
         qid = question["qid"]
         code = self.__construct_question_code(sid, gid, qid)
-        options = self.__limesurvey_handler.get_question_properties(qid)
+        options = self.__limesurvey_handler.get_question_properties(qid, language)
         answer_options = options.get('answeroptions', {})
-        question['question'] = self.__html_cleaner.refine_html_text(question['question'])
+        """ Convert the text to Telegram HTML once here instead of every time the question is sent """
+        text, images = self.__html_normalizer.normalize(question['question'])
         if isinstance(answer_options, dict):
             answeroptions = {key: {'answer': value.get('answer')} for key, value in answer_options.items()}
         else:
@@ -73,7 +98,10 @@ class SurveyData:
         question_dict = {
             'id': qid,
             'code': code,
-            'question': question['question'],
+            'title': question.get('title', ""),
+            'relevance': question.get('relevance') or "",
+            'question': text,
+            'images': images,
             'answeroptions': answeroptions
         }
         return question_dict
@@ -90,33 +118,49 @@ class SurveyData:
         """
         return f'{sid}X{gid}X{qid}'
 
-    def save_survey_response(self, sid: int, chat_id: int, response_data: dict) -> int:
+    def response_answers(self, response_data: dict) -> dict:
         """
-        Saves the response of a survey
+        Returns the answers to this survey in the user data of a participant
 
-        :param sid: The id of the survey
-        :param chat_id: The id of the chat
-        :param response_data: The response data of the survey
-        :return: A result int value
+        :param response_data: The user data of the participant
+        :return: Dictionary of question code to answer code
         """
-        filtered_response_data = self.__filter_response_data(sid, response_data)
-        seed = self.get_last_nine_digits(chat_id)
-        result = self.__limesurvey_handler.save_response(sid, seed, filtered_response_data)
-        print(result)
-        return result
+        return self.__filter_response_data(self.__survey_id, response_data)
+
+    def checkpoint_response(self, chat_id: int, answers: dict, response_id: int = None, completed: bool = False) -> int:
+        """
+        Writes answers of a participant to LimeSurvey while the survey is in progress. The first call creates an
+        incomplete response, later calls update it; the last one marks it as completed.
+
+        :param chat_id: The id of the chat
+        :param answers: Dictionary of question code to answer code
+        :param response_id: The id of the response created before, None to create it
+        :param completed: Whether the participant completed the survey
+        :return: The id of the response
+        """
+        if response_id is None:
+            seed = self.get_last_nine_digits(chat_id)
+            result = self.__limesurvey_handler.save_response(self.__survey_id, seed, answers, completed,
+                                                             self.__language)
+            if isinstance(result, bool) or not str(result).isdigit():
+                raise RuntimeError(f"add_response failed: {result}")
+            return int(result)
+        result = self.__limesurvey_handler.update_response(self.__survey_id, response_id, answers, completed)
+        if result is not True:
+            raise RuntimeError(f"update_response failed: {result}")
+        return response_id
 
     @staticmethod
     def __filter_response_data(sid: int, response_data: dict) -> dict:
         """
-        Filters the 'response_data' dictionary to only contain key,value pairs where keys starts with 'sid'.
+        Filters the 'response_data' dictionary to only contain key,value pairs where keys are question codes of 'sid'.
 
         :param sid: ID to be compared with keys in dictionary.
-        :param response_data: the dictionary from which data is to be filtered out.
+        :param response_data: the user data of a participant from which data is to be filtered out.
         :return: A dictionary containing filtered data.
         """
         """ Filter response_data to only contain question ID and answer ID"""
-        first_item_value = next(iter(response_data.values()))
-        return {key: value for key, value in first_item_value.items() if key.startswith(str(sid))}
+        return {key: value for key, value in response_data.items() if str(key).startswith(f"{sid}X")}
 
     @staticmethod
     def get_last_nine_digits(chat_id: int):
@@ -138,61 +182,6 @@ class SurveyData:
         """
         print(self.__survey_questions)
 
-
-class HTMLCleaner:
-    def __init__(self, url: str):
-        """
-        Initializes 'HTMLCleaner' object and also extracts base url from 'url' and assign it to '__base_url'
-
-        :param url: input url from which base url is to be extracted.
-        """
-        self.__base_url = self.extract_base_url(url)
-
-    def refine_html_text(self, text: str):
-        """
-        Performs a series of cleaning operations on 'text'
-
-        :param text : The string which is to be cleaned.
-        :return: 'text' after a series of cleaning operations performed on it.
-        """
-        new_text = HTMLCleaner.replace_br_src(text)
-        new_text = self.replace_img_src(new_text)
-        new_html = self.replace_paragraph_tags(new_text)
-        return new_html
-
-    def replace_img_src(self, html_string: str):
-        """
-        Replaces the image source link in 'html_string' with a new link.
-
-        :param html_string: The string in which the replacement needs to be done.
-        :return: 'html_string' after replacing the image source link.
-        """
-        img_src_pattern = r'src="(/upload/surveys/\d+/images/[^"]+)"'
-        img_src_replacement = f'src="{self.__base_url}\\1"'
-        new_html = re.sub(img_src_pattern, img_src_replacement, html_string)
-        return new_html
-
-    @staticmethod
-    def replace_br_src(html_string: str):
-        """
-        Replaces "<br />" in 'html_string' with "\n"
-
-        :param html_string: The string in which the replacement needs to be done.
-        :return: 'html_string' after "<br />" is replaced with "\n".
-        """
-        new_html = html_string.replace("<br />", "\n")
-        return new_html
-
-    @staticmethod
-    def replace_paragraph_tags(html_string: str):
-        """
-        Replaces "<p>" and "</p>" in 'html_string' with "\n" and "", respectively.
-
-        :param html_string : The string in which the replacement needs to be done.
-        :return: 'html_string' after "<p>" and "</p>" are replaced with "\n" and "".
-        """
-        return html_string.replace("<p>", "\n").replace("</p>", "")
-
     @staticmethod
     def extract_base_url(url: str):
         """
@@ -0,0 +1,151 @@
+from limesurvey_handler import LimeSurveyHandler
+from survey_data import SurveyData
+
+
+def match_language(language_code: str, languages: list):
+    """
+    Picks the language of a survey for the language of a Telegram user, e.g. 'de' for 'de-AT'.
+
+    :param language_code: The IETF language tag of the user, as Telegram sends it
+    :param languages: The language codes of the survey
+    :return: The matching language code of the survey, None if the survey is not available in the language
+    """
+    wanted = language_code.lower().replace("_", "-")
+    by_code = {language.lower(): language for language in languages}
+    primary = wanted.split("-")[0]
+    if wanted in by_code:
+        return by_code[wanted]
+    if primary in by_code:
+        return by_code[primary]
+    """ E.g. 'de-informal' or 'pt-BR' for a user without region """
+    return next((language for language in languages if language.lower().split("-")[0] == primary), None)
+
+
+class SurveyRegistry:
+    """
+    The surveys served by one bot, keyed by survey id. All surveys share one LimeSurveyHandler, i.e. one RemoteControl
+    session and one HTTP connection pool. Surveys are loaded in their base language; the other languages of a survey
+    are loaded by load_language() when a user first needs them and kept until the survey is replaced.
+    """
+
+    def __init__(self, limesurvey_handler: LimeSurveyHandler, survey_ids):
+        """
+        Initializes the SurveyRegistry object. The surveys are fetched by load_all().
+
+        :param limesurvey_handler: The LimeSurveyHandler shared by all surveys
+        :param survey_ids: The ids of the surveys, the first one is started by a plain /start
+        """
+        self.limesurvey_handler = limesurvey_handler
+        self.survey_ids = tuple(survey_ids)
+        self.default_sid = self.survey_ids[0]
+        self.__surveys = {}
+        """ Surveys in other languages than their base language, by (survey id, language) """
+        self.__localized = {}
+
+    def load(self, sid: int) -> SurveyData:
+        """
+        Fetches a survey from LimeSurvey, without adding it to the registry.
+
+        :param sid: The id of the survey
+        :return: The survey data
+        """
+        return SurveyData(sid, self.limesurvey_handler)
+
+    def load_all(self) -> "SurveyRegistry":
+        """
+        Fetches all surveys from LimeSurvey.
+
+        :return: The registry itself
+        """
+        for sid in self.survey_ids:
+            self.__surveys[sid] = self.load(sid)
+        return self
+
+    def set(self, sid: int, survey_data: SurveyData):
+        """
+        Replaces the data of a survey, e.g. after it was reloaded.
+
+        :param sid: The id of the survey
+        :param survey_data: The new survey data
+        """
+        self.__surveys[sid] = survey_data
+        """ Other languages are loaded again when needed, they might not match the new questions """
+        for key in [key for key in self.__localized if key[0] == sid]:
+            del self.__localized[key]
+
+    def language(self, sid: int, language_code: str):
+        """
+        Returns the language of a survey to show to a user.
+
+        :param sid: The id of the survey
+        :param language_code: The language of the user as Telegram sends it, e.g. 'de-AT'
+        :return: The language code of the survey, None for the base language of the survey
+        """
+        survey_data = self.__surveys.get(sid)
+        if survey_data is None or not language_code or len(survey_data.languages()) < 2:
+            return None
+        language = match_language(language_code, survey_data.languages())
+        return language if language != survey_data.language() else None
+
+    def is_loaded(self, sid: int, language: str = None) -> bool:
+        """
+        Checks whether a survey is loaded in a language.
+
+        :param sid: The id of the survey
+        :param language: The language code of the survey, None for the base language
+        :return: True if get() returns the survey in this language
+        """
+        return language is None or (sid, language) in self.__localized
+
+    def load_language(self, sid: int, language: str) -> SurveyData:
+        """
+        Fetches a survey in another language from LimeSurvey and keeps it. The survey is only kept if it has the same
+        questions as in the base language, so the positions of participants stay valid. Blocks on LimeSurvey, so call it
+        from a thread.
+
+        :param sid: The id of the survey
+        :param language: The language code of the survey
+        :return: The survey data in the language
+        """
+        base = self.__surveys[sid]
+        survey_data = SurveyData(sid, self.limesurvey_handler, language)
+        codes = [question_data['code'] for question_data in survey_data.question_list()]
+        if codes != [question_data['code'] for question_data in base.question_list()]:
+            raise ValueError(f"The questions of survey {sid} in {language} differ from the base language")
+        """ Not kept if the survey was replaced while it was fetched """
+        if self.__surveys.get(sid) is base:
+            self.__localized[(sid, language)] = survey_data
+        return survey_data
+
+    def get(self, sid: int, language: str = None) -> SurveyData:
+        """
+        Returns the data of a survey.
+
+        :param sid: The id of the survey
+        :param language: The language code of the survey, None for the base language
+        :return: The survey data, in the base language if it is not loaded in 'language'; None if the bot does not
+            serve the survey
+        """
+        if language is not None:
+            survey_data = self.__localized.get((sid, language))
+            if survey_data is not None:
+                return survey_data
+        return self.__surveys.get(sid)
+
+    def questions(self, sid: int, language: str = None) -> list:
+        """
+        Returns the question list of a survey.
+
+        :param sid: The id of the survey
+        :param language: The language code of the survey, None for the base language
+        :return: List of questions, in the base language if the survey is not loaded in 'language'; empty if the bot
+            does not serve the survey
+        """
+        survey_data = self.get(sid, language)
+        return survey_data.question_list() if survey_data is not None else []
+
+    def __contains__(self, sid) -> bool:
+        return sid in self.__surveys
+
+    def __len__(self) -> int:
+        return len(self.__surveys)
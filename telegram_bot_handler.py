@@ -1,18 +1,35 @@
-import hashlib
+import asyncio
+import heapq
 import html
 import logging
+import queue
+import re
+import threading
+import time
 
-from bs4 import BeautifulSoup
 from dataclasses import dataclass
-from flask_app import FlaskApp
+from answer_stats import ANSWERS_METRIC, COMPLETED_METRIC, AnswerStatistics
 from limesurvey_handler import LimeSurveyHandler
-from survey_data import SurveyData
+from survey_registry import SurveyRegistry
 from config import Config
+from diagnostics import MAX_PROFILE_SECONDS, LoopMonitor, SamplingProfiler
+import metrics
+from popularity import SpaceSaving, load_counts, save_counts
+from readiness import READY, Readiness, in_daemon_thread
+from relevance import always_relevant, compile_relevance
+from response_checkpoint import ResponseCheckpointer
 from buildAddressDataset import AddressDownloader
-from trie import Trie
+from send_window import SendWindow, get_timezone, deferred_delay
+from session_store import SessionStore
+from spatial_index import GridIndex
+from address_index import AddressIndex
+from update_capture import UpdateCapture
+from update_ingest import UpdateDeduplicator, UpdateIngestQueue
+from webhook_app import WebhookApp
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, InlineQueryResultArticle, \
     InputTextMessageContent
+from telegram.constants import ParseMode
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -21,6 +38,9 @@ from telegram.ext import (
     ConversationHandler,
     CallbackQueryHandler,
     ExtBot, InlineQueryHandler,
+    MessageHandler,
+    TypeHandler,
+    filters,
 )
 
 # import your messages dictionaries
@@ -29,6 +49,58 @@ from messages_de import MESSAGES as MESSAGES_DE
 
 LOGGER = logging.getLogger(__name__)
 
+""" Messages by language, for USER_LANGUAGE """
+MESSAGES = {"en": MESSAGES_EN, "de": MESSAGES_DE}
+
+""" Seconds before loading a survey in a language is tried again after it failed """
+LANGUAGE_RETRY_SECONDS = 300
+
+""" Seconds between two retries of responses which could not be written, without RESPONSE_CHECKPOINT_INTERVAL """
+RESPONSE_RETRY_INTERVAL = 60
+
+""" Seconds between two metric snapshots sent by a worker process to the front-end """
+METRICS_PUSH_INTERVAL = 5
+
+""" User data kept when the session of a user who is not taking a survey is compacted """
+SESSION_KEYS = ('completed_surveys', 'sid', 'frequency', 'timezone', 'send_window', 'language')
+
+""" Maximum length of a Telegram message """
+MAX_MESSAGE_LENGTH = 4096
+
+""" Maximum number of Telegram file ids of uploaded images kept for reuse """
+IMAGE_CACHE_SIZE = 10000
+
+""" Maximum number of addresses Telegram shows for an inline query """
+INLINE_QUERY_RESULTS = 50
+
+""" Addresses offered for a shared location, and their maximum distance in meters """
+NEAREST_ADDRESSES = 5
+MAX_ADDRESS_DISTANCE = 500
+
+""" Digits of the compact encoding of address ids in callback data and inline result ids """
+ADDRESS_ID_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+""" Question code at the end of the callback data of an answer, ",<answer>,<question code>" """
+QUESTION_CODE_SUFFIX = re.compile(r",(\d+X\d+X\d+)$")
+
+""" Components loaded in the background after the webhook is up """
+SURVEY_DATA = "survey_data"
+ADDRESS_INDEX = "address_index"
+
+SHOW_QUESTION_SECONDS = metrics.histogram("show_question_seconds", "Time to prepare and send a scheduled question")
+SKIPPED_QUESTIONS = metrics.counter("skipped_questions_total", "Questions skipped because their relevance was false")
+SESSION_EVICTIONS = metrics.counter("session_evictions_total", "Idle sessions evicted from memory, by kind", ["kind"])
+SESSION_FAULTS = metrics.counter("session_faults_total", "Sessions read back from the session store")
+LANGUAGE_LOADS = metrics.counter("survey_language_loads_total", "Surveys loaded in another language, by result",
+                                 ["result"])
+NEAREST_ADDRESS_SECONDS = metrics.histogram("nearest_address_seconds",
+                                            "Time to find the addresses nearest to a shared location")
+INLINE_QUERY_SECONDS = metrics.histogram("inline_query_seconds", "Time spent answering inline queries, by phase",
+                                         ["phase"])
+TELEGRAM_REQUEST_SECONDS = metrics.histogram("telegram_request_seconds", "Duration of Bot API calls sending messages",
+                                             ["method"])
+SENT_MESSAGES = metrics.counter("sent_messages_total", "Messages sent to users, by result", ["result"])
+
 
 def prepare_logger():
     """ Setup logger """
@@ -40,6 +112,98 @@ def prepare_logger():
     logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
+def build_survey_registry(config: Config) -> SurveyRegistry:
+    """ Fetch all configured surveys from LimeSurvey, sharing one LimeSurvey session """
+    return SurveyRegistry(LimeSurveyHandler(config), config.SURVEY_IDS).load_all()
+
+
+def build_update_capture(config: Config):
+    """ Start capturing the webhook updates to CAPTURE_FILE, None if it is not set """
+    if not config.CAPTURE_FILE:
+        return None
+    capture = UpdateCapture(config.CAPTURE_FILE, config.CAPTURE_MAX_BYTES, config.CAPTURE_BACKUPS)
+    capture.start()
+    return capture
+
+
+def build_address_index(config: Config) -> tuple:
+    """
+    Download (or read from ADDRESS_CSV) all addresses and index them for the inline address search (AddressIndex,
+    partitioned by postcode) and by location (GridIndex of the address ids). Returns both as a tuple. Unless the
+    number of partitions is limited by ADDRESS_PARTITIONS, all partitions are built right away.
+    """
+    downloader = AddressDownloader(config.ADDRESS_CSV)
+    address_index = AddressIndex(config.ADDRESS_PARTITIONS)
+    points = []
+    for address, coordinates in zip(downloader.get_addresses(), downloader.get_coordinates()):
+        address_id = address_index.insert(address)
+        if coordinates is not None:
+            points.append((address_id, *coordinates))
+    if not config.ADDRESS_PARTITIONS:
+        address_index.preload()
+    return address_index, GridIndex(points)
+
+
+def encode_address_id(address_id: int) -> str:
+    """ Encode the id of an address in the address index in base 36, e.g. for callback data """
+    digits = ""
+    while True:
+        address_id, digit = divmod(address_id, len(ADDRESS_ID_DIGITS))
+        digits = ADDRESS_ID_DIGITS[digit] + digits
+        if not address_id:
+            return digits
+
+
+def decode_address_id(digits: str):
+    """ Decode an address id encoded by encode_address_id, None if it is not one """
+    try:
+        return int(digits, len(ADDRESS_ID_DIGITS))
+    except ValueError:
+        return None
+
+
+def answer_data(answer: str, question_code: str) -> str:
+    """
+    Builds the callback data of an answer button, ",<answer>,<question code>".
+
+    :param answer: The answer, e.g. the code of an answer option
+    :param question_code: The code of the question, empty if it is not known
+    :return: The callback data
+    """
+    return f",{answer},{question_code}" if question_code else f",{answer}"
+
+
+def split_answer_data(data: str) -> tuple:
+    """
+    Splits the callback data of an answer into the answer and the code of the question it answers. Callback data sent
+    by older versions of the bot carries no question code, but possibly an address containing commas.
+
+    :param data: The callback data, starting with ','
+    :return: Tuple of the answer and the question code, an empty string if there is none
+    """
+    match = QUESTION_CODE_SUFFIX.search(data)
+    if match is None:
+        return data[1:], ""
+    return data[1:match.start()], match.group(1)
+
+
+def remap_question_index(old_questions: list, new_questions: list, index: int) -> int:
+    """
+    Maps the position of a participant in the old question list onto a new question list by question code. If the
+    current question was removed, the participant continues with the next old question that still exists.
+
+    :param old_questions: The question list the index refers to
+    :param new_questions: The new question list
+    :param index: The index of the current question in the old list
+    :return: The index of the current question in the new list, len(new_questions) if no question is left
+    """
+    new_positions = {question['code']: position for position, question in enumerate(new_questions)}
+    for question in old_questions[index:]:
+        if question['code'] in new_positions:
+            return new_positions[question['code']]
+    return len(new_questions)
+
+
 @dataclass
 class WebhookUpdate:
     """Simple dataclass to wrap a custom update type"""
@@ -48,6 +212,32 @@ class WebhookUpdate:
     payload: str
 
 
+@dataclass
+class CompiledQuestion:
+    """
+    A question prepared once per survey load: its keyboard is built, the confirmation text of every answer option
+    is formatted in advance and its relevance equations are compiled, so answering a question only takes dictionary
+    lookups.
+    """
+
+    code: str
+    text: str
+    images: list
+    reply_markup: InlineKeyboardMarkup
+    answer_texts: dict
+    confirmations: dict
+    """ Function of the user data returning whether the question is shown """
+    relevant: callable = always_relevant
+
+    def answer_text(self, answer_key: str):
+        """
+        Returns the text of an answer option, the answer itself for questions without options (e.g. addresses).
+        """
+        if not self.answer_texts:
+            return answer_key
+        return self.answer_texts.get(answer_key)
+
+
 class CustomContext(CallbackContext[ExtBot, dict, dict, dict]):
     """
     Custom CallbackContext class that makes `user_data` available for updates of type
@@ -67,11 +257,15 @@ class CustomContext(CallbackContext[ExtBot, dict, dict, dict]):
 
 class TelegramBotHandler:
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, surveys: SurveyRegistry = None, address_index: AddressIndex = None,
+                 bot_request=None, address_grid: GridIndex = None):
         """
         Constructor method where the bot's configurations are instantiated based on the given config.
         The method also includes setting up the survey data, building the web application, and preparing
-        the address downloader and logger.
+        the address downloader and logger. Surveys and address index (and optionally the GridIndex of the
+        addresses) which are already built (e.g. by the parent of a worker process) can be passed in, as well as a PTB
+        request object replacing the connection to the Bot API (e.g. a fake one for benchmarks). Otherwise they are
+        loaded by load_components().
         """
         """  set messages to correct dictionary based on language. """
         if config.LANG.lower() == "en":
@@ -89,27 +283,449 @@ class TelegramBotHandler:
         self.HOST = config.HOST
         self.SURVEY_ID = config.SURVEY_ID
         self.MULTI_VOTE = config.MULTI_VOTE
+        self.USER_LANGUAGE = config.USER_LANGUAGE
         self.FREQUENCIES = config.FREQUENCIES
         self.SET_FREQUENCY = config.SET_FREQUENCY
+        self.WEBHOOK_SECRET = config.WEBHOOK_SECRET
+        self.UPDATE_QUEUE_SIZE = config.UPDATE_QUEUE_SIZE
+        self.DEDUPE_WINDOW = config.DEDUPE_WINDOW
+        self.DEFAULT_TIMEZONE = get_timezone(config.DEFAULT_TIMEZONE)
+        """ Send window of users who did not set one with /setwindow, None to send questions at any time """
+        self.SEND_WINDOW = SendWindow.parse(config.SEND_WINDOW) if config.SEND_WINDOW else None
+        self.SEND_WINDOW_SPREAD = config.SEND_WINDOW_SPREAD
+        self.ADMIN_IDS = config.ADMIN_IDS
+        self.SURVEY_RELOAD_INTERVAL = config.SURVEY_RELOAD_INTERVAL
+        self.RESPONSE_CHECKPOINT_INTERVAL = config.RESPONSE_CHECKPOINT_INTERVAL
+        """ Buffers the responses until they are written to LimeSurvey, off the event loop """
+        self.checkpointer = ResponseCheckpointer()
+        """ Lets one flush of the checkpointer run at a time """
+        self.flush_lock = asyncio.Lock()
+        self.POPULARITY_FILE = config.POPULARITY_FILE
+        self.POPULARITY_SAVE_INTERVAL = config.POPULARITY_SAVE_INTERVAL
+        """ How often addresses were selected, by address id, ranking the address search """
+        self.popularity = SpaceSaving(config.POPULARITY_CAPACITY)
+        """ How often addresses were selected in this process, the counts saved to 'popularity_file' """
+        self.own_popularity = SpaceSaving(config.POPULARITY_CAPACITY)
+        self.popularity_file = self.POPULARITY_FILE
+        self.STATS_FILE = config.STATS_FILE
+        self.STATS_SAVE_INTERVAL = config.STATS_SAVE_INTERVAL
+        """ Live answer counts of the surveys, served by /stats """
+        self.answer_statistics = AnswerStatistics()
+        self.stats_file = self.STATS_FILE
+        self.SESSION_IDLE_TTL = config.SESSION_IDLE_TTL
+        self.SESSION_SWEEP_INTERVAL = config.SESSION_SWEEP_INTERVAL
+        self.session_store = SessionStore(config.SESSION_DB) if config.SESSION_DB else None
+        """ Time of the last update (time.monotonic()) by user id, of the users whose session is in memory """
+        self.session_activity = {}
+        self.reload_lock = asyncio.Lock()
+        self.loop_monitor = LoopMonitor(config.BLOCKING_THRESHOLD) if config.DIAGNOSTICS else None
+        self.profiler = SamplingProfiler(config.PROFILE_DIR)
 
         context_types = ContextTypes(context=CustomContext)
 
-        self.app = Application.builder().token(self.TOKEN).updater(None).context_types(context_types).build()
+        builder = Application.builder().token(self.TOKEN).updater(None).context_types(context_types)
+        if config.BOT_API_BASE_URL:
+            builder = builder.base_url(config.BOT_API_BASE_URL)
+        if bot_request is not None:
+            builder = builder.request(bot_request)
+        self.app = builder.build()
         self.job_queue = self.app.job_queue
-        self.survey_data = SurveyData(int(self.SURVEY_ID), LimeSurveyHandler(config))
-        self.questions = self.survey_data.question_list()
-        self.address_downloader = AddressDownloader()
-        self.trie = Trie()
-        for address in self.address_downloader.get_addresses():
-            self.trie.insert(address)
+        self.config = config
+        self.readiness = Readiness()
+        self.readiness.add(SURVEY_DATA)
+        self.readiness.add(ADDRESS_INDEX)
+        self.surveys = None
+        self.address_index = None
+        self.address_grid = None
+        """ Telegram file ids of images already uploaded, by image URL; shared by all surveys """
+        self.image_file_ids = {}
+        """ Compiled questions by (survey id, language), as (question list, compiled questions) compiled from the list """
+        self.compiled_surveys = {}
+        """ Surveys being loaded in another language, and when to retry the languages that failed to load """
+        self.language_loads = {}
+        self.language_retry = {}
+        if surveys is not None:
+            self.__set_surveys(surveys)
+            self.readiness.set_state(SURVEY_DATA, READY)
+        if address_index is not None:
+            self.__set_address_index((address_index, address_grid))
+            self.readiness.set_state(ADDRESS_INDEX, READY)
         prepare_logger()
 
+    def __set_surveys(self, surveys: SurveyRegistry):
+        self.surveys = surveys
+
+    def __questions(self, user_data: dict) -> list:
+        """
+        This method returns the question list of the survey the user is taking.
+        """
+        return self.surveys.questions(user_data.get('sid', self.surveys.default_sid), self.__survey_language(user_data))
+
+    def __language_messages(self, language: str) -> dict:
+        """
+        This method returns the messages in a language, with USER_LANGUAGE set; in LANG otherwise or if the bot does
+        not support the language.
+        """
+        if not self.USER_LANGUAGE or not language:
+            return self.lang_messages
+        return MESSAGES.get(language.split("-")[0].lower(), self.lang_messages)
+
+    def __messages(self, user_data: dict) -> dict:
+        """
+        This method returns the messages in the language of the user.
+        """
+        return self.__language_messages(user_data.get('language'))
+
+    def __survey_language(self, user_data: dict):
+        """
+        This method returns the language of the survey to show to the user, None for the base language of the survey.
+        """
+        if not self.USER_LANGUAGE or 'language' not in user_data:
+            return None
+        return self.surveys.language(user_data.get('sid', self.surveys.default_sid), user_data['language'])
+
+    async def __load_survey_language(self, user_data: dict):
+        """
+        This method loads the survey of the user in the language of the user in a background thread, unless it is
+        loaded already. Users waiting for the same language wait for the same load. Until a language is loaded, its
+        users get the base language of the survey.
+        """
+        sid = user_data.get('sid', self.surveys.default_sid)
+        language = self.__survey_language(user_data)
+        key = (sid, language)
+        if self.surveys.is_loaded(sid, language) or time.monotonic() < self.language_retry.get(key, 0.0):
+            return
+        load = self.language_loads.get(key)
+        if load is None:
+            load = self.language_loads[key] = in_daemon_thread(self.surveys.load_language, sid, language)
+            load.add_done_callback(lambda done: self.__survey_language_loaded(key, done))
+        try:
+            await asyncio.shield(load)
+        except Exception:
+            """ Logged by __survey_language_loaded """
+            pass
+
+    def __survey_language_loaded(self, key: tuple, load: asyncio.Future):
+        self.language_loads.pop(key, None)
+        error = load.exception() if not load.cancelled() else asyncio.CancelledError()
+        if error is None:
+            LANGUAGE_LOADS.labels("loaded").inc()
+            LOGGER.info("Survey %s loaded in %s.", *key)
+        else:
+            self.language_retry[key] = time.monotonic() + LANGUAGE_RETRY_SECONDS
+            LANGUAGE_LOADS.labels("failed").inc()
+            LOGGER.warning("Loading survey %s in %s failed, showing its base language: %s", *key, error)
+
+    def __compiled_questions(self, user_data: dict) -> list:
+        """
+        This method returns the compiled questions of the survey the user is taking, in the language of the user. They
+        are compiled on first use and again after the survey was reloaded.
+        """
+        sid = user_data.get('sid', self.surveys.default_sid)
+        language = self.__survey_language(user_data)
+        questions = self.surveys.questions(sid, language)
+        compiled = self.compiled_surveys.get((sid, language))
+        if compiled is None or compiled[0] is not questions:
+            """ Relevance equations refer to questions by their code in LimeSurvey ('title') or by SGQA code """
+            variables = {question_data['code']: question_data['code'] for question_data in questions}
+            variables.update({question_data['title']: question_data['code'] for question_data in questions
+                              if question_data.get('title')})
+            group_relevance = {}
+            """ The confirmations are in the language of the question texts, which is the base language until loaded """
+            messages = self.__language_messages(self.surveys.get(sid, language).language())
+            compiled = (questions, [self.__compile_question(question_data, variables, group_relevance, messages)
+                                    for question_data in questions])
+            self.compiled_surveys[(sid, language)] = compiled
+        return compiled[1]
+
+    def __next_relevant_question(self, user_data: dict, questions: list) -> int:
+        """
+        This method moves 'current_question' in user_data to the next question whose relevance is true for the user's
+        answers, from the current one on. Answers to skipped questions (e.g. from an earlier run of the survey) are
+        removed, as LimeSurvey does for irrelevant questions.
+        :return: The index of the question, len(questions) if no question is left
+        """
+        index = user_data['current_question']
+        while index < len(questions) and not questions[index].relevant(user_data):
+            user_data.pop(questions[index].code, None)
+            SKIPPED_QUESTIONS.inc()
+            index += 1
+        user_data['current_question'] = index
+        return index
+
+    def __compile_question(self, question_data: dict, variables: dict, group_relevance: dict,
+                           messages: dict) -> CompiledQuestion:
+        """
+        This method builds the keyboard and the confirmation texts of a question and compiles its relevance together
+        with the relevance of its group.
+
+        Any question that does not have answeroptions, is considered as a question about address which is and inline
+        query.
+        """
+        answer_options = question_data.get('answeroptions')
+        if isinstance(answer_options, dict) and answer_options:
+            answer_texts = {answer_key: answer_data['answer'] for answer_key, answer_data in answer_options.items()}
+            """ The callback data names the question, so a button of a question replaced meanwhile is rejected """
+            buttons = [InlineKeyboardButton(answer_text, callback_data=answer_data(answer_key, question_data['code']))
+                       for answer_key, answer_text in answer_texts.items()]
+            reply_markup = InlineKeyboardMarkup(self.__build_menu(buttons, n_cols=1))
+        else:
+            answer_texts = {}
+            """Send a message with a switch inline query button"""
+            button = InlineKeyboardButton(
+                messages["search_msg"],
+                switch_inline_query_current_chat=""
+            )
+            reply_markup = InlineKeyboardMarkup([[button]])
+        confirmations = {answer_key: messages["answered_msg"].format(answer=answer_text)
+                         for answer_key, answer_text in answer_texts.items()}
+        return CompiledQuestion(question_data['code'], question_data['question'], question_data['images'],
+                                reply_markup, answer_texts, confirmations,
+                                self.__compile_relevance(question_data, variables, group_relevance))
+
+    @staticmethod
+    def __compile_relevance(question_data: dict, variables: dict, group_relevance: dict):
+        """
+        This method compiles the relevance equations of a question and its group into one function. The equation of a
+        group is compiled once for all its questions.
+        """
+        relevant = compile_relevance(question_data.get('relevance'), variables)
+        group_expression = question_data.get('group_relevance')
+        if group_expression not in group_relevance:
+            group_relevance[group_expression] = compile_relevance(group_expression, variables)
+        group_relevant = group_relevance[group_expression]
+        if group_relevant is always_relevant:
+            return relevant
+        if relevant is always_relevant:
+            return group_relevant
+        return lambda answers: group_relevant(answers) and relevant(answers)
+
+    def __set_address_index(self, address_index: tuple):
+        self.address_index, self.address_grid = address_index
+        self.__load_popularity()
+
+    def __load_popularity(self):
+        """
+        This method loads the selection counts of the addresses saved by earlier runs: the ranking adds up the files of
+        all workers, while the counts saved again are only those of 'popularity_file', so no run saves the selections
+        of another one. Addresses no longer in the address index are dropped.
+        """
+        self.popularity = SpaceSaving(self.popularity.capacity)
+        self.own_popularity = SpaceSaving(self.own_popularity.capacity)
+        if not self.POPULARITY_FILE:
+            return
+        counts = load_counts(self.POPULARITY_FILE)
+        if not counts:
+            return
+        """ The first id of every address, as insert() keeps the first of addresses listed twice """
+        address_ids = {}
+        for address_id, address in enumerate(self.address_index.words):
+            address_ids.setdefault(address.lower(), address_id)
+        self.__add_popularity(self.popularity, counts, address_ids)
+        self.__add_popularity(self.own_popularity, load_counts(self.popularity_file, worker_files=False), address_ids)
+        LOGGER.info("Selection counts of %s addresses loaded.", len(self.popularity))
+
+    @staticmethod
+    def __add_popularity(popularity: SpaceSaving, counts: dict, address_ids: dict):
+        """
+        This method adds the counts of the most selected addresses, by address, to 'popularity', by address id.
+        """
+        most_common = sorted(counts.items(), key=lambda entry: entry[1], reverse=True)[:popularity.capacity]
+        for address, count in most_common:
+            address_id = address_ids.get(address.lower())
+            if address_id is not None:
+                popularity.add(address_id, count)
+
+    async def __save_popularity(self):
+        """
+        This method saves the selection counts of the addresses in this process to 'popularity_file', by address, so
+        they survive a change of the address ids.
+        """
+        if not self.popularity_file or self.address_index is None or not len(self.own_popularity):
+            return
+        counts = {self.address_index.word(address_id): count
+                  for address_id, count in self.own_popularity.counts.items()}
+        try:
+            await asyncio.to_thread(save_counts, self.popularity_file, counts)
+        except OSError as err:
+            LOGGER.error("Saving the selection counts of the addresses failed: %s", err)
+
+    async def __save_popularity_job(self, context: CallbackContext):
+        """
+        This method saves the selection counts of the addresses, every POPULARITY_SAVE_INTERVAL seconds.
+        """
+        await self.__save_popularity()
+
+    def __load_statistics(self):
+        """
+        This method loads the answer counts saved by the previous run of this process from its STATS_FILE.
+        """
+        if not self.stats_file:
+            return
+        self.answer_statistics.add_counts(load_counts(self.stats_file, worker_files=False))
+
+    async def __save_statistics(self):
+        """
+        This method saves the answer counts to STATS_FILE.
+        """
+        if not self.stats_file:
+            return
+        try:
+            await asyncio.to_thread(save_counts, self.stats_file, self.answer_statistics.to_counts())
+        except OSError as err:
+            LOGGER.error("Saving the answer counts failed: %s", err)
+
+    async def __save_statistics_job(self, context: CallbackContext):
+        """
+        This method saves the answer counts, every STATS_SAVE_INTERVAL seconds.
+        """
+        await self.__save_statistics()
+
+    async def __resident_user_data(self, user_id: int) -> dict:
+        """
+        This method returns the user data of a user. If the session of the user was evicted, it is read back from the
+        session store first. The activity of the user is recorded for the eviction sweep.
+        """
+        user_data = self.app.user_data[user_id]
+        if not self.SESSION_IDLE_TTL and self.session_store is None:
+            return user_data
+        if user_id not in self.session_activity and not user_data and self.session_store is not None:
+            stored = await asyncio.to_thread(self.session_store.load, user_id)
+            """ Another update of the user may have restored the session meanwhile """
+            if stored and not user_data:
+                user_data.update(self.__restored_session(stored))
+                SESSION_FAULTS.inc()
+        self.session_activity[user_id] = time.monotonic()
+        return user_data
+
+    def __restored_session(self, user_data: dict) -> dict:
+        """
+        This method maps the position of a participant read back from the session store onto the current question
+        list by question code, as the survey may have been reloaded since the session was evicted.
+        """
+        code = user_data.pop('current_code', None)
+        if code is not None and self.surveys is not None:
+            for position, question_data in enumerate(self.__questions(user_data)):
+                if question_data['code'] == code:
+                    user_data['current_question'] = position
+                    break
+        return user_data
+
+    def __takes_survey(self, user_data: dict) -> bool:
+        """
+        This method checks whether the user has started a survey and not answered all its questions yet.
+        """
+        if 'current_question' not in user_data:
+            return False
+        return self.surveys is None or user_data['current_question'] < len(self.__questions(user_data))
+
+    async def track_session(self, update: Update, context: CustomContext):
+        """
+        This method runs before all other handlers. It reads the session of the user back from the session store if it
+        was evicted, and records the activity of the user for the eviction sweep. Inline queries are skipped: in
+        multi-process mode any worker answers them, not only the one owning the session of the user.
+        """
+        if update.effective_user is not None and update.inline_query is None:
+            await self.__resident_user_data(update.effective_user.id)
+
+    async def sweep_sessions(self, idle_seconds: float = None) -> int:
+        """
+        This method evicts the sessions of users who sent no update for 'idle_seconds' (all sessions if None) from
+        memory. Sessions of users who are not taking a survey are compacted to SESSION_KEYS, which keeps e.g. the
+        completed surveys for MULTI_VOTE="False". With SESSION_DB set, sessions are written to the session store and
+        dropped from memory, including those of users who abandoned a survey; they are read back when the user returns.
+        Without it, sessions are only compacted in memory.
+        :param idle_seconds: Minimum idle time of the evicted sessions in seconds.
+        :return: Number of sessions dropped from memory.
+        """
+        now = time.monotonic()
+        dropped = 0
+        spilled = {}
+        for user_id, user_data in list(self.app.user_data.items()):
+            last_activity = self.session_activity.get(user_id)
+            if idle_seconds is not None and last_activity is not None and now - last_activity < idle_seconds:
+                continue
+            if not user_data:
+                self.app.drop_user_data(user_id)
+                self.session_activity.pop(user_id, None)
+                SESSION_EVICTIONS.labels("empty").inc()
+                dropped += 1
+            elif user_id not in self.session_activity:
+                """ Only touched by inline queries answered for another worker, which owns the session """
+                self.app.drop_user_data(user_id)
+                SESSION_EVICTIONS.labels("untracked").inc()
+                dropped += 1
+            elif self.__takes_survey(user_data):
+                if self.session_store is not None:
+                    session = dict(user_data)
+                    questions = self.__questions(user_data)
+                    session['current_code'] = questions[user_data['current_question']]['code']
+                    spilled[user_id] = (session, last_activity, "spilled")
+            else:
+                session = {key: user_data[key] for key in SESSION_KEYS if key in user_data}
+                if self.session_store is not None:
+                    spilled[user_id] = (session, last_activity, "compacted")
+                elif len(session) < len(user_data):
+                    user_data.clear()
+                    user_data.update(session)
+                    SESSION_EVICTIONS.labels("compacted").inc()
+        if spilled:
+            await asyncio.to_thread(self.session_store.save,
+                                    {user_id: session for user_id, (session, _, _) in spilled.items()})
+            for user_id, (_, last_activity, kind) in spilled.items():
+                """ Keep the sessions of users who sent an update while they were written """
+                if self.session_activity.get(user_id) == last_activity:
+                    self.app.drop_user_data(user_id)
+                    self.session_activity.pop(user_id, None)
+                    SESSION_EVICTIONS.labels(kind).inc()
+                    dropped += 1
+        return dropped
+
+    async def __sweep_sessions_job(self, context: CallbackContext):
+        """
+        This method evicts the sessions idle for SESSION_IDLE_TTL seconds, every SESSION_SWEEP_INTERVAL seconds.
+        """
+        try:
+            dropped = await self.sweep_sessions(self.SESSION_IDLE_TTL)
+        except Exception as err:
+            LOGGER.error("Evicting idle sessions failed: %s", err)
+            return
+        if dropped:
+            LOGGER.info("%s idle sessions evicted from memory.", dropped)
+
+    async def __store_sessions(self):
+        """
+        This method writes all sessions to the session store when the bot stops, so they survive the restart.
+        """
+        if self.session_store is None:
+            return
+        try:
+            await self.sweep_sessions()
+        except Exception as err:
+            LOGGER.error("Writing the sessions to %s failed: %s", self.session_store.path, err)
+        self.session_store.close()
+
+    async def load_components(self):
+        """
+        This method loads the survey data and the address index in background threads, unless they were passed in.
+        The bot already serves updates meanwhile; handlers needing a component which is not ready yet tell the user
+        to try again later. Returns when all components are ready.
+        """
+        loaders = []
+        if not self.readiness.is_ready(SURVEY_DATA):
+            loaders.append(self.readiness.load(SURVEY_DATA, lambda: build_survey_registry(self.config),
+                                               self.__set_surveys))
+        if not self.readiness.is_ready(ADDRESS_INDEX):
+            loaders.append(self.readiness.load(ADDRESS_INDEX, lambda: build_address_index(self.config),
+                                               self.__set_address_index))
+        await asyncio.gather(*loaders)
+
     async def help_command(self, update: Update, context: CustomContext):
         """
         Method that handles the '/help' command from users. When invoked, it displays an informative message
         on how to use this bot.
         """
-        text = self.lang_messages["help_info"]
+        text = self.__messages(context.user_data)["help_info"]
         await update.message.reply_html(text=text)
 
     async def admin_help_command(self, update: Update, context: CustomContext):
@@ -119,7 +735,7 @@ class TelegramBotHandler:
         """
         url = html.escape(f"{self.URL}/submitpayload?user_id=<your user id>&payload=<payload>")
         text = (
-            self.lang_messages["admin_help_info"].format(url=url)
+            self.__messages(context.user_data)["admin_help_info"].format(url=url)
         )
         await update.message.reply_html(text=text)
 
@@ -130,30 +746,55 @@ class TelegramBotHandler:
         """
         user = update.message.from_user
         LOGGER.info("User %s canceled the survey.", user.first_name)
-        await update.message.reply_text(self.lang_messages["cancel_msg"])
+        await update.message.reply_text(self.__messages(context.user_data)["cancel_msg"])
 
     async def stop_command(self, update: Update, context: CustomContext):
         """
         Method to handle the '/stop' command. When a user invokes this, it sends a stop message to the user.
         """
-        await update.message.reply_text(self.lang_messages["stop_msg"])
+        await update.message.reply_text(self.__messages(context.user_data)["stop_msg"])
 
     async def start_command(self, update: Update, context: CustomContext):
         """
-        Method that handles the '/start' command. This initializes the survey for the user and prepares the bot's job queue.
+        Method that handles the '/start [survey id]' command. This initializes the survey for the user and prepares the
+        bot's job queue. Deep links like https://t.me/<bot>?start=<survey id> send the survey id as argument; without
+        one, the user's current survey (or the first configured survey) is started.
         """
-        if self.MULTI_VOTE or 'survey_completed' not in context.user_data or not context.user_data['survey_completed']:
+        if self.USER_LANGUAGE and update.effective_user.language_code:
+            context.user_data['language'] = update.effective_user.language_code
+        if not self.readiness.is_ready(SURVEY_DATA):
+            await update.message.reply_text(self.__messages(context.user_data)["survey_warming_up"])
+            return
+        sid = self.__requested_survey(context)
+        if sid is None:
+            await update.message.reply_text(self.__messages(context.user_data)["unknown_survey"])
+            return
+        if self.MULTI_VOTE or sid not in context.user_data.get('completed_surveys', ()):
             user = update.effective_user
-            self.__initiate_survey_for_user(context)
+            self.__initiate_survey_for_user(context, sid)
             await self.__prepare_job_queue(context, update)
-            LOGGER.info("User %s started the survey.", user.first_name)
+            LOGGER.info("User %s started the survey %s.", user.first_name, sid)
 
-    def __initiate_survey_for_user(self, context: CustomContext):
+    def __requested_survey(self, context: CustomContext):
+        """
+        Private method returning the id of the survey requested by the arguments of '/start', None if the bot does not
+        serve it.
+        """
+        if not context.args:
+            sid = context.user_data.get('sid')
+            return sid if sid in self.surveys else self.surveys.default_sid
+        try:
+            sid = int(context.args[0])
+        except ValueError:
+            return None
+        return sid if sid in self.surveys else None
+
+    def __initiate_survey_for_user(self, context: CustomContext, sid: int):
         """
         Private method to initialize the suvey for a user in the provided context. If the user has not set a frequency for
         the survey, it defaults to 'every_2_seconds'.
         """
-        context.user_data['sid'] = self.survey_data.sid()
+        context.user_data['sid'] = sid
         if 'frequency' not in context.user_data:
             context.user_data['frequency'] = "every_2_seconds"
         self.__reset_current_question(context)
@@ -165,9 +806,21 @@ class TelegramBotHandler:
         """
         chat_id = update.effective_message.chat_id
         interval = self.FREQUENCIES[context.user_data['frequency']]["seconds"]
+        interval = self.__allowed_delay(context.user_data, chat_id, interval)
         context.user_data['send_confirmation'] = True
         context.job_queue.run_once(self.show_question, interval, chat_id=chat_id, name=str(chat_id))
 
+    def __allowed_delay(self, user_data: dict, chat_id: int, interval: float) -> float:
+        """
+        Private method to shift a scheduled question into the user's send window. Questions that would be due during
+        the user's quiet hours are deferred to the next window opening. Without a window, nothing is deferred.
+        """
+        window = SendWindow.parse(user_data['send_window']) if 'send_window' in user_data else self.SEND_WINDOW
+        if window is None:
+            return interval
+        tz = get_timezone(user_data['timezone']) if 'timezone' in user_data else self.DEFAULT_TIMEZONE
+        return deferred_delay(interval, chat_id, tz, window, self.SEND_WINDOW_SPREAD)
+
     @staticmethod
     def __remove_job_if_exists(name: str, context: CustomContext) -> bool:
         """
@@ -195,29 +848,34 @@ class TelegramBotHandler:
             menu.append(footer_buttons)
         return menu
 
-    @staticmethod
-    async def __send_message(context, chat_id, text, show_image=True, reply_markup=None):
+    async def __send_message(self, context, chat_id, text, images=(), reply_markup=None, parse_mode=None):
         """
-        method for sending a message that may include text and image.
+        method for sending a message that may include text and images. Images are uploaded by URL once; afterwards
+        the file id Telegram assigned to them is sent instead, so Telegram does not fetch them again.
         :param context: Context containing information to be sent.
         :param chat_id: Chat ID where the data to be sent.
         :param text: Message text or content to be sent.
-        :param show_image: A boolean parameter to control the content of the message,
-                           if True, image will be included in the message.
-                           Default value is True.
+        :param images: URLs of images sent before the text.
         :param reply_markup: Additional options for the message like custom keyboard.
+        :param parse_mode: Parse mode of the text, e.g. ParseMode.HTML for question texts.
         """
-        img_urls, soup = await TextParser.separate_text_and_image(text)
         # Send each image
-        if show_image:
-            for url in img_urls:
-                print(f"Here is picture: '{chat_id}' was {url} ")
-                await context.bot.send_photo(chat_id, photo=url)
+        if images:
+            for url in images:
+                LOGGER.debug("Sending image %s to %s.", url, chat_id)
+                file_id = self.image_file_ids.get(url)
+                with TELEGRAM_REQUEST_SECONDS.labels("send_photo").time():
+                    message = await context.bot.send_photo(chat_id, photo=file_id or url)
+                if file_id is None and message.photo and len(self.image_file_ids) < IMAGE_CACHE_SIZE:
+                    self.image_file_ids[url] = message.photo[-1].file_id
         try:
             # Send the text part
-            await context.bot.send_message(chat_id, text=str(soup), reply_markup=reply_markup)
-        except Exception as err:
-            print(f"An error occurred in __send_message: {err}")
+            with TELEGRAM_REQUEST_SECONDS.labels("send_message").time():
+                await context.bot.send_message(chat_id, text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+            SENT_MESSAGES.labels("sent").inc()
+        except Exception:
+            SENT_MESSAGES.labels("failed").inc()
+            LOGGER.exception("Sending a message to %s failed.", chat_id)
 
     async def show_question(self, context: ContextTypes.DEFAULT_TYPE) -> None:
         """
@@ -226,15 +884,16 @@ class TelegramBotHandler:
         """
         chat_id = context.job.chat_id
 
-        current_question = self.app.user_data[chat_id]['current_question']
-        if current_question < len(self.questions):
-            question_data = self.questions[current_question]
-            await self.__prepare_and_send_question(context, chat_id, question_data)
-        else:
-            self.app.user_data[chat_id]['survey_completed'] = True
-            await self.__send_message(context, chat_id, self.lang_messages["questions_complete_msg"])
-            sid = self.survey_data.sid()
-            self.survey_data.save_survey_response(sid, chat_id, self.app.user_data)
+        with SHOW_QUESTION_SECONDS.time():
+            user_data = await self.__resident_user_data(chat_id)
+            await self.__load_survey_language(user_data)
+            questions = self.__compiled_questions(user_data)
+            current_question = self.__next_relevant_question(user_data, questions)
+            if current_question < len(questions):
+                question = questions[current_question]
+                await self.__prepare_and_send_question(context, chat_id, question)
+            else:
+                await self.__complete_survey(context, chat_id, user_data)
 
     async def show_question_no_image(self, context: ContextTypes.DEFAULT_TYPE) -> None:
         """
@@ -244,39 +903,42 @@ class TelegramBotHandler:
         """
         chat_id = context.job.chat_id
 
-        current_question = self.app.user_data[chat_id]['current_question']
-        if current_question < len(self.questions):
-            question_data = self.questions[current_question]
-            await self.__prepare_and_send_question(context, chat_id, question_data, False)
-        else:
-            self.app.user_data[chat_id]['survey_completed'] = True
-            await self.__send_message(context, chat_id, self.lang_messages["questions_complete_msg"])
-            sid = self.survey_data.sid()
-            self.survey_data.save_survey_response(sid, chat_id, self.app.user_data)
-
-    async def __prepare_and_send_question(self, context, chat_id, question_data, show_image=True):
+        with SHOW_QUESTION_SECONDS.time():
+            user_data = await self.__resident_user_data(chat_id)
+            await self.__load_survey_language(user_data)
+            questions = self.__compiled_questions(user_data)
+            current_question = self.__next_relevant_question(user_data, questions)
+            if current_question < len(questions):
+                question = questions[current_question]
+                await self.__prepare_and_send_question(context, chat_id, question, False)
+            else:
+                await self.__complete_survey(context, chat_id, user_data)
+
+    async def __complete_survey(self, context, chat_id, user_data: dict):
         """
-        This method prepare_and_send_question.
-
-        Any question that does not have answeroptions, is considered as a question about address which is and inline
-        query.
-
+        This method marks the user's current survey as completed, thanks the user and saves the response. The response
+        is written right away in the background, or with RESPONSE_CHECKPOINT_INTERVAL set by the next checkpoint.
         """
-        question_text = f"{question_data['question']}"
-        if 'answeroptions' in question_data and isinstance(question_data['answeroptions'], dict) and question_data['answeroptions']:
-            buttons = [InlineKeyboardButton(answer_data['answer'], callback_data=f",{answer_key}")
-                       for answer_key, answer_data in question_data['answeroptions'].items()]
-            reply_markup = InlineKeyboardMarkup(self.__build_menu(buttons, n_cols=1))
-            await self.__send_message(context, chat_id, question_text, show_image, reply_markup=reply_markup)
-        else:
-            """Send a message with a switch inline query button"""
-            button = InlineKeyboardButton(
-                self.lang_messages["search_msg"],
-                switch_inline_query_current_chat=""
-            )
-            reply_markup = InlineKeyboardMarkup([[button]])
-            question_text = f"{question_text}"
-            await self.__send_message(context, chat_id, question_text, show_image,reply_markup=reply_markup)
+        sid = user_data.get('sid', self.surveys.default_sid)
+        completed_surveys = user_data.setdefault('completed_surveys', [])
+        if sid not in completed_surveys:
+            completed_surveys.append(sid)
+        await self.__send_message(context, chat_id, self.__messages(user_data)["questions_complete_msg"])
+        self.answer_statistics.complete(sid)
+        """ The response records the language the survey was answered in """
+        survey_data = self.surveys.get(sid, self.__survey_language(user_data))
+        answers = survey_data.response_answers(user_data)
+        self.checkpointer.complete(sid, chat_id, answers, self.__survey_language(user_data))
+        if not self.RESPONSE_CHECKPOINT_INTERVAL:
+            self.app.create_task(self.__write_responses())
+
+    async def __prepare_and_send_question(self, context, chat_id, question: CompiledQuestion, show_image=True):
+        """
+        This method sends a compiled question with its keyboard. The question text is Telegram HTML prepared when the
+        survey was loaded.
+        """
+        images = question.images if show_image else ()
+        await self.__send_message(context, chat_id, question.text, images, question.reply_markup, ParseMode.HTML)
 
     @staticmethod
     def __set_next_question(context):
@@ -313,6 +975,16 @@ class TelegramBotHandler:
         query = update.callback_query
         chat_id = query.from_user.id
 
+        if await self.__survey_not_ready(update, context):
+            return
+        if not self.__answers_current_question(context.user_data, query.data):
+            await query.answer()
+            await query.edit_message_text(self.__messages(context.user_data)["outdated_answer_msg"])
+            if self.surveys is not None and self.__takes_survey(context.user_data) and \
+                    not context.job_queue.get_jobs_by_name(str(chat_id)):
+                """ The current question may never have been sent, e.g. if it replaced a removed one """
+                await self.__add_question_to_job_queue(chat_id, context, 0)
+            return
         await self.__show_answer(context, query)
 
         if context.user_data['send_confirmation']:
@@ -329,20 +1001,81 @@ class TelegramBotHandler:
         :param query: Current query.
         """
         await query.answer()
-        user_answer = query.data.lstrip(',')
-        question_data = self.questions[context.user_data['current_question']]
-        question_code = question_data['code']
-        question_text = f"{question_data['question']}"
-        answer_text = TextParser.get_answer_text(question_data, user_answer)
+        user_answer, _ = split_answer_data(query.data)
+        question = self.__compiled_questions(context.user_data)[context.user_data['current_question']]
+        question_code = question.code
+        answer_text = question.answer_text(user_answer)
+        saved_answer = user_answer
+        address_id = self.__address_id(question, user_answer)
+        if address_id is not None:
+            """ Save the address itself: the id is a position in the address index, which a rebuild may shift """
+            answer_text = self.address_index.word(address_id)
+            saved_answer = answer_text
+            self.popularity.add(address_id)
+            self.own_popularity.add(address_id)
+
+        if question.answer_texts and answer_text is not None:
+            """ A second answer after 'no' to the confirmation replaces the first one """
+            previous = context.user_data.get(question_code) if context.user_data.get('send_confirmation') is False \
+                else None
+            self.answer_statistics.record(question_code, user_answer, previous)
 
         """ Save user answer into bot.user_data """
-        context.user_data[question_code] = user_answer
-
-        confirmed_answer_text = self.lang_messages["answered_msg"].format(answer=answer_text)
+        context.user_data[question_code] = saved_answer
+        if self.RESPONSE_CHECKPOINT_INTERVAL:
+            sid = context.user_data.get('sid', self.surveys.default_sid)
+            self.checkpointer.record(sid, query.from_user.id, {question_code: saved_answer},
+                                     self.__survey_language(context.user_data))
+
+        confirmed_answer_text = question.confirmations.get(user_answer)
+        if confirmed_answer_text is None:
+            confirmed_answer_text = self.__messages(context.user_data)["answered_msg"].format(answer=answer_text)
         await query.edit_message_text(confirmed_answer_text)
 
-        """ Print the answer to console """
-        print(f"Your answer was {answer_text} ")
+        LOGGER.debug("Answer of %s to %s: %s", query.from_user.id, question_code, answer_text)
+
+    def __answers_current_question(self, user_data: dict, data: str) -> bool:
+        """
+        This method checks whether the callback data of an answer belongs to the current question of the user. Buttons
+        sent before a survey reload may belong to a question which was removed or moved; callback data without a
+        question code (sent by an older version of the bot) is taken if it is a valid answer to the current question.
+        """
+        if not self.readiness.is_ready(SURVEY_DATA) or 'current_question' not in user_data:
+            return False
+        questions = self.__compiled_questions(user_data)
+        if user_data['current_question'] >= len(questions):
+            return False
+        question = questions[user_data['current_question']]
+        user_answer, question_code = split_answer_data(data)
+        if question_code:
+            return question_code == question.code
+        if question.answer_texts:
+            return user_answer in question.answer_texts
+        """ Older address buttons carry the address itself instead of its id """
+        return not user_answer.startswith('@') or self.__address_id(question, user_answer) is not None
+
+    def __current_question_code(self, user_data: dict) -> str:
+        """
+        This method returns the code of the current question of the user, for the callback data of the address
+        buttons; an empty string if the user is not taking a survey on this worker.
+        """
+        if not self.readiness.is_ready(SURVEY_DATA) or 'current_question' not in user_data:
+            return ""
+        questions = self.__compiled_questions(user_data)
+        current_question = user_data['current_question']
+        return questions[current_question].code if current_question < len(questions) else ""
+
+    def __address_id(self, question: CompiledQuestion, user_answer: str):
+        """
+        This method returns the id of the address selected for an address question, None if the answer is not the id
+        of an indexed address (e.g. an address sent by an older version of the bot).
+        """
+        if question.answer_texts or not user_answer.startswith('@') or self.address_index is None:
+            return None
+        address_id = decode_address_id(user_answer[1:])
+        if address_id is None or self.address_index.word(address_id) is None:
+            return None
+        return address_id
 
     async def __add_question_to_job_queue(self, chat_id, context, interval=None, show_image=True):
         """
@@ -355,6 +1088,7 @@ class TelegramBotHandler:
         self.__remove_job_if_exists(str(chat_id), context)
         if interval is None:
             interval = self.FREQUENCIES[context.user_data['frequency']]["seconds"]
+            interval = self.__allowed_delay(context.user_data, chat_id, interval)
         if show_image:
             context.job_queue.run_once(self.show_question, interval, chat_id=chat_id, name=str(chat_id))
         else:
@@ -366,13 +1100,14 @@ class TelegramBotHandler:
         :param context: The context of the chat.
         :param chat_id: The id of the chat.
         """
+        messages = self.__messages(self.app.user_data.get(chat_id, {}))
         keyboard = [
-            [InlineKeyboardButton(self.lang_messages["yes_msg"], callback_data="_yes")],
-            [InlineKeyboardButton(self.lang_messages["no_msg"], callback_data="_no")],
+            [InlineKeyboardButton(messages["yes_msg"], callback_data="_yes")],
+            [InlineKeyboardButton(messages["no_msg"], callback_data="_no")],
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        await self.__send_message(context, chat_id, self.lang_messages["confirmation_msg"], reply_markup=reply_markup)
+        await self.__send_message(context, chat_id, messages["confirmation_msg"], reply_markup=reply_markup)
 
     async def confirmation_button_click(self, update: Update, context: CustomContext):
         """
@@ -380,6 +1115,8 @@ class TelegramBotHandler:
         :param update: The update from Telegram.
         :param context: The context of the chat.
         """
+        if await self.__survey_not_ready(update, context):
+            return
         query = update.callback_query
         selected_option = query.data
         chat_id = update.effective_message.chat_id
@@ -400,24 +1137,114 @@ class TelegramBotHandler:
         query = update.inline_query.query
         if not query:
             return
-        # get a generator of autocompleted words
-        autocompleted = self.trie.autocomplete(query)
-        if autocompleted is not None:
-            ac = set(autocompleted)
-            # create InlineQueryResultArticle for each autocompleted address
-            results = sorted([
-                InlineQueryResultArticle(
-                    id=hashlib.md5(address.encode()).hexdigest(),
+        if not self.readiness.is_ready(ADDRESS_INDEX):
+            await self.__answer_warming_up(update, context)
+            return
+        with INLINE_QUERY_SECONDS.labels("search").time():
+            postcodes, _ = self.address_index.route(query)
+            if self.address_index.is_loaded(postcodes):
+                address_ids = self.__top_addresses(query)
+            else:
+                """ Partitions evicted or not built yet are built in a thread, the event loop keeps serving """
+                address_ids = await asyncio.to_thread(self.__top_addresses, query)
+            # create InlineQueryResultArticle for each autocompleted address, carrying its id instead of the address
+            results = []
+            select_msg = self.__messages(context.user_data)["select_msg"]
+            question_code = self.__current_question_code(context.user_data)
+            for address_id in address_ids:
+                address = self.address_index.word(address_id)
+                encoded_id = encode_address_id(address_id)
+                results.append(InlineQueryResultArticle(
+                    id=encoded_id,
                     title=address,
                     input_message_content=InputTextMessageContent(address),
                     reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton(self.lang_messages["select_msg"].format(address=address), callback_data=f",{address}")
+                        InlineKeyboardButton(select_msg.format(address=address),
+                                             callback_data=answer_data(f"@{encoded_id}", question_code))
                     ]])
-                ) for address in ac
-            ], key=lambda x: x.id)
+                ))
+
+        # respond with the results
+        with INLINE_QUERY_SECONDS.labels("telegram").time():
+            await context.bot.answer_inline_query(update.inline_query.id, results)
+
+    def __top_addresses(self, query: str) -> list:
+        """
+        This method returns the ids of the most often selected addresses matching the query, then in the order of the
+        address index.
+        """
+        counts = self.popularity.counts
+        if counts:
+            return heapq.nsmallest(INLINE_QUERY_RESULTS, self.address_index.autocomplete_ids(query),
+                                   key=lambda address_id: (-counts.get(address_id, 0), address_id))
+        return heapq.nsmallest(INLINE_QUERY_RESULTS, self.address_index.autocomplete_ids(query))
+
+    async def location_message(self, update: Update, context: CustomContext) -> None:
+        """
+        This method handles a location shared by the user. While the address question is asked, it offers the nearest
+        addresses as buttons, which are answered like an address selected in the inline search.
+        :param update: The update from Telegram.
+        :param context: The context of the chat.
+        """
+        messages = self.__messages(context.user_data)
+        if not self.readiness.is_ready(SURVEY_DATA) or not self.__asks_address(context.user_data):
+            await update.message.reply_text(messages["location_not_expected"])
+            return
+        if not self.readiness.is_ready(ADDRESS_INDEX) or self.address_grid is None:
+            await update.message.reply_text(messages["address_search_warming_up"])
+            return
+        location = update.message.location
+        with NEAREST_ADDRESS_SECONDS.time():
+            nearest = self.address_grid.nearest(location.latitude, location.longitude, NEAREST_ADDRESSES,
+                                                MAX_ADDRESS_DISTANCE)
+        """ Addresses listed twice in the data (e.g. several entrances) are offered once """
+        addresses = {}
+        for address_id, distance in nearest:
+            addresses.setdefault(self.address_index.word(address_id), address_id)
+        address_ids = list(addresses.values())
+        if not address_ids:
+            await update.message.reply_text(messages["no_address_nearby"])
+            return
+        question_code = self.__current_question_code(context.user_data)
+        buttons = [InlineKeyboardButton(self.address_index.word(address_id),
+                                        callback_data=answer_data(f"@{encode_address_id(address_id)}", question_code))
+                   for address_id in address_ids]
+        await update.message.reply_text(messages["nearest_addresses_msg"],
+                                        reply_markup=InlineKeyboardMarkup(self.__build_menu(buttons, n_cols=1)))
+
+    def __asks_address(self, user_data: dict) -> bool:
+        """
+        This method checks whether the current question of the user is an address question.
+        """
+        if 'current_question' not in user_data:
+            return False
+        questions = self.__compiled_questions(user_data)
+        current_question = user_data['current_question']
+        return current_question < len(questions) and not questions[current_question].answer_texts
 
-            # respond with the results, limiting to the first 50
-            await context.bot.answer_inline_query(update.inline_query.id, results[:50])
+    async def __survey_not_ready(self, update: Update, context: CustomContext) -> bool:
+        """
+        This method tells the user to try again later while the survey data is still loading. A pressed button is
+        answered with an alert and keeps its message, so the user can press it again.
+        :return: True if the survey data is not ready
+        """
+        if self.readiness.is_ready(SURVEY_DATA):
+            return False
+        text = self.__messages(context.user_data)["survey_not_ready"]
+        if update.callback_query is not None:
+            await update.callback_query.answer(text, show_alert=True)
+        else:
+            await update.effective_message.reply_text(text)
+        return True
+
+    async def __answer_warming_up(self, update: Update, context: CustomContext):
+        """
+        This method answers an inline query with a single hint while the address index is still loading. The answer
+        is not cached by Telegram, so the same query returns addresses once the index is ready.
+        """
+        text = self.__messages(context.user_data)["address_search_warming_up"]
+        result = InlineQueryResultArticle(id="warming-up", title=text, input_message_content=InputTextMessageContent(text))
+        await update.inline_query.answer([result], cache_time=0)
 
     @staticmethod
     def error(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -435,21 +1262,25 @@ class TelegramBotHandler:
         :param context: The context of the chat.
         :return: The next state to move to in the conversation.
         """
-        if 'current_question' not in context.user_data or context.user_data['current_question'] >= len(self.questions):
+        if await self.__survey_not_ready(update, context):
+            return ConversationHandler.END
+        if 'current_question' not in context.user_data or \
+                context.user_data['current_question'] >= len(self.__questions(context.user_data)):
             keyboard = []
             user = update.effective_user
-            greet_and_set_frequency_text = self.lang_messages["greet_and_set_frequency"].format(
+            messages = self.__messages(context.user_data)
+            greet_and_set_frequency_text = messages["greet_and_set_frequency"].format(
                 username=user.first_name)
             await update.message.reply_text(greet_and_set_frequency_text)
 
             """ You can add the inline keyboard buttons here"""
             for key, value in self.FREQUENCIES.items():
-                button_text = value["text"]
+                button_text = messages.get(key, value["text"])
                 callback_data = key
                 keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
 
             reply_markup = InlineKeyboardMarkup(keyboard)
-            select_frequency_text = self.lang_messages["select_frequency"]
+            select_frequency_text = messages["select_frequency"]
             await update.message.reply_text(select_frequency_text, reply_markup=reply_markup)
             return self.SET_FREQUENCY
 
@@ -462,27 +1293,230 @@ class TelegramBotHandler:
         :param context: The context of the chat.
         :return: The next state to move to in the conversation.
         """
-        if 'current_question' not in context.user_data or context.user_data['current_question'] >= len(self.questions):
+        if await self.__survey_not_ready(update, context):
+            return ConversationHandler.END
+        if 'current_question' not in context.user_data or \
+                context.user_data['current_question'] >= len(self.__questions(context.user_data)):
             query = update.callback_query
             await query.answer()
 
             selected_frequency = query.data
             context.user_data['frequency'] = selected_frequency
 
-            text_to_show = self.FREQUENCIES[selected_frequency]["text"]
+            messages = self.__messages(context.user_data)
+            text_to_show = messages.get(selected_frequency, self.FREQUENCIES[selected_frequency]["text"])
 
             """ reply to the user"""
-            frequency_set_confirmation_text = self.lang_messages["frequency_set_confirmation"].format(
+            frequency_set_confirmation_text = messages["frequency_set_confirmation"].format(
                 frequency=text_to_show)
             await query.edit_message_text(frequency_set_confirmation_text)
         return ConversationHandler.END
 
-    async def run(self) -> None:
+    async def set_timezone_command(self, update: Update, context: CustomContext):
         """
-        This method configures and starts the bot.
+        This method handles the '/settimezone <zone>' command, e.g. '/settimezone Europe/Vienna'.
+        The time zone is used to evaluate the user's send window.
+        :param update: The update from Telegram.
+        :param context: The context of the chat.
+        """
+        messages = self.__messages(context.user_data)
+        if len(context.args) != 1:
+            await update.message.reply_text(messages["timezone_usage"])
+            return
+        try:
+            tz = get_timezone(context.args[0])
+        except ValueError:
+            await update.message.reply_text(messages["invalid_timezone"].format(timezone=context.args[0]))
+            return
+        context.user_data['timezone'] = tz.key
+        await update.message.reply_text(messages["timezone_set"].format(timezone=tz.key))
+
+    async def set_send_window_command(self, update: Update, context: CustomContext):
+        """
+        This method handles the '/setwindow HH:MM-HH:MM' command, which sets the time of day in which questions may be
+        sent to the user.
+        :param update: The update from Telegram.
+        :param context: The context of the chat.
+        """
+        messages = self.__messages(context.user_data)
+        if len(context.args) != 1:
+            await update.message.reply_text(messages["send_window_usage"])
+            return
+        try:
+            window = SendWindow.parse(context.args[0])
+        except ValueError:
+            await update.message.reply_text(messages["invalid_send_window"].format(window=context.args[0]))
+            return
+        context.user_data['send_window'] = str(window)
+        await update.message.reply_text(messages["send_window_set"].format(window=window))
+
+    def __is_admin(self, update: Update, command: str) -> bool:
+        """
+        This method checks whether the sender of an update is listed in ADMIN_IDS, and logs refused admin commands.
+        """
+        if update.effective_user.id in self.ADMIN_IDS:
+            return True
+        LOGGER.warning("User %s is not allowed to use /%s.", update.effective_user.id, command)
+        return False
+
+    async def reload_survey(self) -> int:
+        """
+        This method fetches all surveys from LimeSurvey again in a background thread and swaps them in, so changes of
+        the surveys are picked up without a restart. Updates keep being handled while the surveys are fetched. The
+        position of every participant is mapped onto the new question list of their survey by question code.
+        :return: Number of participants whose position was mapped.
+        """
+        async with self.reload_lock:
+            reloaded = await in_daemon_thread(
+                lambda: {sid: self.surveys.load(sid) for sid in self.surveys.survey_ids})
+            """ Swap without awaiting in between, so no handler sees the new questions with old positions """
+            remapped = 0
+            for user_data in self.app.user_data.values():
+                sid = user_data.get('sid', self.surveys.default_sid)
+                if 'current_question' in user_data and sid in reloaded:
+                    user_data['current_question'] = remap_question_index(self.surveys.questions(sid),
+                                                                         reloaded[sid].question_list(),
+                                                                         user_data['current_question'])
+                    remapped += 1
+            for sid, survey_data in reloaded.items():
+                self.surveys.set(sid, survey_data)
+            LOGGER.info("%s surveys reloaded, %s participants remapped.", len(reloaded), remapped)
+            return remapped
+
+    async def __reload_survey_job(self, context: CallbackContext):
+        """
+        This method reloads the survey periodically, every SURVEY_RELOAD_INTERVAL seconds.
+        """
+        if not self.readiness.is_ready(SURVEY_DATA) or self.reload_lock.locked():
+            return
+        try:
+            await self.reload_survey()
+        except Exception as err:
+            LOGGER.error("Reloading the survey failed, keeping the current one: %s", err)
+
+    async def reload_command(self, update: Update, context: CustomContext):
+        """
+        This method handles the admin command '/reload', which reloads the surveys from LimeSurvey. In multi-process mode
+        only the worker owning the admin reloads; use SURVEY_RELOAD_INTERVAL to reload all of them.
+        :param update: The update from Telegram.
+        :param context: The context of the chat.
+        """
+        if not self.__is_admin(update, "reload"):
+            return
+        messages = self.__messages(context.user_data)
+        if not self.readiness.is_ready(SURVEY_DATA):
+            await update.message.reply_text(messages["survey_warming_up"])
+            return
+        try:
+            remapped = await self.reload_survey()
+        except Exception as err:
+            LOGGER.error("Reloading the survey failed, keeping the current one: %s", err)
+            await update.message.reply_text(messages["survey_reload_failed"].format(error=err))
+            return
+        await update.message.reply_text(messages["survey_reloaded"].format(surveys=len(self.surveys),
+                                                                          participants=remapped))
+
+    async def stats_command(self, update: Update, context: CustomContext):
+        """
+        This method handles the admin command '/stats', which shows how often every answer was chosen so far, from the
+        counts kept by the bot. In multi-process mode it shows the counts of the worker owning the admin; the /stats
+        endpoint of the front-end adds up all workers.
+        :param update: The update from Telegram.
+        :param context: The context of the chat.
+        """
+        if not self.__is_admin(update, "stats"):
+            return
+        messages = self.__messages(context.user_data)
+        if not self.readiness.is_ready(SURVEY_DATA):
+            await update.message.reply_text(messages["survey_warming_up"])
+            return
+        lines = []
+        for sid in self.surveys.survey_ids:
+            lines.append(messages["stats_survey"].format(
+                sid=sid, completed=self.answer_statistics.completed.get(sid, 0)))
+            for question_data in self.surveys.questions(sid):
+                counts = self.answer_statistics.answers.get(question_data['code'])
+                if not counts or not question_data.get('answeroptions'):
+                    continue
+                total = sum(counts.values())
+                lines.append(question_data.get('title') or question_data['code'])
+                for answer_key, answer_data in question_data['answeroptions'].items():
+                    count = counts.get(answer_key, 0)
+                    lines.append(messages["stats_answer"].format(
+                        answer=answer_data['answer'], count=count, percent=round(100 * count / total) if total else 0))
+        """ Split long statistics into several messages """
+        text = ""
+        for line in lines:
+            if text and len(text) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+                await update.message.reply_text(text)
+                text = ""
+            text = f"{text}\n{line[:MAX_MESSAGE_LENGTH - 1]}" if text else line[:MAX_MESSAGE_LENGTH]
+        await update.message.reply_text(text or messages["stats_empty"])
+
+    async def profile_command(self, update: Update, context: CustomContext):
+        """
+        This method handles the admin command '/profile <seconds>'. It samples the stack of the event loop for the given
+        time and writes the profile to PROFILE_DIR. In multi-process mode the worker owning the admin is profiled.
+        :param update: The update from Telegram.
+        :param context: The context of the chat.
+        """
+        if not self.__is_admin(update, "profile"):
+            return
+        messages = self.__messages(context.user_data)
+        try:
+            seconds = int(context.args[0]) if len(context.args) == 1 else None
+        except ValueError:
+            seconds = None
+        if seconds is None or not 0 < seconds <= MAX_PROFILE_SECONDS:
+            await update.message.reply_text(messages["profile_usage"].format(max_seconds=MAX_PROFILE_SECONDS))
+            return
+        if self.profiler.running():
+            await update.message.reply_text(messages["profile_running"])
+            return
+        await update.message.reply_text(messages["profile_started"].format(seconds=seconds))
+        """ Sample from another thread, the event loop keeps serving the traffic being profiled """
+        try:
+            path, samples = await asyncio.to_thread(self.profiler.profile, seconds, threading.get_ident())
+        except RuntimeError:
+            """ Another /profile started meanwhile """
+            await update.message.reply_text(messages["profile_running"])
+            return
+        LOGGER.info("Profile with %s samples written to %s.", samples, path)
+        await update.message.reply_text(messages["profile_done"].format(samples=samples, path=path))
+
+    async def __checkpoint_responses_job(self, context: CallbackContext):
+        """
+        This method writes the buffered answers to LimeSurvey, every RESPONSE_CHECKPOINT_INTERVAL seconds, or retries
+        the responses which could not be written every RESPONSE_RETRY_INTERVAL seconds.
+        """
+        await self.__write_responses()
+
+    async def __write_responses(self):
+        """
+        This method writes the buffered answers to LimeSurvey in another thread. Responses which could not be written
+        stay buffered for the next attempt.
+        """
+        async with self.flush_lock:
+            if self.surveys is None or not self.checkpointer.pending():
+                return
+            try:
+                await asyncio.to_thread(self.checkpointer.flush, self.surveys)
+            except Exception as err:
+                LOGGER.error("Writing responses to LimeSurvey failed: %s", err)
+
+    async def __flush_responses(self):
+        """
+        This method writes the answers still buffered to LimeSurvey when the bot stops.
+        """
+        async with self.flush_lock:
+            if self.surveys is not None and self.checkpointer.pending():
+                written = await asyncio.to_thread(self.checkpointer.flush, self.surveys)
+                LOGGER.info("%s responses written to LimeSurvey before stopping.", written)
+
+    def __register_handlers(self):
+        """
+        This method registers all command, callback and inline query handlers.
         """
-        """ Setup and initialization code here... """
-        print('Starting bot...')
 
         """ Add conversation handler with the states SET_FREQUENCY """
         self.app.add_handler(
@@ -494,69 +1528,165 @@ class TelegramBotHandler:
                 fallbacks=[CommandHandler("cancel", self.cancel_command)],
             )
         )
+        """ Restore evicted sessions before any other handler sees the update """
+        if self.SESSION_IDLE_TTL or self.session_store is not None:
+            self.app.add_handler(TypeHandler(Update, self.track_session), group=-1)
         """ Register Commands """
         self.app.add_handler(CommandHandler("start", self.start_command))
         self.app.add_handler(CommandHandler("cancel", self.cancel_command))
         self.app.add_handler(CommandHandler("help", self.help_command))
         self.app.add_handler(CommandHandler("h", self.admin_help_command))
+        self.app.add_handler(CommandHandler("settimezone", self.set_timezone_command))
+        self.app.add_handler(CommandHandler("setwindow", self.set_send_window_command))
+        self.app.add_handler(CommandHandler("profile", self.profile_command, block=False))
+        self.app.add_handler(CommandHandler("reload", self.reload_command, block=False))
+        self.app.add_handler(CommandHandler("stats", self.stats_command))
         """ Register callback query handlers """
         self.app.add_handler(CallbackQueryHandler(self.handle_user_answer, pattern=f"^,"))
         self.app.add_handler(CallbackQueryHandler(self.confirmation_button_click, pattern=f"^_yes|^_no"))
 
         # on inline queries - show corresponding inline results
         self.app.add_handler(InlineQueryHandler(self.inline_query))
+        # on shared locations - offer the nearest addresses; live locations are refreshed as edits, which are ignored
+        self.app.add_handler(MessageHandler(filters.LOCATION & filters.UpdateType.MESSAGE, self.location_message))
 
         """ Register Errors """
         self.app.add_error_handler(self.error)
 
+    def setup(self):
+        """
+        This method registers handlers and metrics. It is called once before the application is started.
+        """
+        self.__register_handlers()
+        self.__register_metrics()
+        self.__load_statistics()
+        if self.SURVEY_RELOAD_INTERVAL:
+            self.job_queue.run_repeating(self.__reload_survey_job, self.SURVEY_RELOAD_INTERVAL,
+                                         first=self.SURVEY_RELOAD_INTERVAL)
+        if self.POPULARITY_FILE:
+            self.job_queue.run_repeating(self.__save_popularity_job, self.POPULARITY_SAVE_INTERVAL,
+                                         first=self.POPULARITY_SAVE_INTERVAL)
+        checkpoint_interval = self.RESPONSE_CHECKPOINT_INTERVAL or RESPONSE_RETRY_INTERVAL
+        self.job_queue.run_repeating(self.__checkpoint_responses_job, checkpoint_interval, first=checkpoint_interval)
+        if self.STATS_FILE:
+            self.job_queue.run_repeating(self.__save_statistics_job, self.STATS_SAVE_INTERVAL,
+                                         first=self.STATS_SAVE_INTERVAL)
+        if self.SESSION_IDLE_TTL:
+            self.job_queue.run_repeating(self.__sweep_sessions_job, self.SESSION_SWEEP_INTERVAL,
+                                         first=self.SESSION_SWEEP_INTERVAL)
+
+    def __register_metrics(self):
+        """
+        This method registers the gauges describing the state of the bot.
+        """
+        metrics.gauge("active_users", "Users with a survey in progress", function=self.__count_active_users)
+        metrics.gauge("scheduled_jobs", "Questions scheduled in the job queue",
+                      function=lambda: sum(1 for job in self.job_queue.jobs() if job.chat_id is not None))
+        metrics.gauge("resident_sessions", "Users whose session is in memory", function=lambda: len(self.app.user_data))
+        metrics.gauge(ANSWERS_METRIC, "Answers given to each question, by answer", ["question", "answer"],
+                      function=self.answer_statistics.answer_samples)
+        metrics.gauge(COMPLETED_METRIC, "Completed responses by survey", ["survey"],
+                      function=self.answer_statistics.completed_samples)
+
+    def __count_active_users(self) -> int:
+        """
+        This method counts the users who started a survey and have not answered all its questions yet.
+        """
+        if self.surveys is None:
+            return 0
+        return sum(1 for user_data in self.app.user_data.values()
+                   if 'current_question' in user_data and user_data['current_question'] < len(self.__questions(user_data)))
+
+    def __start_diagnostics(self):
+        """
+        This method starts the event loop blocking detector if DIAGNOSTICS is enabled.
+        """
+        if self.loop_monitor is not None:
+            self.loop_monitor.start()
+            LOGGER.info("Diagnostics enabled, logging event loop blocks longer than %s s.", self.loop_monitor.threshold)
+
+    async def __stop_diagnostics(self):
+        if self.loop_monitor is not None:
+            await self.loop_monitor.stop()
+
+    async def run(self) -> None:
+        """
+        This method configures and starts the bot.
+        """
+        """ Setup and initialization code here... """
+        print('Starting bot...')
+        self.setup()
+
         """ Pass webhook settings to telegram """
-        await self.app.bot.set_webhook(url=f"{self.URL}/telegram", allowed_updates=Update.ALL_TYPES)
+        await self.app.bot.set_webhook(url=f"{self.URL}/telegram", allowed_updates=Update.ALL_TYPES,
+                                       secret_token=self.WEBHOOK_SECRET)
 
-        flask_app = FlaskApp(self.app)
+        ingest = UpdateIngestQueue(self.app, self.UPDATE_QUEUE_SIZE)
+        dedupe = UpdateDeduplicator(self.DEDUPE_WINDOW)
+        capture = build_update_capture(self.config)
+        webhook_app = WebhookApp(ingest, dedupe, self.HOST, self.PORT, self.WEBHOOK_SECRET, readiness=self.readiness,
+                                 stats_source=self.answer_statistics.summary, stats_token=self.config.STATS_TOKEN,
+                                 capture=capture)
 
-        """ Run application and webserver together"""
+        """ Run application and webserver together on the same event loop, while the components load """
         async with self.app:
             await self.app.start()
-            await flask_app.run().serve()
+            ingest.start()
+            self.__start_diagnostics()
+            loader = asyncio.create_task(self.load_components())
+            await webhook_app.run().serve()
+            loader.cancel()
+            if capture is not None:
+                await asyncio.to_thread(capture.stop)
+            await self.__stop_diagnostics()
+            await ingest.stop()
             await self.app.stop()
+            await self.__flush_responses()
+            await self.__save_popularity()
+            await self.__save_statistics()
+            await self.__store_sessions()
 
-
-class TextParser:
-    """
-    Class to parse text, specifically separating text and images.
-    """
-
-    @staticmethod
-    async def separate_text_and_image(text):
-        """
-        This method parses the passed text and separates out any 'img' elements and their src URLs.
-        :param text: Text to parse.
-        :return: Tuple containing a list of image urls and an object of parsed text.
-        """
-        # Use BeautifulSoup to parse the text
-        soup = BeautifulSoup(text, 'html.parser')
-        # Find img tags
-        img_tags = soup.find_all('img')
-        # Extract the src URLs from the img tags
-        img_urls = [img['src'] for img in img_tags if 'src' in img.attrs]
-        # Remove img tags from the text
-        for img_tag in img_tags:
-            img_tag.extract()
-        return img_urls, soup
-
-    @staticmethod
-    def get_answer_text(question_data: dict, answer_key: str):
+    async def run_worker(self, inbox, worker_index: int, metrics_outbox) -> None:
         """
-        This method tries to get the answer text from the 'answeroptions' dictionary using the provided answer_key.
-        :param question_data: Question data containing the 'answeroptions' field.
-        :param answer_key: The key to lookup the 'answeroptions' field.
-        :return: Answer corresponding to the answer_key or None if not found.
+        This method starts the bot as a worker process of a multi-process deployment. Instead of serving the webhook,
+        the worker processes the raw updates the front-end routes to its 'inbox' until it receives None. The metrics of
+        the worker are sent to the front-end periodically, which serves them on its /metrics endpoint.
+        :param inbox: multiprocessing queue of raw updates.
+        :param worker_index: Index of the worker.
+        :param metrics_outbox: multiprocessing queue receiving (worker_index, metric families) tuples.
         """
-        # Check if 'answeroptions' is an empty dictionary
-        if not question_data.get('answeroptions'):
-            return answer_key
+        if self.POPULARITY_FILE:
+            """ Every worker saves its own counts, they are added up when loaded """
+            self.popularity_file = f"{self.POPULARITY_FILE}.{worker_index}"
+            if self.address_index is not None:
+                self.__load_popularity()
+        if self.STATS_FILE:
+            """ Every worker keeps the counts of its own participants, the front-end adds them up """
+            self.stats_file = f"{self.STATS_FILE}.{worker_index}"
+        self.setup()
+        ingest = UpdateIngestQueue(self.app, self.UPDATE_QUEUE_SIZE)
+        metrics.gauge("update_queue_depth", "Updates waiting in the queue of the worker", function=ingest.depth)
+        loop = asyncio.get_running_loop()
+
+        async def push_metrics(context):
+            try:
+                metrics_outbox.put_nowait((worker_index, metrics.REGISTRY.collect()))
+            except queue.Full:
+                pass
 
-        for option_key, option_data in question_data['answeroptions'].items():
-            if option_key == answer_key:
-                return option_data['answer']
-        return None  # Return None if the answer_key is not found
+        async with self.app:
+            await self.app.start()
+            ingest.start()
+            self.job_queue.run_repeating(push_metrics, METRICS_PUSH_INTERVAL, first=0)
+            self.__start_diagnostics()
+            raw = await loop.run_in_executor(None, inbox.get)
+            while raw is not None:
+                await ingest.put(raw)
+                raw = await loop.run_in_executor(None, inbox.get)
+            await self.__stop_diagnostics()
+            await ingest.stop()
+            await self.app.stop()
+            await self.__flush_responses()
+            await self.__save_popularity()
+            await self.__save_statistics()
+            await self.__store_sessions()
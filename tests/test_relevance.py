@@ -0,0 +1,71 @@
+import unittest
+
+from relevance import RelevanceCompiler, RelevanceError, always_relevant, compile_relevance
+
+""" Variables of the equations: question codes and SGQA codes to the keys of the answers in the user data """
+VARIABLES = {"Q1": "123456X1X11", "Q2": "123456X1X12", "AGE": "123456X2X21", "123456X1X11": "123456X1X11",
+             "123456X1X12": "123456X1X12"}
+
+
+class RelevanceCompilerTest(unittest.TestCase):
+    """
+    Tests of the relevance equation compiler with equations as LimeSurvey exports them.
+    """
+
+    def relevant(self, expression: str, answers: dict) -> bool:
+        return RelevanceCompiler(VARIABLES).compile(expression)(answers)
+
+    def test_empty_and_constant_equations_are_always_relevant(self):
+        for expression in (None, "", " ", "1"):
+            self.assertIs(RelevanceCompiler(VARIABLES).compile(expression), always_relevant)
+
+    def test_comparison_of_answer_codes(self):
+        self.assertTrue(self.relevant('((Q1.NAOK == "A1"))', {"123456X1X11": "A1"}))
+        self.assertFalse(self.relevant('((Q1.NAOK == "A1"))', {"123456X1X11": "A2"}))
+        self.assertTrue(self.relevant("Q1 != 'A1'", {"123456X1X11": "A2"}))
+
+    def test_sgqa_codes_with_suffix(self):
+        for suffix in ("", ".NAOK", ".value", ".code", ".valueNAOK"):
+            expression = f'123456X1X11{suffix} == "A1"'
+            self.assertTrue(self.relevant(expression, {"123456X1X11": "A1"}), expression)
+            self.assertFalse(self.relevant(expression, {"123456X1X11": "A2"}), expression)
+
+    def test_unanswered_questions_are_empty(self):
+        self.assertTrue(self.relevant("is_empty(Q1.NAOK)", {}))
+        self.assertFalse(self.relevant('Q1.NAOK == "A1"', {}))
+        self.assertTrue(self.relevant('Q1.NAOK == ""', {}))
+
+    def test_word_operators_and_precedence(self):
+        answers = {"123456X1X11": "A1", "123456X1X12": "A2"}
+        self.assertTrue(self.relevant('Q1 == "A1" and Q2 == "A2"', answers))
+        self.assertFalse(self.relevant('Q1 == "A1" and not Q2 == "A2"', answers))
+        self.assertTrue(self.relevant('Q1 == "A3" || Q1 == "A1" && Q2 eq "A2"', answers))
+        self.assertFalse(self.relevant('(Q1 == "A3" || Q1 == "A1") && Q2 ne "A2"', answers))
+
+    def test_numbers_compare_numerically(self):
+        self.assertTrue(self.relevant("AGE >= 18", {"123456X2X21": "18"}))
+        """ As strings, "10" would sort before "9" """
+        self.assertTrue(self.relevant("AGE gt 9", {"123456X2X21": "10"}))
+        self.assertTrue(self.relevant("AGE * 2 - 1 == 19", {"123456X2X21": "10"}))
+
+    def test_functions(self):
+        answers = {"123456X1X11": "A1", "123456X2X21": "7"}
+        self.assertTrue(self.relevant("count(Q1, Q2) == 1", answers))
+        self.assertTrue(self.relevant('in_array(Q1, "A2", "A1")', answers))
+        self.assertTrue(self.relevant("intval(AGE) + sum(1, 2) == 10", answers))
+        self.assertTrue(self.relevant("strlen(Q1) == 2", answers))
+
+    def test_curly_braces_are_parentheses(self):
+        self.assertTrue(self.relevant('{Q1.NAOK == "A1"}', {"123456X1X11": "A1"}))
+
+    def test_unsupported_equations_raise(self):
+        for expression in ('Q9 == "A1"', 'Q1.shown == "A1"', 'unknown(Q1)', 'Q1 == "A1" )', 'Q1 ==', 'Q1 # 2'):
+            with self.assertRaises(RelevanceError, msg=expression):
+                RelevanceCompiler(VARIABLES).compile(expression)
+
+    def test_unsupported_equations_are_always_relevant(self):
+        self.assertIs(compile_relevance('Q9 == "A1"', VARIABLES), always_relevant)
+
+
+if __name__ == "__main__":
+    unittest.main()
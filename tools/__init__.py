@@ -0,0 +1,4 @@
+"""
+Offline tooling for the survey chatbot: load generators, fakes and benchmarks. Run the modules from the repository
+root, e.g. ``python -m tools.load_generator --help``.
+"""
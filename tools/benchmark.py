@@ -0,0 +1,323 @@
+"""
+Offline benchmark suite of the bot's hot paths.
+
+Uses the fixture address CSV, the LimeSurvey stub and the fake Bot API, so it needs no network access:
+
+    python -m tools.benchmark --scale 50 --output bench.json
+
+Results are printed (and optionally written) as one JSON document, so runs of different releases can be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from bs4 import BeautifulSoup
+
+from address_index import AddressIndex, address_postcode
+from buildAddressDataset import AddressDownloader
+from config import Config
+from html_normalizer import TelegramHTMLNormalizer
+from relevance import compile_relevance
+from spatial_index import GridIndex
+from telegram_bot_handler import build_survey_registry
+from tools import updates
+from tools.harness import ADDRESS_CSV, ROOT, OfflineBot, offline_environment
+from tools.limesurvey_stub import FIXTURE, LimeSurveyStub
+from tools.load_generator import percentile
+from trie import Trie
+
+
+def latency_summary(latencies: list) -> dict:
+    """
+    Summarizes latencies given in seconds, in milliseconds.
+    """
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 4) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if latencies else 0.0,
+    }
+
+
+def load_addresses(scale: int) -> list:
+    """
+    Reads the fixture addresses, repeated 'scale' times with distinct house number suffixes to approximate a
+    city-sized index.
+    """
+    addresses = AddressDownloader(ADDRESS_CSV).get_addresses()
+    if scale <= 1:
+        return addresses
+    return [f"{address.rpartition(',')[0]}/{copy}, {address_postcode(address)}" if copy else address
+            for copy in range(scale) for address in addresses]
+
+
+def build_trie(addresses: list) -> Trie:
+    trie = Trie()
+    for address in addresses:
+        trie.insert(address)
+    return trie
+
+
+def build_address_index(addresses: list, max_partitions: int = 0) -> AddressIndex:
+    address_index = AddressIndex(max_partitions)
+    for address in addresses:
+        address_index.insert(address)
+    address_index.preload()
+    return address_index
+
+
+def bench_address_partitions(address_index: AddressIndex, addresses: list, queries: int) -> dict:
+    """
+    Compares queries searching all partitions of the address index with the same queries scoped to a postcode, and
+    measures building a partition.
+    """
+    rng = random.Random(3)
+    results = {}
+    samples = rng.choices(addresses, k=queries)
+    scopes = {"unscoped": lambda address: address[:4],
+              "leading_postcode": lambda address: f"{address_postcode(address)} {address[:4]}",
+              "trailing_postcode": lambda address: f"{address[:4]}, {address_postcode(address)}"}
+    for name, build_query in scopes.items():
+        timings = []
+        for address in samples:
+            query = build_query(address)
+            started = time.perf_counter()
+            sum(1 for _ in address_index.autocomplete_ids(query))
+            timings.append(time.perf_counter() - started)
+        results[name] = latency_summary(timings)
+    postcode = address_postcode(samples[0])
+    cold = AddressIndex(1)
+    for address in addresses:
+        cold.insert(address)
+    started = time.perf_counter()
+    cold.load([postcode])
+    results["partition_build_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return results
+
+
+def bench_trie_insert(addresses: list) -> dict:
+    started = time.perf_counter()
+    build_trie(addresses)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    trie = build_trie(addresses)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del trie
+    return {"addresses": len(addresses), "elapsed_s": round(elapsed, 4),
+            "inserts_per_s": round(len(addresses) / elapsed, 1), "memory_bytes": current, "peak_memory_bytes": peak}
+
+
+def bench_trie_autocomplete(trie: Trie, addresses: list, queries: int) -> dict:
+    rng = random.Random(1)
+    results = {}
+    for length in (1, 3, 6, 10):
+        prefixes = [address[:length].lower() for address in rng.choices(addresses, k=queries)]
+        matches = 0
+        started = time.perf_counter()
+        for prefix in prefixes:
+            matches += sum(1 for _ in trie.autocomplete(prefix))
+        elapsed = time.perf_counter() - started
+        results[f"prefix_{length}"] = {"queries_per_s": round(len(prefixes) / elapsed, 1),
+                                       "mean_matches": round(matches / len(prefixes), 1)}
+    return results
+
+
+def bench_nearest_address(scale: int, queries: int) -> dict:
+    """
+    Builds the GridIndex of the fixture coordinates, repeated 'scale' times with a small offset, and measures the
+    lookup of the nearest addresses to locations next to random addresses.
+    """
+    coordinates = [point for point in AddressDownloader(ADDRESS_CSV).get_coordinates() if point is not None]
+    points = [(index, latitude + copy * 1e-4, longitude + copy * 1e-4) for copy in range(max(1, scale))
+              for index, (latitude, longitude) in enumerate(coordinates)]
+    started = time.perf_counter()
+    grid = GridIndex(points)
+    build_elapsed = time.perf_counter() - started
+    rng = random.Random(1)
+    timings = []
+    for _, latitude, longitude in rng.choices(points, k=queries):
+        started = time.perf_counter()
+        grid.nearest(latitude + rng.uniform(-1e-3, 1e-3), longitude + rng.uniform(-1e-3, 1e-3), 5, 500)
+        timings.append(time.perf_counter() - started)
+    return {"points": len(grid), "build_s": round(build_elapsed, 4), "nearest": latency_summary(timings)}
+
+
+def bench_survey_data(config: Config, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        surveys = build_survey_registry(config)
+        timings.append(time.perf_counter() - started)
+    return {"questions": len(surveys.questions(surveys.default_sid)), **latency_summary(timings)}
+
+
+def legacy_html_pipeline(text: str, base_url: str) -> tuple:
+    """
+    The question text pipeline before TelegramHTMLNormalizer, for comparison: three replace passes when the survey
+    was loaded, then a BeautifulSoup tree every time the question was sent.
+    """
+    text = text.replace("<br />", "\n")
+    text = re.sub(r'src="(/upload/surveys/\d+/images/[^"]+)"', f'src="{base_url}\\1"', text)
+    text = text.replace("<p>", "\n").replace("</p>", "")
+    soup = BeautifulSoup(text, 'html.parser')
+    img_tags = soup.find_all('img')
+    img_urls = [img['src'] for img in img_tags if 'src' in img.attrs]
+    for img_tag in img_tags:
+        img_tag.extract()
+    return str(soup), img_urls
+
+
+def bench_question_html(repeat: int) -> dict:
+    """
+    Compares the legacy question text pipeline with TelegramHTMLNormalizer on the question texts of the fixture.
+    """
+    with open(FIXTURE, encoding="utf-8") as fixture:
+        texts = [question["question"] for survey in json.load(fixture).values()
+                 for group in survey["groups"] for question in group["questions"]]
+    base_url = "https://limesurvey.example.org"
+    normalizer = TelegramHTMLNormalizer(base_url)
+    results = {}
+    for name, pipeline in (("legacy", lambda text: legacy_html_pipeline(text, base_url)),
+                           ("normalizer", normalizer.normalize)):
+        timings = []
+        for _ in range(repeat * 100):
+            for text in texts:
+                started = time.perf_counter()
+                pipeline(text)
+                timings.append(time.perf_counter() - started)
+        results[name] = latency_summary(timings)
+    results["speedup"] = round(results["legacy"]["mean_ms"] / results["normalizer"]["mean_ms"], 2)
+    return results
+
+
+def bench_relevance(repeat: int) -> dict:
+    """
+    Compiles the relevance equations of the fixture, plus a longer one, and measures evaluating them for a participant.
+    """
+    with open(FIXTURE, encoding="utf-8") as fixture:
+        questions = [question for survey in json.load(fixture).values()
+                     for group in survey["groups"] for question in group["questions"]]
+    variables = {question["title"]: question["title"] for question in questions}
+    expressions = [question.get("relevance", "1") for question in questions]
+    expressions.append('(Q1.NAOK == "A1" or Q1.NAOK == "A2") and !is_empty(Q3) && count(Q1, Q2, Q3) >= 2')
+    started = time.perf_counter()
+    compiled = [compile_relevance(expression, variables) for expression in expressions]
+    compile_elapsed = time.perf_counter() - started
+    answers = {"Q1": "A2", "Q3": "A1"}
+    timings = []
+    for _ in range(repeat * 1000):
+        for relevant in compiled:
+            started = time.perf_counter()
+            relevant(answers)
+            timings.append(time.perf_counter() - started)
+    return {"equations": len(expressions), "compile_ms": round(compile_elapsed * 1000, 3),
+            "evaluate": latency_summary(timings)}
+
+
+async def bench_inline_query(address_index: AddressIndex, addresses: list, queries: int) -> dict:
+    rng = random.Random(2)
+    latencies = []
+    async with OfflineBot(address_index=address_index) as bot:
+        for _ in range(queries):
+            prefix = rng.choice(addresses)[:rng.randint(2, 8)].lower()
+            update = updates.inline_query(1000, prefix)
+            reply = bot.wait_for("answerInlineQuery", update["inline_query"]["id"])
+            started = time.perf_counter()
+            await bot.post(update)
+            await reply
+            latencies.append(time.perf_counter() - started)
+    return latency_summary(latencies)
+
+
+async def bench_webhook_to_reply(address_index: AddressIndex, users: int, messages_per_user: int) -> dict:
+    latencies = []
+
+    async def user(bot: OfflineBot, chat_id: int):
+        for _ in range(messages_per_user):
+            reply = bot.wait_for("sendMessage", chat_id)
+            started = time.perf_counter()
+            await bot.post(updates.message(chat_id, "/help"))
+            await reply
+            latencies.append(time.perf_counter() - started)
+
+    async with OfflineBot(address_index=address_index) as bot:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(bot, 1000 + index) for index in range(users)))
+        elapsed = time.perf_counter() - started
+    return {"users": users, "updates_per_s": round(len(latencies) / elapsed, 1), **latency_summary(latencies)}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(args) -> dict:
+    results = {}
+    addresses = load_addresses(args.scale)
+    results["trie_insert"] = bench_trie_insert(addresses)
+    trie = build_trie(addresses)
+    results["trie_autocomplete"] = bench_trie_autocomplete(trie, addresses, args.queries)
+    address_index = build_address_index(addresses)
+    results["address_partitions"] = bench_address_partitions(address_index, addresses, args.queries)
+    results["nearest_address"] = bench_nearest_address(args.scale, args.queries)
+
+    stub = LimeSurveyStub().start()
+    try:
+        os.environ.update(offline_environment(stub.url))
+        config = Config()
+        results["survey_data_build"] = bench_survey_data(config, args.repeat)
+    finally:
+        stub.stop()
+
+    results["question_html"] = bench_question_html(args.repeat)
+    results["relevance"] = bench_relevance(args.repeat)
+    results["inline_query_e2e"] = asyncio.run(bench_inline_query(address_index, addresses, args.queries))
+    results["webhook_to_reply"] = [asyncio.run(bench_webhook_to_reply(address_index, users, args.messages))
+                                   for users in args.users]
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "arguments": vars(args),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite of the bot's hot paths")
+    parser.add_argument("--scale", type=int, default=1, help="repeat the fixture addresses this many times")
+    parser.add_argument("--queries", type=int, default=200, help="queries per autocomplete/inline benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of the survey and parser benchmarks")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100], help="concurrent users")
+    parser.add_argument("--messages", type=int, default=20, help="messages per user in webhook_to_reply")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Fake Telegram Bot API.
+
+Answers every Bot API method with a plausible result and counts the calls. It can be used in-process through
+FakeRequest (pass it to ``ApplicationBuilder.request``) or as a local HTTP server the bot is pointed to with
+BOT_API_BASE_URL, e.g.
+
+    python -m tools.fake_telegram --port 8081
+    export BOT_API_BASE_URL="http://127.0.0.1:8081/bot"
+
+GET /stats on the server returns the call counters as JSON.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from urllib.parse import parse_qs
+
+import uvicorn
+from telegram.request import BaseRequest
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot", "can_join_groups": False,
+            "can_read_all_group_messages": False, "supports_inline_queries": True}
+
+
+class FakeBotApi:
+    """
+    Produces results for Bot API calls and keeps per-method call counters.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        """
+        Initializes the FakeBotApi object.
+
+        :param delay: Simulated network latency of every call in seconds
+        """
+        self.delay = delay
+        self.calls = Counter()
+        """ Optional callable(method, params) invoked on every call """
+        self.listener = None
+        self.__message_ids = itertools.count(1)
+
+    def result(self, method: str, params: dict):
+        """
+        Builds the result of a Bot API call.
+
+        :param method: Name of the Bot API method, e.g. "sendMessage"
+        :param params: Parameters of the call
+        :return: The value of the 'result' field of the response
+        """
+        self.calls[method] += 1
+        if self.listener is not None:
+            self.listener(method, params)
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "sendPhoto", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0) or 0)
+            message = {"message_id": next(self.__message_ids), "date": int(time.time()),
+                       "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER}
+            if method == "sendPhoto":
+                file_id = f"fake-photo-{message['message_id']}"
+                message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 1, "height": 1}]
+            else:
+                message["text"] = params.get("text", "")
+            return message
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        return True
+
+    def response(self, method: str, params: dict) -> bytes:
+        """
+        Builds the complete JSON response body of a Bot API call.
+
+        :param method: Name of the Bot API method
+        :param params: Parameters of the call
+        :return: JSON encoded response
+        """
+        return json.dumps({"ok": True, "result": self.result(method, params)}).encode()
+
+
+class FakeRequest(BaseRequest):
+    """
+    PTB request backend answering all calls from a FakeBotApi without any network I/O.
+    """
+
+    def __init__(self, api: FakeBotApi = None):
+        self.api = api or FakeBotApi()
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        if self.api.delay:
+            await asyncio.sleep(self.api.delay)
+        params = request_data.parameters if request_data is not None else {}
+        return 200, self.api.response(url.rsplit("/", 1)[-1], params)
+
+
+class FakeBotApiServer:
+    """
+    ASGI application serving a FakeBotApi under /bot<token>/<method>.
+    """
+
+    def __init__(self, api: FakeBotApi):
+        self.api = api
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        if scope["path"] == "/stats":
+            payload = json.dumps({"calls": dict(self.api.calls), "total": sum(self.api.calls.values())}).encode()
+        else:
+            if self.api.delay:
+                await asyncio.sleep(self.api.delay)
+            payload = self.api.response(scope["path"].rsplit("/", 1)[-1], self.parse_params(scope, body))
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload})
+
+    @staticmethod
+    def parse_params(scope, body: bytes) -> dict:
+        """
+        Decodes the parameters of a Bot API call sent as JSON or url encoded form.
+        """
+        headers = dict(scope["headers"])
+        if headers.get(b"content-type", b"").startswith(b"application/json"):
+            return json.loads(body or b"{}")
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="simulated latency of every call in seconds")
+    args = parser.parse_args()
+    uvicorn.run(FakeBotApiServer(FakeBotApi(args.delay)), host=args.host, port=args.port, lifespan="off",
+                log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+In-process harness running the real TelegramBotHandler against the fakes in this package: the LimeSurvey stub, the
+fake Bot API (no network) and the webhook ASGI app called directly. Used by the benchmarks and simulators.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict, deque
+
+from config import Config
+from telegram_bot_handler import TelegramBotHandler, build_update_capture
+from tools.fake_telegram import FakeBotApi, FakeRequest
+from tools.limesurvey_stub import FIXTURE, LimeSurveyStub
+from update_ingest import UpdateDeduplicator, UpdateIngestQueue
+from webhook_app import WebhookApp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDRESS_CSV = os.path.join(ROOT, "tools", "fixtures", "addresses.csv")
+SURVEY_ID = "123456"
+
+
+def offline_environment(api_url: str, port: int = 8000, workers: int = 1, bot_api_base_url: str = None) -> dict:
+    """
+    Builds the environment variables of a bot that talks to local fakes only.
+
+    :param api_url: URL of the LimeSurvey stub
+    :param port: Port of the webhook
+    :param workers: Number of worker processes
+    :param bot_api_base_url: Base URL of a fake Bot API server, if any
+    :return: Dictionary of environment variables
+    """
+    environment = {
+        "TOKEN": "123456:fake-token",
+        "BOT_USERNAME": "@fake_bot",
+        "URL": f"http://127.0.0.1:{port}",
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "HEADERS": '{"content-type": "application/json"}',
+        "API_URL": api_url,
+        "LOGIN": "admin",
+        "PASSWORD": "secret",
+        "SURVEY_ID": SURVEY_ID,
+        "LANG": "en",
+        "MULTI_VOTE": "True",
+        "WORKERS": str(workers),
+        "ADDRESS_CSV": ADDRESS_CSV,
+        "UPDATE_QUEUE_SIZE": "100000",
+        "SEND_WINDOW": "00:00-24:00",
+    }
+    if bot_api_base_url:
+        environment["BOT_API_BASE_URL"] = bot_api_base_url
+    return environment
+
+
+class OfflineBot:
+    """
+    Async context manager running a complete bot in the current event loop. Updates are posted through the webhook
+    ASGI app and every Bot API call the bot makes can be awaited with wait_for().
+    """
+
+    def __init__(self, environment: dict = None, survey_fixture: str = FIXTURE, telegram_delay: float = 0.0,
+                 limesurvey_latency: float = 0.0, address_index=None):
+        """
+        Initializes the OfflineBot object.
+
+        :param environment: Environment variables overriding the offline defaults
+        :param survey_fixture: Survey fixture served by the LimeSurvey stub
+        :param telegram_delay: Simulated latency of Bot API calls in seconds
+        :param limesurvey_latency: Simulated latency of LimeSurvey calls in seconds
+        :param address_index: Prebuilt AddressIndex, built from the fixture CSV if None
+        """
+        self.environment = environment or {}
+        self.stub = LimeSurveyStub(survey_fixture, limesurvey_latency)
+        self.api = FakeBotApi(telegram_delay)
+        self.api.listener = self.__on_call
+        self.address_index = address_index
+        self.__waiters = defaultdict(deque)
+        self.handler = None
+        self.ingest = None
+        self.webhook = None
+        self.capture = None
+
+    async def __aenter__(self) -> "OfflineBot":
+        self.stub.start()
+        os.environ.update(offline_environment(self.stub.url))
+        os.environ.update(self.environment)
+        self.config = Config()
+        self.handler = TelegramBotHandler(self.config, address_index=self.address_index, bot_request=FakeRequest(self.api))
+        self.handler.setup()
+        await self.handler.load_components()
+        await self.handler.app.initialize()
+        await self.handler.app.start()
+        self.ingest = UpdateIngestQueue(self.handler.app, self.config.UPDATE_QUEUE_SIZE)
+        self.ingest.start()
+        """ With CAPTURE_FILE set, offline runs (e.g. of the simulator) are captured like production traffic """
+        self.capture = build_update_capture(self.config)
+        self.webhook = WebhookApp(self.ingest, UpdateDeduplicator(self.config.DEDUPE_WINDOW), "127.0.0.1", 0,
+                                  self.config.WEBHOOK_SECRET, capture=self.capture)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.capture is not None:
+            await asyncio.to_thread(self.capture.stop)
+        await self.ingest.stop()
+        await self.handler.app.stop()
+        await self.handler.app.shutdown()
+        self.stub.stop()
+
+    def __on_call(self, method: str, params: dict):
+        """
+        Resolves the oldest waiter registered for the chat, inline query or callback query of a Bot API call. Waiters
+        which were cancelled (e.g. timed out) are skipped.
+        """
+        for key in ("chat_id", "inline_query_id", "callback_query_id"):
+            if key in params:
+                for waiter_key in ((method, str(params[key])), (None, str(params[key]))):
+                    waiters = self.__waiters.get(waiter_key)
+                    while waiters:
+                        future = waiters.popleft()
+                        if not future.done():
+                            future.set_result((method, params) if waiter_key[0] is None else params)
+                            return
+                return
+
+    def wait_for(self, method: str, key) -> asyncio.Future:
+        """
+        Returns a future resolved with the parameters of the next Bot API call of 'method' for 'key'.
+
+        :param method: Bot API method, e.g. "sendMessage", None for any method
+        :param key: The chat id, or the id of the inline or callback query the call answers
+        :return: The future, resolved with (method, parameters) if 'method' is None
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.__waiters[(method, str(key))].append(future)
+        return future
+
+    async def post(self, update) -> int:
+        """
+        Posts an update to the webhook ASGI app.
+
+        :param update: Update dictionary or raw JSON bytes
+        :return: HTTP status of the response
+        """
+        body = update if isinstance(update, bytes) else json.dumps(update).encode()
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        response = {}
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+
+        scope = {"type": "http", "method": "POST", "path": "/telegram", "headers": []}
+        await self.webhook(scope, receive, send)
+        return response["status"]
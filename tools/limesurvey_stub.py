@@ -0,0 +1,204 @@
+"""
+Stub of the LimeSurvey RemoteControl JSON-RPC API.
+
+Serves the surveys of a JSON fixture (see tools/fixtures/survey.json) and stores submitted responses in memory. It runs
+in a background thread for benchmarks, or standalone:
+
+    python -m tools.limesurvey_stub --port 8082
+    export API_URL="http://127.0.0.1:8082/index.php/admin/remotecontrol"
+"""
+import argparse
+import base64
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "survey.json")
+SESSION_KEY = "stub-session-key"
+
+
+class LimeSurveyStub:
+    """
+    In-memory implementation of the RemoteControl methods used by the bot.
+    """
+
+    def __init__(self, fixture: str = FIXTURE, latency: float = 0.0):
+        """
+        Initializes the LimeSurveyStub object.
+
+        :param fixture: Path of the JSON fixture with the surveys
+        :param latency: Simulated processing time of every call in seconds
+        """
+        with open(fixture, encoding="utf-8") as fixture_file:
+            self.surveys = {int(sid): {**survey, "sid": int(sid)} for sid, survey in json.load(fixture_file).items()}
+        self.latency = latency
+        self.responses = {}
+        self.calls = {}
+        self.__response_ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        self.__server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}/index.php/admin/remotecontrol"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "LimeSurveyStub":
+        """
+        Starts serving in a daemon thread. Port 0 picks a free port, see 'url'.
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+                body = json.dumps(stub.handle(request)).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.__server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server thread.
+        """
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+
+    def handle(self, request: dict) -> dict:
+        """
+        Executes one JSON-RPC request.
+
+        :param request: The decoded request with 'method', 'params' and 'id'
+        :return: The JSON-RPC response
+        """
+        method, params = request["method"], request.get("params", {})
+        if isinstance(params, list):
+            params = dict(enumerate(params))
+        with self.__lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        handler = getattr(self, f"rpc_{method}", None)
+        if handler is None:
+            return {"id": request.get("id"), "result": {"status": f"Unknown method {method}"}, "error": None}
+        return {"id": request.get("id"), "result": handler(params), "error": None}
+
+    def __groups(self, sid: int):
+        return self.surveys[int(sid)]["groups"]
+
+    def __languages(self, sid: int) -> list:
+        survey = self.surveys[int(sid)]
+        return [survey.get("language", "en"), *survey.get("additional_languages", "").split()]
+
+    def __translated(self, survey: dict, question: dict, language: str) -> dict:
+        """ The question in a language of the survey; questions without a translation keep the base language """
+        if not language or language == self.__languages(survey["sid"])[0]:
+            return question
+        return {**question, **question.get("translations", {}).get(language, {})}
+
+    def __question(self, qid: int):
+        for survey in self.surveys.values():
+            for group in survey["groups"]:
+                for question in group["questions"]:
+                    if question["qid"] == int(qid):
+                        return survey, group, question
+        return None, None, None
+
+    def rpc_get_session_key(self, params):
+        return SESSION_KEY
+
+    def rpc_release_session_key(self, params):
+        return "OK"
+
+    def rpc_list_surveys(self, params):
+        return [{"sid": sid, "surveyls_title": survey["title"], "active": "Y"} for sid, survey in self.surveys.items()]
+
+    def rpc_get_survey_properties(self, params):
+        sid = int(params["iSurveyID"])
+        languages = self.__languages(sid)
+        properties = {"language": languages[0], "additional_languages": " ".join(languages[1:])}
+        return {key: value for key, value in properties.items() if key in params.get("aSurveyProperties", properties)}
+
+    def rpc_list_groups(self, params):
+        sid = params["iSurveyID"]
+        if params.get("sLanguage") and params["sLanguage"] not in self.__languages(sid):
+            return {"status": "Error: Invalid language"}
+        return [{"gid": group["gid"], "sid": sid, "group_name": group["group_name"], "group_order": group["group_order"],
+                 "grelevance": group.get("grelevance", "")} for group in self.__groups(sid)]
+
+    def rpc_list_questions(self, params):
+        sid = params["iSurveyID"]
+        gid = params.get("iGroupID")
+        language = params.get("sLanguage")
+        if language and language not in self.__languages(sid):
+            return {"status": "Error: Invalid language"}
+        result = []
+        for group in self.__groups(sid):
+            if gid is not None and group["gid"] != int(gid):
+                continue
+            for question in group["questions"]:
+                question = self.__translated(self.surveys[int(sid)], question, language)
+                result.append({"qid": question["qid"], "sid": sid, "gid": group["gid"], "parent_qid": 0,
+                               "type": question["type"], "title": question["title"],
+                               "question": question["question"], "question_order": question["question_order"],
+                               "relevance": question.get("relevance", "1")})
+        return result
+
+    def rpc_get_question_properties(self, params):
+        survey, group, question = self.__question(params["iQuestionID"])
+        if question is None:
+            return {"status": "Error: Invalid questionid"}
+        question = self.__translated(survey, question, params.get("sLanguage"))
+        return {"answeroptions": question["answeroptions"]}
+
+    def rpc_add_response(self, params):
+        with self.__lock:
+            response_id = next(self.__response_ids)
+            self.responses[response_id] = {"sid": params["iSurveyID"], **params["aResponseData"], "id": response_id}
+        return response_id
+
+    def rpc_update_response(self, params):
+        data = params["aResponseData"]
+        with self.__lock:
+            if int(data.get("id", 0)) not in self.responses:
+                return "Error: Invalid response ID"
+            self.responses[int(data["id"])].update(data)
+        return True
+
+    def rpc_export_responses(self, params):
+        sid = int(params["iSurveyID"])
+        rows = [response for response in self.responses.values() if int(response["sid"]) == sid]
+        if not rows:
+            return {"status": "No Data, could not get max id."}
+        columns = sorted({key for row in rows for key in row})
+        lines = [",".join(columns)] + [",".join(str(row.get(column, "")) for column in columns) for row in rows]
+        return base64.b64encode("\n".join(lines).encode()).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LimeSurvey RemoteControl JSON-RPC stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--fixture", default=FIXTURE)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated processing time per call in seconds")
+    args = parser.parse_args()
+    stub = LimeSurveyStub(args.fixture, args.latency).start(args.host, args.port)
+    print(f"LimeSurvey stub listening on {stub.url}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
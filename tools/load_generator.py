@@ -0,0 +1,123 @@
+"""
+HTTP load generator for the webhook endpoint.
+
+Posts synthetic Telegram updates to a running bot and reports requests/sec and latency percentiles as JSON, e.g.
+
+    python -m tools.load_generator --url http://127.0.0.1:8000/telegram --requests 20000 --concurrency 64
+
+Run it once against each server variant (e.g. two checkouts of the bot) on the loopback interface to compare them.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from tools import updates
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Returns the value at the given fraction of a sorted list (nearest rank).
+
+    :param sorted_values: Sorted list of values
+    :param fraction: Fraction between 0 and 1
+    :return: The percentile value, 0 for an empty list
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, elapsed: float, statuses: dict, errors: int) -> dict:
+    """
+    Builds the machine-readable summary of a load run.
+
+    :param latencies: Request latencies in seconds
+    :param elapsed: Wall clock duration of the run in seconds
+    :param statuses: Mapping of http status code to count
+    :param errors: Number of requests failing without a response
+    :return: Summary dictionary (latencies in milliseconds)
+    """
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "errors": errors,
+    }
+
+
+def build_payload(kind: str, chat_id: int) -> bytes:
+    """
+    Builds the body of one webhook request.
+
+    :param kind: Kind of update, "message", "callback" or "inline"
+    :param chat_id: The id of the synthetic user
+    :return: JSON encoded update
+    """
+    if kind == "callback":
+        update = updates.callback_query(chat_id, "_yes")
+    elif kind == "inline":
+        update = updates.inline_query(chat_id, random.choice("abcdefghijklmnopqrstuvwxyz"))
+    else:
+        update = updates.message(chat_id, "/help")
+    return json.dumps(update).encode()
+
+
+async def run_load(url: str, total: int, concurrency: int, users: int, kind: str, headers: dict) -> dict:
+    """
+    Sends 'total' webhook requests using 'concurrency' parallel connections.
+
+    :return: Summary dictionary, see summarize()
+    """
+    latencies, statuses, errors = [], {}, 0
+    remaining = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for _ in remaining:
+            body = build_payload(kind, 1000 + random.randrange(users))
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, content=body, headers=headers)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, statuses, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the Telegram webhook endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/telegram")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=1000, help="number of distinct synthetic chat ids")
+    parser.add_argument("--kind", choices=["message", "callback", "inline"], default="message")
+    parser.add_argument("--secret", default=None, help="value of the X-Telegram-Bot-Api-Secret-Token header")
+    args = parser.parse_args()
+    headers = {"content-type": "application/json"}
+    if args.secret:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = args.secret
+    result = asyncio.run(run_load(args.url, args.requests, args.concurrency, args.users, args.kind, headers))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Deterministic replay of captured webhook traffic.
+
+Feeds the updates captured with CAPTURE_FILE back into the real TelegramBotHandler, in their original order, against
+the fake Bot API and the LimeSurvey stub, e.g.
+
+    python -m tools.replay capture/updates.jsonl.gz capture/updates.jsonl.gz.1 --speed 10 --quiet
+
+--speed 1 keeps the original time between updates, --speed 10 replays ten times faster and --speed 0 as fast as
+possible. The question intervals are divided by the same factor (or by --speedup). Reports throughput, the latency
+from posting an update to the first Bot API call answering it, by update type, and how late updates were posted as
+JSON, so real traffic shapes can be compared between releases. Participants who started the survey before the capture
+began are unknown to the replaying bot, so their updates may not be answered; start captures before a survey is
+published, or expect them among 'unanswered'.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+
+from tools.benchmark import latency_summary
+from tools.harness import OfflineBot
+from tools.simulator import LoopLagMonitor, accelerate
+from update_capture import read_capture
+from update_ingest import extract_update_id
+
+""" Question interval divisor when replaying as fast as possible """
+MAX_SPEEDUP = 1000.0
+
+
+def reply_keys(update: dict) -> tuple:
+    """
+    Returns the type of an update and the keys of the Bot API calls answering it.
+
+    :param update: The decoded update
+    :return: Tuple of the update type and the list of chat ids or query ids, empty for updates the bot does not answer
+    """
+    if "message" in update:
+        return "message", [update["message"].get("chat", {}).get("id")]
+    if "callback_query" in update:
+        """ Answers are acknowledged with the id of the query, confirmations edit the message in the chat """
+        callback_query = update["callback_query"]
+        return "callback_query", [callback_query.get("id"), callback_query.get("from", {}).get("id")]
+    if "inline_query" in update:
+        return "inline_query", [update["inline_query"].get("id")]
+    return next((key for key in update if key != "update_id"), "unknown"), []
+
+
+class Replay:
+    """
+    Posts captured updates to an OfflineBot on the schedule of the capture and measures the replies.
+    """
+
+    def __init__(self, bot: OfflineBot, entries: list, speed: float, reply_timeout: float):
+        self.bot = bot
+        self.entries = entries
+        self.speed = speed
+        self.reply_timeout = reply_timeout
+        self.latencies = defaultdict(list)
+        self.lateness = []
+        self.statuses = defaultdict(int)
+        self.unanswered = 0
+        self.duplicates = 0
+
+    async def __measure(self, update_type: str, futures: list, posted: float):
+        """
+        Waits for the first Bot API call answering an update, cancelling the other waiters.
+        """
+        done, pending = await asyncio.wait(futures, timeout=self.reply_timeout, return_when=asyncio.FIRST_COMPLETED)
+        for future in pending:
+            future.cancel()
+        if done:
+            self.latencies[update_type].append(time.perf_counter() - posted)
+        else:
+            self.unanswered += 1
+
+    async def run(self) -> dict:
+        measurements = []
+        seen = set()
+        started = time.perf_counter()
+        first_timestamp = self.entries[0][0] if self.entries else 0.0
+        for timestamp, raw in self.entries:
+            if self.speed:
+                due = started + (timestamp - first_timestamp) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    self.lateness.append(-delay)
+            update_id = extract_update_id(raw)
+            update_type, keys = reply_keys(json.loads(raw))
+            """ The webhook drops updates delivered twice, their replies are not waited for """
+            duplicate = update_id in seen
+            seen.add(update_id)
+            self.duplicates += duplicate
+            futures = [] if duplicate else [self.bot.wait_for(None, key) for key in keys if key is not None]
+            posted = time.perf_counter()
+            status = await self.bot.post(raw)
+            self.statuses[str(status)] += 1
+            if status != 200:
+                for future in futures:
+                    future.cancel()
+            elif futures:
+                measurements.append(asyncio.create_task(self.__measure(update_type, futures, posted)))
+        await asyncio.gather(*measurements)
+        elapsed = time.perf_counter() - started
+        captured = self.entries[-1][0] - first_timestamp if self.entries else 0.0
+        return {
+            "updates": len(self.entries),
+            "captured_s": round(captured, 3),
+            "elapsed_s": round(elapsed, 3),
+            "updates_per_s": round(len(self.entries) / elapsed, 1) if elapsed else 0.0,
+            "statuses": dict(self.statuses),
+            "duplicates": self.duplicates,
+            "unanswered": self.unanswered,
+            "latency": {name: latency_summary(values) for name, values in self.latencies.items()},
+            "post_lateness": latency_summary(self.lateness),
+        }
+
+
+async def replay(args) -> dict:
+    entries = read_capture(args.paths)
+    speedup = args.speedup or args.speed or MAX_SPEEDUP
+    """ Do not capture the replay itself """
+    async with OfflineBot({"CAPTURE_FILE": ""}, telegram_delay=args.telegram_delay,
+                          limesurvey_latency=args.limesurvey_latency) as bot:
+        if args.quiet:
+            logging.getLogger().setLevel(logging.WARNING)
+        bot.handler.FREQUENCIES = accelerate(bot.handler.FREQUENCIES, speedup)
+        monitor = LoopLagMonitor()
+        monitor.start()
+        result = await Replay(bot, entries, args.speed, args.reply_timeout).run()
+        await monitor.stop()
+        result["event_loop_lag"] = latency_summary(monitor.lags)
+    result["arguments"] = vars(args)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay of captured webhook traffic against an offline bot")
+    parser.add_argument("paths", nargs="+", help="capture logs written with CAPTURE_FILE, in any order")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed: 1 original timing, 10 ten times faster, 0 as fast as possible")
+    parser.add_argument("--speedup", type=float, default=None,
+                        help="divisor of the question intervals, --speed by default")
+    parser.add_argument("--reply-timeout", type=float, default=10.0,
+                        help="seconds to wait for the bot to answer an update")
+    parser.add_argument("--telegram-delay", type=float, default=0.0, help="simulated Bot API latency in seconds")
+    parser.add_argument("--limesurvey-latency", type=float, default=0.0, help="simulated LimeSurvey latency in seconds")
+    parser.add_argument("--quiet", action="store_true", help="only log warnings and errors of the bot")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+    """ Keep the console output of the bot out of the JSON report """
+    with contextlib.redirect_stdout(sys.stderr):
+        result = asyncio.run(replay(args))
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
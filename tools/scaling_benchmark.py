@@ -0,0 +1,114 @@
+"""
+Throughput scaling of the multi-process deployment.
+
+Starts the LimeSurvey stub, the fake Bot API and the bot (``main.py``) with an increasing number of WORKERS, sends a
+burst of updates to the webhook and measures how fast the workers process them (counted as Bot API replies), e.g.
+
+    python -m tools.scaling_benchmark --workers 1 2 4 --updates 4000 --kind inline
+
+Prints one JSON document with the results per worker count.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from tools.harness import ROOT, offline_environment
+from tools.limesurvey_stub import LimeSurveyStub
+from tools.load_generator import run_load
+
+""" Bot API method that marks a processed update of each kind """
+REPLY_METHOD = {"inline": "answerInlineQuery", "message": "sendMessage", "callback": "editMessageText"}
+
+
+async def wait_until_up(url: str, timeout: float = 120.0):
+    """
+    Polls 'url' until it answers.
+    """
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up")
+
+
+async def reply_count(telegram_url: str, method: str) -> int:
+    """
+    Returns how often the fake Bot API has been called with 'method'.
+    """
+    async with httpx.AsyncClient() as client:
+        stats = (await client.get(f"{telegram_url}/stats")).json()
+    return stats["calls"].get(method, 0)
+
+
+async def measure(workers: int, args, api_url: str, telegram_url: str) -> dict:
+    """
+    Runs one bot with 'workers' processes and measures its processing throughput.
+    """
+    port = args.port
+    env = {**os.environ, **offline_environment(api_url, port, workers, f"{telegram_url}/bot")}
+    bot = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+    try:
+        await wait_until_up(f"http://127.0.0.1:{port}/healthcheck")
+        method = REPLY_METHOD[args.kind]
+        before = await reply_count(telegram_url, method)
+        started = time.perf_counter()
+        ingest = await run_load(f"http://127.0.0.1:{port}/telegram", args.updates, args.concurrency, args.users,
+                                args.kind, {"content-type": "application/json"})
+        processed = 0
+        while processed < args.updates and time.perf_counter() - started < args.timeout:
+            await asyncio.sleep(0.1)
+            processed = await reply_count(telegram_url, method) - before
+        elapsed = time.perf_counter() - started
+        return {"workers": workers, "processed": processed, "elapsed_s": round(elapsed, 3),
+                "updates_per_s": round(processed / elapsed, 1), "ingest": ingest}
+    finally:
+        bot.terminate()
+        bot.wait()
+
+
+async def main_async(args) -> list:
+    stub = LimeSurveyStub().start()
+    telegram_port = args.port + 1
+    telegram_url = f"http://127.0.0.1:{telegram_port}"
+    fake_telegram = subprocess.Popen([sys.executable, "-m", "tools.fake_telegram", "--port", str(telegram_port)],
+                                     cwd=ROOT)
+    try:
+        await wait_until_up(f"{telegram_url}/stats")
+        results = []
+        for workers in args.workers:
+            results.append(await measure(workers, args, stub.url, telegram_url))
+        base = results[0]["updates_per_s"] / results[0]["workers"] if results and results[0]["updates_per_s"] else 0
+        for result in results:
+            result["scaling_efficiency"] = round(result["updates_per_s"] / (base * result["workers"]), 2) if base else 0
+        return results
+    finally:
+        fake_telegram.terminate()
+        stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput scaling of the multi-process deployment")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--kind", choices=sorted(REPLY_METHOD), default="inline")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Load-testing simulator of complete survey conversations.
+
+Drives synthetic participants through the real TelegramBotHandler: every user sends /start, answers each question with
+one of its buttons (searching the address question with inline queries or sharing a location first), confirms or revises the answer and
+finally completes the survey. The Bot API is faked and LimeSurvey is served by the stub. The question intervals in
+FREQUENCIES are divided by --speedup, so a survey that takes days in production completes in seconds, e.g.
+
+    python -m tools.simulator --users 2000 --ramp 20 --speedup 1000
+
+Reports throughput, latency percentiles per interaction, the lateness of scheduled questions, memory growth and the
+lag of the event loop as JSON.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+from tools import updates
+from tools.benchmark import latency_summary
+from tools.harness import OfflineBot
+
+""" Seconds a synthetic user waits for a reply of the bot before it gives up """
+REPLY_TIMEOUT = 30.0
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a task sleeping for a fixed interval. The lateness is the time other
+    tasks occupied the loop without yielding.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags = []
+        self.__task = None
+
+    def start(self):
+        self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        self.__task.cancel()
+        try:
+            await self.__task
+        except asyncio.CancelledError:
+            pass
+
+    async def __run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+
+class Simulation:
+    """
+    Runs the synthetic users against an OfflineBot and collects their measurements.
+    """
+
+    def __init__(self, bot: OfflineBot, args):
+        """
+        Initializes the Simulation object.
+
+        :param bot: The running bot
+        :param args: The parsed command line arguments
+        """
+        self.bot = bot
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies = {"answer": [], "confirm": [], "inline_query": [], "location": []}
+        self.lateness = []
+        self.completed = 0
+        self.failed = 0
+        self.updates = 0
+        self.interval = bot.handler.FREQUENCIES["every_2_seconds"]["seconds"]
+
+    async def __post(self, update: dict):
+        self.updates += 1
+        status = await self.bot.post(update)
+        if status != 200:
+            raise RuntimeError(f"webhook answered {status}")
+
+    async def __think(self):
+        if self.args.think_time:
+            await asyncio.sleep(self.rng.expovariate(1 / self.args.think_time))
+
+    async def __reply(self, future: asyncio.Future) -> dict:
+        return await asyncio.wait_for(future, REPLY_TIMEOUT)
+
+    async def __search_address(self, chat_id: int) -> str:
+        """
+        Types an address prefix letter by letter, as the inline mode sends one query per keystroke, and picks one of
+        the results of the last query.
+        """
+        prefix = self.rng.choice(self.args.address_prefixes)
+        results = []
+        for length in range(2, len(prefix) + 1):
+            update = updates.inline_query(chat_id, prefix[:length])
+            reply = self.bot.wait_for("answerInlineQuery", update["inline_query"]["id"])
+            started = time.perf_counter()
+            await self.__post(update)
+            results = (await self.__reply(reply)).get("results", [])
+            self.latencies["inline_query"].append(time.perf_counter() - started)
+        if not results:
+            raise RuntimeError(f"no address found for {prefix!r}")
+        result = self.rng.choice(results)
+        return result["reply_markup"]["inline_keyboard"][0][0]["callback_data"]
+
+    async def __share_location(self, chat_id: int) -> str:
+        """
+        Shares a location a few meters from a random address and picks one of the offered addresses.
+        """
+        grid = self.bot.handler.address_grid
+        index = self.rng.randrange(len(grid))
+        update = updates.location(chat_id, grid.latitudes[index] + self.rng.uniform(-1e-4, 1e-4),
+                                  grid.longitudes[index] + self.rng.uniform(-1e-4, 1e-4))
+        reply = self.bot.wait_for("sendMessage", chat_id)
+        started = time.perf_counter()
+        await self.__post(update)
+        keyboard = ((await self.__reply(reply)).get("reply_markup") or {}).get("inline_keyboard")
+        self.latencies["location"].append(time.perf_counter() - started)
+        if not keyboard:
+            raise RuntimeError("no address found near the location")
+        return self.rng.choice(keyboard)[0]["callback_data"]
+
+    async def user(self, chat_id: int):
+        """
+        One participant, from /start to the completion message.
+        """
+        question = self.bot.wait_for("sendMessage", chat_id)
+        await self.__post(updates.message(chat_id, "/start"))
+        scheduled = time.perf_counter()
+        """ After a revised answer the bot accepts the next answer without asking for a confirmation """
+        confirm = True
+        try:
+            while True:
+                message = await self.__reply(question)
+                self.lateness.append(max(0.0, time.perf_counter() - scheduled - self.interval))
+                keyboard = (message.get("reply_markup") or {}).get("inline_keyboard")
+                if not keyboard:
+                    self.completed += 1
+                    return
+                await self.__think()
+                if "switch_inline_query_current_chat" in keyboard[0][0]:
+                    if self.rng.random() < self.args.location_rate:
+                        data = await self.__share_location(chat_id)
+                    else:
+                        data = await self.__search_address(chat_id)
+                else:
+                    data = self.rng.choice([row[0]["callback_data"] for row in keyboard])
+
+                if not confirm:
+                    edited = self.bot.wait_for("editMessageText", chat_id)
+                    question = self.bot.wait_for("sendMessage", chat_id)
+                    started = time.perf_counter()
+                    await self.__post(updates.callback_query(chat_id, data))
+                    await self.__reply(edited)
+                    scheduled = time.perf_counter()
+                    self.latencies["answer"].append(scheduled - started)
+                    confirm = True
+                    continue
+
+                confirmation = self.bot.wait_for("sendMessage", chat_id)
+                started = time.perf_counter()
+                await self.__post(updates.callback_query(chat_id, data))
+                await self.__reply(confirmation)
+                self.latencies["answer"].append(time.perf_counter() - started)
+
+                await self.__think()
+                revise = self.rng.random() < self.args.revise_rate
+                edited = self.bot.wait_for("editMessageText", chat_id)
+                question = self.bot.wait_for("sendMessage", chat_id)
+                started = time.perf_counter()
+                await self.__post(updates.callback_query(chat_id, "_no" if revise else "_yes"))
+                await self.__reply(edited)
+                scheduled = time.perf_counter()
+                self.latencies["confirm"].append(scheduled - started)
+                if revise:
+                    """ The question is asked again right away instead of after the interval """
+                    scheduled -= self.interval
+                    confirm = False
+        except (asyncio.TimeoutError, RuntimeError, KeyError, IndexError) as err:
+            self.failed += 1
+            print(f"User {chat_id} failed: {err!r}", file=sys.stderr)
+
+    async def run(self) -> dict:
+        """
+        Starts the users spread evenly over the ramp-up time and waits until all of them finished.
+        """
+        users = []
+        started = time.perf_counter()
+        for index in range(self.args.users):
+            users.append(asyncio.create_task(self.user(100000 + index)))
+            if self.args.ramp:
+                await asyncio.sleep(self.args.ramp / self.args.users)
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - started
+        return {
+            "users": self.args.users,
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed_s": round(elapsed, 3),
+            "surveys_per_s": round(self.completed / elapsed, 2),
+            "updates_per_s": round(self.updates / elapsed, 1),
+            "latency": {name: latency_summary(values) for name, values in self.latencies.items()},
+            "question_lateness": latency_summary(self.lateness),
+        }
+
+
+def max_rss_bytes() -> int:
+    """
+    Returns the peak resident set size of the process (ru_maxrss is in kilobytes on Linux, bytes on macOS).
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def accelerate(frequencies: dict, speedup: float) -> dict:
+    """
+    Returns a copy of FREQUENCIES with all intervals divided by 'speedup'.
+    """
+    return {key: {**value, "seconds": value["seconds"] / speedup} for key, value in frequencies.items()}
+
+
+async def simulate(args) -> dict:
+    if args.tracemalloc:
+        tracemalloc.start()
+    async with OfflineBot(telegram_delay=args.telegram_delay, limesurvey_latency=args.limesurvey_latency) as bot:
+        if args.quiet:
+            logging.getLogger().setLevel(logging.WARNING)
+        bot.handler.FREQUENCIES = accelerate(bot.handler.FREQUENCIES, args.speedup)
+        rss_before = max_rss_bytes()
+        traced_before = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+        monitor = LoopLagMonitor()
+        monitor.start()
+        result = await Simulation(bot, args).run()
+        await monitor.stop()
+        result["event_loop_lag"] = latency_summary(monitor.lags)
+        result["memory"] = {"max_rss_bytes": max_rss_bytes(), "max_rss_growth_bytes": max_rss_bytes() - rss_before,
+                            "user_data_entries": len(bot.handler.app.user_data)}
+        if args.tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["memory"].update(traced_growth_bytes=current - traced_before, traced_peak_bytes=peak)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-testing simulator of complete survey conversations")
+    parser.add_argument("--users", type=int, default=1000, help="number of synthetic participants")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which the users start")
+    parser.add_argument("--speedup", type=float, default=1000.0, help="divisor of the question intervals")
+    parser.add_argument("--think-time", type=float, default=0.05, help="mean seconds a user takes to answer")
+    parser.add_argument("--revise-rate", type=float, default=0.1, help="probability of answering 'no' to a confirmation")
+    parser.add_argument("--address-prefixes", nargs="+", default=["mariahilfer", "praterstr", "landstr", "favoriten"],
+                        help="lowercase prefixes typed into the address search")
+    parser.add_argument("--location-rate", type=float, default=0.0,
+                        help="probability of sharing a location instead of typing the address")
+    parser.add_argument("--telegram-delay", type=float, default=0.0, help="simulated Bot API latency in seconds")
+    parser.add_argument("--limesurvey-latency", type=float, default=0.0, help="simulated LimeSurvey latency in seconds")
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace Python allocations (slow)")
+    parser.add_argument("--quiet", action="store_true", help="only log warnings and errors of the bot")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    """ Keep the console output of the bot out of the JSON report """
+    with contextlib.redirect_stdout(sys.stderr):
+        result = asyncio.run(simulate(args))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import itertools
+import time
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def next_update_id() -> int:
+    """
+    Returns a fresh update id.
+
+    :return: Update id
+    """
+    return next(_update_ids)
+
+
+def user(chat_id: int) -> dict:
+    """
+    Builds the Telegram 'User' object of a synthetic participant.
+
+    :param chat_id: The id of the private chat (equal to the user id)
+    :return: User dictionary
+    """
+    return {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}", "language_code": "en"}
+
+
+def chat(chat_id: int) -> dict:
+    """
+    Builds the Telegram 'Chat' object of a private chat.
+
+    :param chat_id: The id of the chat
+    :return: Chat dictionary
+    """
+    return {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"}
+
+
+def message(chat_id: int, text: str) -> dict:
+    """
+    Builds an update carrying a text message. Texts starting with '/' are marked as bot commands.
+
+    :param chat_id: The id of the chat
+    :param text: The message text
+    :return: Update dictionary
+    """
+    msg = {"message_id": next(_message_ids), "date": int(time.time()), "chat": chat(chat_id), "from": user(chat_id),
+           "text": text}
+    if text.startswith("/"):
+        msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next_update_id(), "message": msg}
+
+
+def location(chat_id: int, latitude: float, longitude: float) -> dict:
+    """
+    Builds an update carrying a location shared by the user.
+
+    :param chat_id: The id of the chat
+    :param latitude: Latitude of the location
+    :param longitude: Longitude of the location
+    :return: Update dictionary
+    """
+    msg = {"message_id": next(_message_ids), "date": int(time.time()), "chat": chat(chat_id), "from": user(chat_id),
+           "location": {"latitude": latitude, "longitude": longitude}}
+    return {"update_id": next_update_id(), "message": msg}
+
+
+def callback_query(chat_id: int, data: str, message_id: int = 1) -> dict:
+    """
+    Builds an update carrying a callback query, as sent when an inline keyboard button is pressed.
+
+    :param chat_id: The id of the chat
+    :param data: The callback data of the button
+    :param message_id: The id of the message the keyboard belongs to
+    :return: Update dictionary
+    """
+    msg = {"message_id": message_id, "date": int(time.time()), "chat": chat(chat_id), "text": "question"}
+    return {"update_id": next_update_id(), "callback_query": {
+        "id": str(next_update_id()), "from": user(chat_id), "chat_instance": str(chat_id), "data": data,
+        "message": msg}}
+
+
+def inline_query(chat_id: int, query: str) -> dict:
+    """
+    Builds an update carrying an inline query.
+
+    :param chat_id: The id of the user typing the query
+    :param query: The query text
+    :return: Update dictionary
+    """
+    return {"update_id": next_update_id(), "inline_query": {
+        "id": str(next_update_id()), "from": user(chat_id), "query": query, "offset": ""}}
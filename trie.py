@@ -2,69 +2,100 @@ class Node:
     def __init__(self):
         """
         This method initializes a node in the trie.
-        It sets 'end' attribute to False, signifying that the current node is not the end of a word.
+        It sets 'end' attribute to None, signifying that the current node is not the end of a word. At the end of a
+        word it holds the id of the word.
         It also sets 'children' as an empty dictionary to hold child nodes.
         """
-        self.end = False
+        self.end = None
         self.children = {}
 
-    def autocomplete(self, prefix):
+    def autocomplete(self):
         """
         This method autocompletes the words recursively in the Trie.
-        It generates all the possible words that start with the given prefix.
+        It generates the ids of all the words below this node.
 
-        :param prefix: The prefix input to the function
-        :return: Yields the autocompleted words
+        :return: Yields the ids of the autocompleted words
         """
         # we're at the end of a word, yield the result
-        if self.end:
-            yield prefix
+        if self.end is not None:
+            yield self.end
         # else, recurse over each child-character
-        # of the current node and append the
-        # corresponding letter to the prefix
-        # -> this will build up the autocompleted string
-        for letter, child in self.children.items():
-            yield from child.autocomplete(prefix + letter)
+        # of the current node
+        for child in self.children.values():
+            yield from child.autocomplete()
 
 
 class Trie:
-    def __init__(self):
+    def __init__(self, words=None):
         """
         This method initializes the Trie (the root of it to be specific).
-        It sets 'root' as a new Node.
+        It sets 'root' as a new Node and 'words' as the list of inserted words, indexed by their id.
+
+        :param words: Optional list of words shared with other Tries, see insert()
         """
         self.root = Node()
+        self.words = words if words is not None else []
 
-    def insert(self, word):
+    def insert(self, word, word_id=None) -> int:
         """
         This method inserts a word into the Trie.
         It iteratively creates nodes for each character in the word and
-        sets the 'end' attribute of the final character's node as True.
+        sets the 'end' attribute of the final character's node to the id of the word.
+        Ids are assigned in insertion order, so the same words inserted in the same order get the same ids.
+        Words differing in case only are stored once, with the spelling inserted first.
 
         :param word: The word to be inserted into the Trie
+        :param word_id: The id of a word already in the shared 'words' list, None to append the word to it
+        :return: The id of the word
         """
         cur = self.root
         for c in word.lower():
             if c not in cur.children:
                 cur.children[c] = Node()
             cur = cur.children[c]
-        cur.end = True
+        if cur.end is None:
+            if word_id is None:
+                word_id = len(self.words)
+                self.words.append(word)
+            cur.end = word_id
+        return cur.end
 
-    def autocomplete(self, word):
+    def word(self, word_id: int):
+        """
+        This method returns the word with the given id.
+
+        :param word_id: The id returned by insert
+        :return: The word, None if there is no word with this id
+        """
+        if 0 <= word_id < len(self.words):
+            return self.words[word_id]
+        return None
+
+    def autocomplete_ids(self, word):
         """
-        This method finds all words in the Trie that start with a given word/prefix.
+        This method finds the ids of all words in the Trie that start with a given word/prefix, ignoring case.
 
         :param word: The word/prefix used to autocomplete
-        :return: Yields all possible words in Trie starting with the given word
+        :return: Yields the ids of all words in Trie starting with the given word
         """
         cur = self.root
         # starting at the root
         # traverse the trie for each
         # character in `word`
-        for c in word:
+        for c in word.lower():
             cur = cur.children.get(c)
             if cur is None:  # word does not exist in our trie
                 return
         # recursively autocomplete all possible words
         # starting at the final character node
-        yield from cur.autocomplete(word)
+        yield from cur.autocomplete()
+
+    def autocomplete(self, word):
+        """
+        This method finds all words in the Trie that start with a given word/prefix, ignoring case.
+
+        :param word: The word/prefix used to autocomplete
+        :return: Yields all possible words in Trie starting with the given word
+        """
+        for word_id in self.autocomplete_ids(word):
+            yield self.words[word_id]
@@ -0,0 +1,156 @@
+import gzip
+import logging
+import os
+import queue
+import threading
+import time
+
+import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+""" Seconds without updates after which the captured ones are flushed to disk """
+FLUSH_INTERVAL = 1.0
+
+CAPTURED_UPDATES = metrics.counter("captured_updates_total", "Webhook updates captured for replay, by result",
+                                   ["result"])
+
+
+class UpdateCapture:
+    """
+    Appends the raw updates received by the webhook to a gzip compressed log in the JSON Lines format, one
+    {"ts": <unix time>, "update": <raw update>} object per line, for tools.replay. The webhook only puts the raw body
+    into a bounded queue; a background thread compresses and writes it, so capturing does not slow down the ingest.
+    When the log has grown by 'max_bytes' of uncompressed updates it is rotated like a logging.RotatingFileHandler:
+    'path' becomes 'path.1', 'path.1' becomes 'path.2' and so on, keeping 'backups' old logs.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int, queue_size: int = 10000):
+        """
+        Initializes the UpdateCapture object.
+
+        :param path: Path of the log, e.g. 'capture/updates.jsonl.gz'
+        :param max_bytes: Uncompressed size after which the log is rotated, 0 never rotates
+        :param backups: Number of rotated logs kept
+        :param queue_size: Maximum number of updates waiting to be written; more are not captured
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__thread = None
+        self.__file = None
+        self.__written = 0
+
+    def start(self):
+        """
+        Starts the writer thread.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__thread = threading.Thread(target=self.__run, name="update-capture", daemon=True)
+        self.__thread.start()
+        LOGGER.info("Capturing webhook updates to %s.", self.path)
+
+    def write(self, raw: bytes):
+        """
+        Captures a raw update. Never blocks: if the writer falls behind, the update is not captured.
+
+        :param raw: The raw update as received by the webhook
+        """
+        try:
+            self.__queue.put_nowait((time.time(), raw))
+        except queue.Full:
+            CAPTURED_UPDATES.labels("dropped").inc()
+
+    def stop(self):
+        """
+        Writes the updates still queued and closes the log. Blocks until done, so call it from a thread.
+        """
+        if self.__thread is None:
+            return
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__thread = None
+
+    def __run(self):
+        while True:
+            try:
+                entry = self.__queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                if self.__file is not None:
+                    self.__file.flush()
+                continue
+            if entry is None:
+                break
+            timestamp, raw = entry
+            """ Line breaks can only be whitespace between JSON tokens, strings escape them """
+            line = b'{"ts": %.6f, "update": %s}\n' % (timestamp, raw.strip().replace(b"\r", b" ").replace(b"\n", b" "))
+            try:
+                self.__write_line(line)
+                CAPTURED_UPDATES.labels("written").inc()
+            except OSError as err:
+                CAPTURED_UPDATES.labels("failed").inc()
+                LOGGER.error("Capturing an update to %s failed: %s", self.path, err)
+                self.__close()
+        self.__close()
+
+    def __write_line(self, line: bytes):
+        if self.max_bytes and self.__written >= self.max_bytes:
+            self.__close()
+            self.__rotate()
+        if self.__file is None:
+            """ Appending to an existing log adds a gzip member, gzip readers read all members """
+            self.__file = gzip.open(self.path, "ab")
+            self.__written = 0
+        self.__file.write(line)
+        self.__written += len(line)
+
+    def __close(self):
+        if self.__file is not None:
+            try:
+                self.__file.close()
+            except OSError as err:
+                LOGGER.error("Closing the capture log %s failed: %s", self.path, err)
+            self.__file = None
+
+    def __rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if not os.path.exists(self.path):
+            return
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def read_capture(paths: list) -> list:
+    """
+    Reads captured updates from one or more logs written by UpdateCapture, e.g. a log and its rotated predecessors.
+
+    :param paths: Paths of the logs, in any order
+    :return: List of (timestamp, raw update) tuples, oldest first
+    """
+    entries = []
+    for path in paths:
+        try:
+            with gzip.open(path, "rb") as capture:
+                for line in capture:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    """ Split off the timestamp without decoding the update """
+                    prefix, separator, rest = line.partition(b', "update": ')
+                    if not separator or not prefix.startswith(b'{"ts": ') or not rest.endswith(b"}"):
+                        LOGGER.warning("Skipping a malformed line in %s.", path)
+                        continue
+                    entries.append((float(prefix[len(b'{"ts": '):]), rest[:-1]))
+        except EOFError:
+            """ The log of a process which did not stop cleanly ends with an incomplete gzip member """
+            LOGGER.warning("%s is truncated, replaying the updates before the end.", path)
+    entries.sort(key=lambda entry: entry[0])
+    return entries
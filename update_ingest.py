@@ -0,0 +1,155 @@
+import asyncio
+import json
+from array import array
+import logging
+import re
+
+from telegram import Update
+
+LOGGER = logging.getLogger(__name__)
+
+""" Telegram serializes 'update_id' as a top level key; escaped occurrences inside strings cannot match """
+UPDATE_ID_PATTERN = re.compile(rb'"update_id"\s*:\s*(\d+)')
+
+
+def extract_update_id(raw: bytes):
+    """
+    Extracts the update id from a raw update without decoding the whole JSON document.
+
+    :param raw: The raw update as received by the webhook
+    :return: The update id or None if the body does not contain one
+    """
+    match = UPDATE_ID_PATTERN.search(raw)
+    return int(match.group(1)) if match else None
+
+
+class UpdateDeduplicator:
+    """
+    Remembers the most recent update ids in a fixed size ring buffer, backed by a set for O(1) lookups. Used to drop
+    updates Telegram delivers again because an earlier webhook response was too slow.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Initializes the UpdateDeduplicator object.
+
+        :param capacity: Number of update ids to remember
+        """
+        self.__ring = array("q", [-1]) * capacity
+        self.__seen = set()
+        self.__position = 0
+        self.suppressed = 0
+
+    def is_duplicate(self, update_id: int) -> bool:
+        """
+        Checks whether an update id has been seen recently and counts suppressed duplicates.
+
+        :param update_id: The update id
+        :return: True if the update has already been accepted
+        """
+        if update_id in self.__seen:
+            self.suppressed += 1
+            return True
+        return False
+
+    def remember(self, update_id: int):
+        """
+        Records an accepted update id, evicting the oldest one once the buffer is full.
+
+        :param update_id: The update id
+        """
+        if not self.__ring:
+            return
+        self.__seen.discard(self.__ring[self.__position])
+        self.__ring[self.__position] = update_id
+        self.__seen.add(update_id)
+        self.__position = (self.__position + 1) % len(self.__ring)
+
+
+class UpdateIngestQueue:
+    """
+    Bounded queue of raw webhook bodies. The webhook only offers the bytes and acknowledges the request, decoding and
+    handling of the updates is done by the consumer task.
+    """
+
+    def __init__(self, app, maxsize: int):
+        """
+        Initializes the UpdateIngestQueue object.
+
+        :param app: The PTB application that processes the decoded updates
+        :param maxsize: Maximum number of raw updates waiting to be processed
+        """
+        self.app = app
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.accepted = 0
+        self.dropped = 0
+        self.decode_errors = 0
+        self.__consumer = None
+
+    def offer(self, raw: bytes) -> bool:
+        """
+        Offers a raw update to the queue without waiting.
+
+        :param raw: The raw update as received by the webhook
+        :return: True if the update was queued, False if the queue is saturated
+        """
+        try:
+            self.queue.put_nowait(raw)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def put(self, raw: bytes):
+        """
+        Puts a raw update into the queue, waiting for free space.
+
+        :param raw: The raw update
+        """
+        await self.queue.put(raw)
+        self.accepted += 1
+
+    def depth(self) -> int:
+        """
+        Returns the number of updates waiting to be processed.
+
+        :return: Queue depth
+        """
+        return self.queue.qsize()
+
+    def start(self):
+        """
+        Starts the consumer task on the running event loop.
+        """
+        self.__consumer = asyncio.create_task(self.__consume())
+
+    async def stop(self):
+        """
+        Stops the consumer task. Updates still waiting in the queue are discarded.
+        """
+        if self.__consumer is not None:
+            self.__consumer.cancel()
+            try:
+                await self.__consumer
+            except asyncio.CancelledError:
+                pass
+            self.__consumer = None
+
+    async def __consume(self):
+        """
+        Decodes queued updates one by one and passes them to the PTB application. Updates are processed sequentially
+        in arrival order, like PTB's own update fetcher does.
+        """
+        while True:
+            raw = await self.queue.get()
+            try:
+                update = Update.de_json(data=json.loads(raw), bot=self.app.bot)
+            except (ValueError, KeyError, TypeError) as err:
+                self.decode_errors += 1
+                LOGGER.warning("Dropping undecodable update: %s", err)
+                continue
+            try:
+                await self.app.process_update(update)
+            except Exception as err:
+                LOGGER.exception("Processing update %s failed: %s", update.update_id, err)
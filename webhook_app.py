@@ -0,0 +1,212 @@
+import hmac
+import json
+from http import HTTPStatus
+
+import uvicorn
+
+import metrics
+from update_ingest import UpdateDeduplicator, UpdateIngestQueue, extract_update_id
+
+SECRET_TOKEN_HEADER = b"x-telegram-bot-api-secret-token"
+AUTHORIZATION_HEADER = b"authorization"
+METRICS_CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+JSON_CONTENT_TYPE = b"application/json"
+
+INGEST_SECONDS = metrics.histogram("webhook_ingest_seconds", "Time spent validating and queueing a webhook update")
+
+
+class WebhookApp:
+    """
+    Minimal ASGI application serving the Telegram webhook. It runs directly on the event loop of the bot and only
+    validates incoming updates before acknowledging them; decoding happens in the consumer of the ingest queue.
+    """
+
+    def __init__(self, ingest: UpdateIngestQueue, dedupe: UpdateDeduplicator, host: str, port: int,
+                 secret_token: str = None, metrics_sources=(metrics.REGISTRY.collect,), readiness=None,
+                 stats_source=None, stats_token: str = None, capture=None):
+        """
+        Initializes the WebhookApp object.
+
+        :param ingest: The queue (or the ShardRouter of a multi-process deployment) raw updates are offered to
+        :param dedupe: Filter for updates Telegram delivers more than once
+        :param host: Interface to bind the web server to
+        :param port: Port to bind the web server to
+        :param secret_token: Expected value of the secret token header, None disables the check
+        :param metrics_sources: Callables returning the metric families served on /metrics
+        :param readiness: Startup state of the components of the bot, reported on /healthcheck
+        :param stats_source: Callable returning the answer counts served as JSON on /stats
+        :param stats_token: Bearer token required by /stats, None disables the endpoint
+        :param capture: UpdateCapture recording the updates received on /telegram, None disables the capture
+        """
+        self.ingest = ingest
+        self.dedupe = dedupe
+        self.host = host
+        self.port = port
+        self.secret_token = secret_token.encode() if secret_token else None
+        self.rejected = 0
+        self.metrics_sources = metrics_sources
+        self.readiness = readiness
+        self.stats_source = stats_source
+        self.stats_token = f"Bearer {stats_token}".encode() if stats_token else None
+        self.capture = capture
+        self.routes = {
+            ("POST", "/telegram"): self.telegram,
+            ("GET", "/healthcheck"): self.health,
+            ("GET", "/metrics"): self.serve_metrics,
+        }
+        if self.stats_source is not None and self.stats_token is not None:
+            self.routes[("GET", "/stats")] = self.stats
+        self.content_types = {self.serve_metrics: METRICS_CONTENT_TYPE, self.stats: JSON_CONTENT_TYPE}
+        metrics.gauge("webhook_queue_depth", "Updates waiting to be processed", function=self.ingest.depth)
+        metrics.counter("webhook_updates_total", "Webhook updates by outcome", ["result"], function=lambda: {
+            ("accepted",): self.ingest.accepted,
+            ("dropped",): self.ingest.dropped,
+            ("rejected",): self.rejected,
+            ("duplicate",): self.dedupe.suppressed,
+            ("undecodable",): self.ingest.decode_errors,
+        })
+
+    async def __call__(self, scope, receive, send):
+        """
+        ASGI entry point. Dispatches http requests to the registered routes.
+        """
+        if scope["type"] != "http":
+            return
+        route = self.routes.get((scope["method"], scope["path"]))
+        if route is None:
+            await self.respond(send, HTTPStatus.NOT_FOUND)
+            return
+        status, body = await route(scope, await self.read_body(receive))
+        headers = [(b"retry-after", b"1")] if status == HTTPStatus.SERVICE_UNAVAILABLE else []
+        content_type = self.content_types.get(route, b"text/plain; charset=utf-8")
+        await self.respond(send, status, body, content_type, headers)
+
+    @staticmethod
+    async def read_body(receive) -> bytes:
+        """
+        Reads the complete request body.
+
+        :param receive: ASGI receive callable
+        :return: The request body
+        """
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    @staticmethod
+    async def respond(send, status: HTTPStatus, body: bytes = b"", content_type: bytes = b"text/plain; charset=utf-8",
+                      headers=()):
+        """
+        Sends a complete response.
+
+        :param send: ASGI send callable
+        :param status: HTTP status of the response
+        :param body: Response body
+        :param content_type: Value of the content-type header
+        :param headers: Additional response headers
+        """
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *headers],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def has_header(scope, header: bytes, expected: bytes) -> bool:
+        """
+        Checks a request header against a secret value in constant time.
+
+        :param scope: ASGI connection scope
+        :param header: Lowercase name of the header
+        :param expected: The expected value
+        :return: True if the header matches
+        """
+        for name, value in scope["headers"]:
+            if name == header:
+                return hmac.compare_digest(value, expected)
+        return False
+
+    def has_valid_secret(self, scope) -> bool:
+        """
+        Checks the secret token header Telegram sends along with every webhook request.
+
+        :param scope: ASGI connection scope
+        :return: True if no secret is configured or the header matches
+        """
+        if self.secret_token is None:
+            return True
+        return self.has_header(scope, SECRET_TOKEN_HEADER, self.secret_token)
+
+    async def telegram(self, scope, body: bytes):
+        """
+        Handle incoming Telegram updates by offering the raw body to the ingest queue. Updates already accepted are
+        acknowledged without queueing them again. Replies 503 if the queue is saturated, so Telegram delivers the
+        update again later. With capture enabled, every authenticated update is recorded, including duplicates, so a
+        replay sees the same traffic.
+        """
+        with INGEST_SECONDS.time():
+            if not self.has_valid_secret(scope):
+                self.rejected += 1
+                return HTTPStatus.FORBIDDEN, b""
+            update_id = extract_update_id(body)
+            if update_id is None:
+                self.rejected += 1
+                return HTTPStatus.BAD_REQUEST, b""
+            if self.capture is not None:
+                self.capture.write(body)
+            if self.dedupe.is_duplicate(update_id):
+                return HTTPStatus.OK, b""
+            if not self.ingest.offer(body):
+                return HTTPStatus.SERVICE_UNAVAILABLE, b""
+            """ Only remember accepted updates, a rejected update must pass when Telegram retries it """
+            self.dedupe.remember(update_id)
+            return HTTPStatus.OK, b""
+
+    async def health(self, scope, body: bytes):
+        """
+        For the health endpoint, reply with a simple plain text message, the readiness of every component and the
+        ingest counters. The bot accepts updates while components are loading, so the status is always 200.
+        """
+        text = (
+            "The bot is still running fine :)\n"
+            f"queue_depth {self.ingest.depth()}\n"
+            f"updates_accepted {self.ingest.accepted}\n"
+            f"updates_dropped {self.ingest.dropped}\n"
+            f"updates_rejected {self.rejected}\n"
+            f"updates_duplicate {self.dedupe.suppressed}\n"
+            f"updates_undecodable {self.ingest.decode_errors}\n"
+        )
+        if self.readiness is not None:
+            states = self.readiness.states()
+            text += f"ready {int(self.readiness.all_ready())}\n"
+            text += "".join(f"component_{name} {state}\n" for name, state in states.items())
+        return HTTPStatus.OK, text.encode()
+
+    async def serve_metrics(self, scope, body: bytes):
+        """Serve all metrics in the Prometheus text format."""
+        families = [family for source in self.metrics_sources for family in source()]
+        return HTTPStatus.OK, metrics.render(families).encode()
+
+    async def stats(self, scope, body: bytes):
+        """
+        Serve the answer counts of the surveys as JSON, to clients sending the STATS_TOKEN as bearer token.
+        """
+        if not self.has_header(scope, AUTHORIZATION_HEADER, self.stats_token):
+            return HTTPStatus.UNAUTHORIZED, b""
+        return HTTPStatus.OK, json.dumps(self.stats_source()).encode()
+
+    def run(self):
+        return uvicorn.Server(
+            config=uvicorn.Config(
+                app=self,
+                port=self.port,
+                use_colors=False,
+                host=self.host,
+                lifespan="off",
+            )
+        )